@@ -0,0 +1,107 @@
+"""
+Hiring funnel of an employer, across all of their job posts.
+
+A single GROUP BY on (application day, status) gives both the number of applications per status
+and the daily intake. The median time from application to the last status change is read with
+one ordered query that only fetches the middle rows. The result is cached per employer for the
+whole history, the requested window of days is cut from it, and the entry is dropped whenever
+one of the employer's applications changes (see `signals.py`).
+"""
+import datetime
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import JobApplication, JobPost
+
+
+STATUSES = [status for status, label in JobApplication.STATUS_CHOICES]
+
+MAX_DAYS = 365
+
+
+def funnel_key(employer_id):
+    return f"employer-funnel:{employer_id}"
+
+
+def median_response_time(applications, count):
+    """ Median of status_updated_at - applied_at over `count` applications, reading only the middle rows """
+    if not count:
+        return None
+    durations = (
+        applications
+        .annotate(response_time=ExpressionWrapper(F('status_updated_at') - F('applied_at'), output_field=DurationField()))
+        .order_by('response_time')
+        .values_list('response_time', flat=True)
+    )
+    middle = list(durations[(count - 1) // 2:count // 2 + 1])
+    if not middle:
+        return None
+    return sum(middle, datetime.timedelta()) / len(middle)
+
+
+def compute_funnel(employer_id):
+    applications = JobApplication.objects.filter(job__employer_id=employer_id)
+    rows = (
+        applications
+        .annotate(day=TruncDate('applied_at', tzinfo=timezone.get_current_timezone()))
+        .values_list('day', 'status')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    by_status = dict.fromkeys(STATUSES, 0)
+    daily = {}
+    for day, status, count in rows:
+        by_status[status] = by_status.get(status, 0) + count
+        daily[day.isoformat()] = daily.get(day.isoformat(), 0) + count
+
+    # Applications still "received" were never answered, they have no response time yet
+    answered = sum(by_status.values()) - by_status['received']
+    median = median_response_time(applications.exclude(status='received'), answered)
+    return {
+        'total': sum(by_status.values()),
+        'by_status': by_status,
+        'median_response_seconds': median.total_seconds() if median is not None else None,
+        'daily': daily,
+    }
+
+
+def get_funnel(employer_id, days=30):
+    """ Applications of the employer per status, median response time, and intake of the last `days` days """
+    funnel = cache.get(funnel_key(employer_id))
+    if funnel is None:
+        funnel = compute_funnel(employer_id)
+        cache.set(funnel_key(employer_id), funnel, timeout=settings.EMPLOYER_FUNNEL_CACHE_TIMEOUT)
+
+    days = max(1, min(days, MAX_DAYS))
+    today = timezone.localdate()
+    start = today - datetime.timedelta(days=days - 1)
+    seconds = funnel['median_response_seconds']
+    return {
+        'total': funnel['total'],
+        'by_status': funnel['by_status'],
+        'median_response_hours': round(seconds / 3600, 1) if seconds is not None else None,
+        'intake': [
+            {'date': day, 'applications': funnel['daily'].get(day.isoformat(), 0)}
+            for day in (start + datetime.timedelta(days=offset) for offset in range(days))
+        ],
+    }
+
+
+def invalidate_funnel(employer_id):
+    # Dropped again on commit, so a reader racing the transaction cannot keep a stale funnel
+    cache.delete(funnel_key(employer_id))
+    transaction.on_commit(lambda: cache.delete(funnel_key(employer_id)))
+
+
+def invalidate_funnel_of_application(application, using='default'):
+    if JobApplication.job.is_cached(application):
+        employer_id = application.job.employer_id
+    else:
+        employer_id = JobPost.objects.using(using).filter(pk=application.job_id).values_list('employer_id', flat=True).first()
+    if employer_id is not None:
+        invalidate_funnel(employer_id)
@@ -0,0 +1,114 @@
+"""
+Status changes of job applications, one at a time or in bulk, and their history.
+
+Every change of status appends a `JobApplicationStatusHistory` row. A bulk change checks that
+all the applications belong to the employer with a single query, then writes the new statuses
+with one `bulk_update` and their history with one `bulk_create`, in a single transaction: a
+recruiter triaging hundreds of candidates makes one request of a handful of queries. As
+`bulk_update` sends no signals, the counters of the job posts and the hiring funnel of the
+employer are updated here (see `counters.py` and `analytics.py`).
+"""
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import PermissionDenied, ValidationError
+
+from . import analytics, counters
+from .models import JobApplication, JobApplicationStatusHistory
+
+
+STATUSES = [status for status, label in JobApplication.STATUS_CHOICES]
+
+MAX_BULK_CHANGES = 500
+
+
+def validate_status(status):
+    if status not in STATUSES:
+        raise ValidationError({'status': [f"Invalid status. Must be one of: {', '.join(STATUSES)}"]})
+    return status
+
+
+def parse_changes(data):
+    """
+    {application id: status} from `{"changes": [{"id": 1, "status": "rejected"}, ...]}`, or from
+    `{"ids": [1, 2], "status": "rejected"}` to give many applications the same status.
+    """
+    if 'ids' in data:
+        ids = data['ids']
+        if not isinstance(ids, list):
+            raise ValidationError({'ids': ["Expected a list of application IDs."]})
+        changes = [{'id': application_id, 'status': data.get('status')} for application_id in ids]
+    else:
+        changes = data.get('changes')
+        if not isinstance(changes, list):
+            raise ValidationError({'changes': ["Expected a list of {id, status} objects."]})
+    if not changes:
+        raise ValidationError("No application to update.")
+    if len(changes) > MAX_BULK_CHANGES:
+        raise ValidationError(f"At most {MAX_BULK_CHANGES} applications can be updated at once.")
+
+    statuses = {}
+    for change in changes:
+        try:
+            application_id = int(change['id'])
+        except (KeyError, TypeError, ValueError):
+            raise ValidationError({'changes': [f"Invalid application ID in {change!r}."]})
+        if application_id in statuses:
+            raise ValidationError({'changes': [f"Application {application_id} is listed more than once."]})
+        statuses[application_id] = validate_status(change.get('status'))
+    return statuses
+
+
+def record_history(applications):
+    JobApplicationStatusHistory.objects.bulk_create(
+        [JobApplicationStatusHistory(application=application, status=application.status) for application in applications]
+    )
+
+
+def change_status(application, status):
+    """ Saves the new status of `application` and records it in its history. Returns whether it changed """
+    status = validate_status(status)
+    if application.status == status:
+        return False
+    with transaction.atomic():
+        application.status = status
+        application.save()
+        record_history([application])
+    return True
+
+
+def change_statuses(employer_id, statuses):
+    """
+    Applies `statuses`, {application id: status}, to applications of the employer's job posts.
+    Either all of them change or none: raises PermissionDenied, listing the IDs, when some
+    applications are not the employer's. Returns the applications whose status changed.
+    """
+    with transaction.atomic():
+        # Only the applications are locked, not the job posts joined by the employer filter
+        applications = list(
+            JobApplication.objects.select_for_update(of=('self',))
+            .filter(pk__in=statuses, job__employer_id=employer_id)
+            .only('id', 'job_id', 'status', 'status_updated_at')
+        )
+        missing = sorted(set(statuses) - {application.pk for application in applications})
+        if missing:
+            raise PermissionDenied(f"Applications not found among yours: {', '.join(map(str, missing))}.")
+
+        now = timezone.now()
+        changed = []
+        state_changes = []
+        for application in applications:
+            status = statuses[application.pk]
+            if application.status == status:
+                continue
+            previous = counters.application_state(application)
+            application.status = status
+            application.status_updated_at = now
+            state_changes.append((previous, counters.application_state(application)))
+            changed.append(application)
+
+        if changed:
+            JobApplication.objects.bulk_update(changed, ['status', 'status_updated_at'])
+            record_history(changed)
+            counters.record_application_changes(state_changes)
+            analytics.invalidate_funnel(employer_id)
+    return changed
@@ -0,0 +1,97 @@
+"""
+Shared response cache of the public job feed.
+
+Cached pages are keyed on the normalized query parameters and on a generation counter.
+Any change to a job post, or to the premium status of an employer, bumps the generation
+(see `signals.py`) so every cached page becomes unreachable at once and simply expires.
+Only the cache API is used (get/set/add/incr), so it works with the local-memory, file and
+database cache backends alike. Hits and misses are counted per worker in the request metrics
+(see `metrics.py`), not in the shared cache, to keep the lookup to a single cache read.
+"""
+import hashlib
+import time
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from . import metrics
+
+
+GENERATION_KEY = 'jobposts:generation'
+HITS_COUNTER = metrics.counter('jobpost_cache_hits', "Job feed pages served from the cache")
+MISSES_COUNTER = metrics.counter('jobpost_cache_misses', "Job feed pages rendered and stored in the cache")
+
+# Fields that depend on who is asking, they are blanked in the cache and filled in per request
+USER_FIELDS = {'is_favorite': False}
+
+
+def get_cache():
+    return caches[settings.JOBPOST_LIST_CACHE['ALIAS']]
+
+
+def get_generation():
+    cache = get_cache()
+    generation = cache.get(GENERATION_KEY)
+    if generation is None:
+        # Start from the clock, so a counter lost on eviction never comes back to an old generation
+        cache.add(GENERATION_KEY, time.time_ns(), timeout=None)
+        generation = cache.get(GENERATION_KEY)
+    return generation
+
+
+def bump_generation():
+    cache = get_cache()
+    try:
+        cache.incr(GENERATION_KEY)
+    except ValueError:
+        cache.set(GENERATION_KEY, time.time_ns(), timeout=None)
+
+
+def invalidate_job_feed():
+    """
+    Bumps the generation now, and again on commit so a reader racing the transaction cannot keep stale pages alive.
+    """
+    bump_generation()
+    transaction.on_commit(bump_generation)
+
+
+def list_cache_key(request):
+    """ Same parameters in any order, or with empty values, share the same key """
+    params = sorted(
+        (name, value)
+        for name in request.query_params
+        for value in request.query_params.getlist(name)
+        if value != ''
+    )
+    # Pagination links are absolute URLs, so the host is part of the key
+    url = f"{request.scheme}://{request.get_host()}{request.path}?{urlencode(params)}"
+    digest = hashlib.sha1(url.encode()).hexdigest()
+    return f"jobposts:list:{get_generation()}:{digest}"
+
+
+def get_cached_list(key):
+    data = get_cache().get(key)
+    metrics.increment(HITS_COUNTER if data is not None else MISSES_COUNTER)
+    return data
+
+
+def set_cached_list(key, data):
+    """ Stores a serialized page without its user-specific fields """
+    data = dict(data)
+    data['results'] = [{**item, **USER_FIELDS} for item in data['results']]
+    get_cache().set(key, data, timeout=settings.JOBPOST_LIST_CACHE['TIMEOUT'])
+
+
+def get_stats():
+    """ Hits and misses of all the workers since they started """
+    counters = metrics.get_counters()
+    hits, misses = counters[HITS_COUNTER], counters[MISSES_COUNTER]
+    total = hits + misses
+    return {
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / total if total else 0.0,
+        'generation': get_generation(),
+    }
@@ -0,0 +1,108 @@
+"""
+Application and favorite counters of the job posts.
+
+The employer dashboard shows, for each job post, its number of applications (in total and per
+status) and of favorites. Instead of counting them on every load, the counts are columns of
+`JobPost`, changed by the receivers in `signals.py` with F() expressions as applications and
+favorites are created, updated and deleted, so concurrent writes never lose an update.
+`JobPost.save()` never writes them back. Changes that bypass the signals (bulk_create, update())
+must call `record_application_changes()` themselves, or be followed by `reconcile()`, which
+recounts everything (see the reconcile_job_counters command).
+"""
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F
+
+from .models import JobApplication, JobFavorite, JobPost
+
+
+COUNTER_FIELDS = JobPost.COUNTER_FIELDS
+
+# Status of an application -> counter of the job post
+STATUS_FIELDS = {status: f'{status}_count' for status, label in JobApplication.STATUS_CHOICES}
+
+CHUNK_SIZE = 1000
+
+
+def application_state(application):
+    """ What an application counts for: a (job id, status) pair """
+    return application.job_id, application.status
+
+
+def apply_deltas(deltas, using='default'):
+    """ `deltas` maps job post ids to {counter: difference}, each job post takes a single UPDATE """
+    with transaction.atomic(using=using):
+        for job_id, delta in deltas.items():
+            delta = {field: value for field, value in delta.items() if value}
+            if delta:
+                JobPost.objects.using(using).filter(pk=job_id).update(**{field: F(field) + value for field, value in delta.items()})
+
+
+def record_application_changes(changes, using='default'):
+    """
+    Applies a list of (previous, current) changes of applications to the counters. Each state is a
+    (job id, status) pair, or None for an application that does not exist (yet, or anymore).
+    """
+    deltas = defaultdict(Counter)
+    for previous, current in changes:
+        if previous == current:
+            continue
+        for sign, state in ((-1, previous), (1, current)):
+            if state is None:
+                continue
+            job_id, status = state
+            deltas[job_id]['application_count'] += sign
+            if status in STATUS_FIELDS:
+                deltas[job_id][STATUS_FIELDS[status]] += sign
+    apply_deltas(deltas, using)
+
+
+def record_favorite(job_id, delta, using='default'):
+    apply_deltas({job_id: {'favorite_count': delta}}, using)
+
+
+def count(job_ids):
+    """ Actual counters of `job_ids`, from two grouped queries """
+    counts = {job_id: dict.fromkeys(COUNTER_FIELDS, 0) for job_id in job_ids}
+    applications = JobApplication.objects.filter(job_id__in=job_ids).values_list('job_id', 'status').annotate(total=Count('id')).order_by()
+    for job_id, status, total in applications:
+        counts[job_id]['application_count'] += total
+        if status in STATUS_FIELDS:
+            counts[job_id][STATUS_FIELDS[status]] += total
+    favorites = JobFavorite.objects.filter(job_post_id__in=job_ids).values_list('job_post_id').annotate(total=Count('id')).order_by()
+    for job_id, total in favorites:
+        counts[job_id]['favorite_count'] = total
+    return counts
+
+
+def reconcile(job_ids=None, chunk_size=CHUNK_SIZE):
+    """
+    Recounts the counters of `job_ids`, or of every job post, and repairs those that drifted.
+    Returns the number of job posts repaired.
+    """
+    if job_ids is None:
+        job_ids = JobPost.objects.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=chunk_size)
+    repaired = 0
+    chunk = []
+    for job_id in job_ids:
+        chunk.append(job_id)
+        if len(chunk) >= chunk_size:
+            repaired += reconcile_chunk(chunk)
+            chunk = []
+    if chunk:
+        repaired += reconcile_chunk(chunk)
+    return repaired
+
+
+def reconcile_chunk(job_ids):
+    with transaction.atomic():
+        # Locked while they are recounted, so that no application or favorite is counted twice or missed
+        stored = {
+            row[0]: dict(zip(COUNTER_FIELDS, row[1:]))
+            for row in JobPost.objects.select_for_update().filter(pk__in=job_ids).values_list('pk', *COUNTER_FIELDS)
+        }
+        actual = count(list(stored))
+        drifted = [JobPost(pk=job_id, **counts) for job_id, counts in actual.items() if counts != stored[job_id]]
+        JobPost.objects.bulk_update(drifted, COUNTER_FIELDS)
+    return len(drifted)
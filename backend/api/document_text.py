@@ -0,0 +1,226 @@
+"""
+Text of the CVs, cover letters and documents of the candidates, and the search of an employer
+through the candidates who applied to their job posts.
+
+Uploads are content-addressed (see `storage.py`), so the text is kept per blob in `DocumentText`:
+the same CV sent with ten applications is extracted once, and a replaced file is a new blob,
+extracted on its own. Only the PDF and DOCX blobs without a text of the current
+`EXTRACTOR_VERSION` are processed, and the text goes away with its blob.
+
+New blobs are extracted once their upload is committed, outside of the request: a background
+thread hands the files to a process pool, as parsing is CPU bound and would hold the GIL of the
+web worker, then stores the texts and adds them to `DOCUMENT_TEXT_INDEX` (see `search.py`). The
+`extract_document_texts` command processes whatever is still pending, such as the files uploaded
+before a new extractor version.
+
+A search covers the CV and cover letter of each application to the employer's job posts, and the
+current CV and additional documents of its candidate. Results are grouped by candidate and
+ranked by their best matching document.
+"""
+import logging
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+
+from .models import DocumentText, JobApplication, JobSeekerProfile, StoredBlob
+from .search import DOCUMENT_TEXT_INDEX, get_search_backend, tokenize
+from .storage import get_content_addressed_storage
+from .text_extraction import EXTENSIONS, EXTRACTOR_VERSION, extract_or_error
+
+
+logger = logging.getLogger(__name__)
+
+MAX_DOCUMENTS = 500  # Best matching documents considered per search
+SNIPPET_LENGTH = 200
+
+_executor = None
+_pool = None
+_executor_lock = threading.Lock()
+
+
+def is_extractable(name):
+    return name.lower().endswith(tuple(EXTENSIONS))
+
+
+def pending_blobs(names=None):
+    """ PDF and DOCX blobs, among `names` or all of them, without a text of the current extractor version """
+    extensions = Q()
+    for extension in EXTENSIONS:
+        extensions |= Q(name__iendswith=extension)
+    blobs = StoredBlob.objects.filter(extensions).exclude(document_text__extractor_version=EXTRACTOR_VERSION)
+    if names is not None:
+        blobs = blobs.filter(name__in=names)
+    return blobs
+
+
+def get_process_pool():
+    global _pool
+    with _executor_lock:
+        if _pool is None:
+            # Spawned rather than forked: the web worker has threads and open database connections
+            _pool = ProcessPoolExecutor(
+                max_workers=settings.DOCUMENT_TEXT['WORKERS'], mp_context=multiprocessing.get_context('spawn')
+            )
+    return _pool
+
+
+def extract_files(paths):
+    """ [(text, error)] of the files at `paths`, in the process pool, or in this process with no workers """
+    if not settings.DOCUMENT_TEXT['WORKERS']:
+        return [extract_or_error(path) for path in paths]
+    return list(get_process_pool().map(extract_or_error, paths))
+
+
+def extract_blobs(blobs):
+    """ Extracts, stores and indexes the text of `blobs`. Returns the number of failed extractions """
+    storage = get_content_addressed_storage()
+    results = extract_files([storage.path(blob.name) for blob in blobs])
+    failed = 0
+    with transaction.atomic():
+        # A blob collected during the extraction has nothing left to attach its text to
+        existing = set(StoredBlob.objects.filter(pk__in=[blob.pk for blob in blobs]).values_list('pk', flat=True))
+        ids = []
+        for blob, (text, error) in zip(blobs, results):
+            if blob.pk not in existing:
+                continue
+            row, created = DocumentText.objects.update_or_create(blob=blob, defaults={
+                'text': text,
+                'status': 'failed' if error else 'extracted',
+                'error': error or '',
+                'extractor_version': EXTRACTOR_VERSION,
+            })
+            ids.append(row.pk)
+            failed += bool(error)
+        get_search_backend().index_many(DOCUMENT_TEXT_INDEX, ids)
+    return failed
+
+
+def extract_pending(names=None, batch_size=None):
+    """ Extracts the pending blobs, among `names` or all of them. Returns (blobs processed, failed extractions) """
+    batch_size = batch_size or settings.DOCUMENT_TEXT['BATCH_SIZE']
+    processed = failed = last = 0
+    while True:
+        blobs = list(pending_blobs(names).filter(pk__gt=last).order_by('pk').only('id', 'name')[:batch_size])
+        if not blobs:
+            return processed, failed
+        failed += extract_blobs(blobs)
+        processed += len(blobs)
+        last = blobs[-1].pk
+
+
+def schedule_extraction(name):
+    """ Extracts the text of a new blob in the background, once it is committed """
+    if not is_extractable(name):
+        return
+
+    def submit():
+        get_executor().submit(extract_in_background, name)
+    transaction.on_commit(submit)
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # A single thread per web worker, the parsing itself happens in the process pool
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='document-text')
+    return _executor
+
+
+def extract_in_background(name):
+    from django.db import connection
+    try:
+        extract_pending([name])
+    except Exception:
+        logger.exception("Could not extract the text of %s", name)
+    finally:
+        connection.close()
+
+
+def snippet(text, terms):
+    """ The part of `text` around the first search term found in it """
+    lowered = text.lower()
+    positions = [position for position in (lowered.find(term) for term in terms) if position >= 0]
+    start = max(min(positions) - SNIPPET_LENGTH // 4, 0) if positions else 0
+    if start:
+        # Starts on a word
+        start = text.find(' ', start) + 1 or start
+    end = start + SNIPPET_LENGTH
+    return ('…' if start else '') + text[start:end].strip() + ('…' if end < len(text) else '')
+
+
+def search_applicants(employer_id, query, job_id=None, limit=20):
+    """
+    Candidates who applied to the job posts of the employer (or to `job_id` only) with documents matching
+    `query`, best first: [{candidate, score, matches: [{source, snippet}], applications: [...]}].
+    """
+    applications = JobApplication.objects.filter(job__employer_id=employer_id)
+    if job_id is not None:
+        applications = applications.filter(job_id=job_id)
+    Documents = JobSeekerProfile.additional_documents.through
+    candidate_documents = Documents.objects.filter(jobseekerprofile__in=applications.values('candidate'))
+
+    texts = DocumentText.objects.filter(status='extracted').filter(
+        Q(blob__name__in=applications.values('cv_file'))
+        | Q(blob__name__in=applications.values('cover_letter_file'))
+        | Q(blob__name__in=applications.values('candidate__cv'))
+        | Q(blob__name__in=candidate_documents.values('document__file'))
+    )
+    ranked = get_search_backend().search(DOCUMENT_TEXT_INDEX, texts, query).order_by('-search_rank')
+    ranks = {}
+    for row in ranked.values('blob__name', 'search_rank')[:MAX_DOCUMENTS]:
+        ranks[row['blob__name']] = row['search_rank']
+    if not ranks:
+        return []
+
+    candidates = {}
+
+    def entry(candidate_id):
+        return candidates.setdefault(candidate_id, {'matches': {}, 'applications': {}})
+
+    rows = applications.filter(
+        Q(cv_file__in=ranks) | Q(cover_letter_file__in=ranks) | Q(candidate__cv__in=ranks)
+        | Q(candidate__in=candidate_documents.filter(document__file__in=ranks).values('jobseekerprofile'))
+    ).values(
+        'id', 'job_id', 'job__title', 'status', 'applied_at', 'cv_file', 'cover_letter_file',
+        'candidate_id', 'candidate__first_name', 'candidate__last_name', 'candidate__cv',
+    ).order_by('-applied_at', '-id')
+    for row in rows:
+        for field, source in (('cv_file', 'cv'), ('cover_letter_file', 'cover_letter'), ('candidate__cv', 'cv')):
+            if row[field] in ranks:
+                entry(row['candidate_id'])['matches'].setdefault(row[field], source)
+        candidate = entry(row['candidate_id'])
+        candidate['name'] = (row['candidate__first_name'], row['candidate__last_name'])
+        candidate['applications'][row['id']] = {
+            'id': row['id'], 'job_id': row['job_id'], 'job_title': row['job__title'],
+            'status': row['status'], 'applied_at': row['applied_at'],
+        }
+    for candidate_id, name in candidate_documents.filter(document__file__in=ranks).values_list('jobseekerprofile_id', 'document__file'):
+        if candidate_id in candidates:
+            entry(candidate_id)['matches'].setdefault(name, 'document')
+
+    best = sorted(
+        candidates.items(),
+        key=lambda item: (-max(ranks[name] for name in item[1]['matches']), item[0]),
+    )[:limit]
+    shown = {name for candidate_id, candidate in best for name in candidate['matches']}
+    texts = dict(DocumentText.objects.filter(blob__name__in=shown).values_list('blob__name', 'text'))
+    terms = tokenize(query)
+    return [
+        {
+            'candidate_id': candidate_id,
+            'first_name': candidate['name'][0],
+            'last_name': candidate['name'][1],
+            'score': round(max(ranks[name] for name in candidate['matches']), 4),
+            'matches': [
+                {'source': source, 'snippet': snippet(texts.get(name, ''), terms), 'score': round(ranks[name], 4)}
+                for name, source in sorted(candidate['matches'].items(), key=lambda item: -ranks[item[0]])
+            ],
+            'applications': list(candidate['applications'].values()),
+        }
+        for candidate_id, candidate in best
+    ]
@@ -0,0 +1,91 @@
+"""
+Streamed exports of the job applications of an employer, as CSV or JSON Lines.
+
+Rows are fetched with `.iterator()`, which uses a server-side cursor on PostgreSQL, and are
+encoded one at a time as the response is sent. Neither the rows nor the file are ever held in
+memory as a whole, whatever their number. In the CSV, text typed by the candidates that a
+spreadsheet would run as a formula is quoted.
+"""
+import csv
+import datetime
+import json
+
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+
+
+CHUNK_SIZE = 2000
+
+# Column of the export -> lookup on JobApplication
+APPLICATION_FIELDS = [
+    ('application_id', 'id'),
+    ('job_id', 'job_id'),
+    ('job_title', 'job__title'),
+    ('job_location', 'job__location'),
+    ('status', 'status'),
+    ('applied_at', 'applied_at'),
+    ('status_updated_at', 'status_updated_at'),
+    ('candidate_id', 'candidate_id'),
+    ('candidate_first_name', 'candidate__first_name'),
+    ('candidate_last_name', 'candidate__last_name'),
+    ('candidate_email', 'candidate__email'),
+    ('candidate_phone', 'candidate__phone'),
+    ('candidate_address', 'candidate__address'),
+    ('candidate_postal_code', 'candidate__postal_code'),
+    ('candidate_city', 'candidate__city'),
+    ('candidate_is_premium', 'candidate__is_premium'),
+]
+
+CONTENT_TYPES = {
+    'csv': 'text/csv; charset=utf-8',
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+}
+
+
+class Echo:
+    """ File-like object that hands back what csv.writer writes, instead of storing it """
+    def write(self, value):
+        return value
+
+
+def iso_dates(row):
+    """ Dates in ISO 8601, as ATS imports expect them """
+    return [value.isoformat() if isinstance(value, datetime.date) else value for value in row]
+
+
+# Spreadsheets run a cell starting with one of these as a formula, whatever the candidate typed in it
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+
+def escape_formula(value):
+    """ Quotes a text cell that a spreadsheet would evaluate, so it is shown as typed """
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def csv_lines(headers, rows):
+    writer = csv.writer(Echo())
+    yield writer.writerow(headers)
+    for row in rows:
+        yield writer.writerow([escape_formula(value) for value in iso_dates(row)])
+
+
+def jsonl_lines(headers, rows):
+    for row in rows:
+        yield json.dumps(dict(zip(headers, iso_dates(row)))) + "\n"
+
+
+ENCODERS = {
+    'csv': csv_lines,
+    'jsonl': jsonl_lines,
+}
+
+
+def stream_applications(queryset, format, filename):
+    """ Streams the applications of `queryset` in `format` ('csv' or 'jsonl') as a file download """
+    headers = [header for header, lookup in APPLICATION_FIELDS]
+    rows = queryset.values_list(*[lookup for header, lookup in APPLICATION_FIELDS]).iterator(chunk_size=CHUNK_SIZE)
+    response = StreamingHttpResponse(ENCODERS[format](headers, rows), content_type=CONTENT_TYPES[format])
+    response['Content-Disposition'] = f'attachment; filename="{filename}-{timezone.localdate():%Y%m%d}.{format}"'
+    return response
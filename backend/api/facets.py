@@ -0,0 +1,121 @@
+"""
+Facet counts of the job feed: how many job posts there are per location, salary band and
+experience level, for the filters currently applied.
+
+All three facets come from a single GROUP BY on (location, salary band, experience level) over
+the filtered job posts, the bands being CASE expressions, and are summed up here. Each band
+carries the filter parameters that select it, so the client can offer it as a link. The facets
+of the unfiltered feed, which every visitor sees first, are kept in the job feed cache under
+its generation (see `cache.py`), so any change to a job post drops them along with the pages.
+"""
+from django.conf import settings
+from django.db.models import Case, Count, IntegerField, Value, When
+
+from . import cache
+from .filters import JobPostFilter
+
+
+LOCATION_LIMIT = 20
+
+# (label, lower bound included, upper bound excluded) on salary_min, the salary a job at least pays
+SALARY_BANDS = [
+    ('Under 50k', None, 50000),
+    ('50k - 80k', 50000, 80000),
+    ('80k - 100k', 80000, 100000),
+    ('100k - 130k', 100000, 130000),
+    ('130k and more', 130000, None),
+]
+
+# (label, minimum, maximum) years of experience, both included
+EXPERIENCE_BANDS = [
+    ('0 - 1 years', 0, 1),
+    ('2 - 4 years', 2, 4),
+    ('5 - 9 years', 5, 9),
+    ('10 years and more', 10, None),
+]
+
+
+def unfiltered_key():
+    return f"jobposts:facets:{cache.get_generation()}"
+
+
+def wants_facets(request):
+    return request.query_params.get('facets', '').lower() in ('1', 'true', 'yes')
+
+
+def has_filters(request):
+    return any(request.query_params.get(name) for name in JobPostFilter.base_filters)
+
+
+def band_case(field, bands, upper_included):
+    """ Index of the band of `field`, the last band taking everything above """
+    lookup = 'lte' if upper_included else 'lt'
+    return Case(
+        *[
+            When(**{f'{field}__{lookup}': upper}, then=Value(index))
+            for index, (label, lower, upper) in enumerate(bands) if upper is not None
+        ],
+        default=Value(len(bands) - 1),
+        output_field=IntegerField(),
+    )
+
+
+def salary_filters(lower, upper):
+    filters = {}
+    if lower is not None:
+        filters['salary_min'] = lower
+    if upper is not None:
+        filters['salary_min_below'] = upper
+    return filters
+
+
+def experience_filters(lower, upper):
+    filters = {'experience_min': lower}
+    if upper is not None:
+        filters['experience_max'] = upper
+    return filters
+
+
+def compute_facets(queryset):
+    rows = (
+        queryset
+        .annotate(
+            salary_band=band_case('salary_min', SALARY_BANDS, upper_included=False),
+            experience_band=band_case('years_experience', EXPERIENCE_BANDS, upper_included=True),
+        )
+        .values_list('location', 'salary_band', 'experience_band')
+        .annotate(count=Count('id'))
+        .order_by()
+    )
+    locations = {}
+    salaries = [0] * len(SALARY_BANDS)
+    experiences = [0] * len(EXPERIENCE_BANDS)
+    for location, salary_band, experience_band, count in rows:
+        locations[location] = locations.get(location, 0) + count
+        salaries[salary_band] += count
+        experiences[experience_band] += count
+
+    top_locations = sorted(locations.items(), key=lambda item: (-item[1], item[0]))[:LOCATION_LIMIT]
+    return {
+        'location': [{'value': location, 'count': count, 'filters': {'location': location}} for location, count in top_locations],
+        'salary': [
+            {'label': label, 'count': count, 'filters': salary_filters(lower, upper)}
+            for (label, lower, upper), count in zip(SALARY_BANDS, salaries)
+        ],
+        'years_experience': [
+            {'label': label, 'count': count, 'filters': experience_filters(lower, upper)}
+            for (label, lower, upper), count in zip(EXPERIENCE_BANDS, experiences)
+        ],
+    }
+
+
+def get_facets(request, queryset):
+    """ Facets of `queryset`, the job posts matching the filters of `request` """
+    if has_filters(request):
+        return compute_facets(queryset)
+    key = unfiltered_key()
+    facets = cache.get_cache().get(key)
+    if facets is None:
+        facets = compute_facets(queryset)
+        cache.get_cache().set(key, facets, timeout=settings.JOBPOST_LIST_CACHE['TIMEOUT'])
+    return facets
@@ -1,12 +1,66 @@
 from django_filters import rest_framework as filters
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import OrderingFilter
+from . import geo
 from .models import JobPost
+from .search import JOB_POST_INDEX, get_search_backend
+
+DEFAULT_RADIUS_KM = 25
+MAX_RADIUS_KM = 200
 
 class JobPostFilter(filters.FilterSet):
+    q = filters.CharFilter(method="filter_search")
     title = filters.CharFilter(field_name="title", lookup_expr="icontains")
     location = filters.CharFilter(field_name="location", lookup_expr="icontains")
     salary_min = filters.NumberFilter(field_name="salary_min", lookup_expr="gte")
-    created_after = filters.DateFilter(field_name="created_at", lookup_expr="gte") 
+    # Upper bound of a salary band of the facets, see facets.py
+    salary_min_below = filters.NumberFilter(field_name="salary_min", lookup_expr="lt")
+    experience_min = filters.NumberFilter(field_name="years_experience", lookup_expr="gte")
+    experience_max = filters.NumberFilter(field_name="years_experience", lookup_expr="lte")
+    created_after = filters.DateFilter(field_name="created_at", lookup_expr="gte")
+    # Job posts within radius_km of a postal code or a locality, nearest first. Pages are shared through the job
+    # feed cache, so the point is always given by the client, never read from the profile of the caller
+    near = filters.CharFilter(method="filter_near")
+    radius_km = filters.NumberFilter(method="filter_radius")
 
     class Meta:
         model = JobPost
-        fields = ['title', 'location', 'salary_min', 'created_after']
\ No newline at end of file
+        fields = [
+            'q', 'title', 'location', 'salary_min', 'salary_min_below', 'experience_min', 'experience_max', 'created_after',
+            'near', 'radius_km',
+        ]
+
+    def filter_search(self, queryset, name, value):
+        # Full-text search on title, description, location and company name, see search.py
+        return get_search_backend(queryset.db).search(JOB_POST_INDEX, queryset, value)
+
+    def filter_near(self, queryset, name, value):
+        point = geo.locate(postal_code=value) if value.strip().isdigit() else geo.locate(city=value)
+        if point is None:
+            raise ValidationError({'near': [f"Unknown location: {value}."]})
+        radius_km = self.form.cleaned_data.get('radius_km') or DEFAULT_RADIUS_KM
+        return geo.within_radius(queryset, *point, min(float(radius_km), MAX_RADIUS_KM))
+
+    def filter_radius(self, queryset, name, value):
+        # Read by filter_near
+        return queryset
+
+
+class RelevanceOrderingFilter(OrderingFilter):
+    """
+    Puts the best search matches first, then the nearest job posts of a radius search, when the client does not
+    ask for a specific ordering.
+    """
+    relevance_field = 'search_rank'
+    distance_field = 'distance_km'
+
+    def get_ordering(self, request, queryset, view):
+        ordering = super().get_ordering(request, queryset, view)
+        if request.query_params.get(self.ordering_param):
+            return ordering
+        ranking = []
+        if self.relevance_field in queryset.query.annotations:
+            ranking.append('-' + self.relevance_field)
+        if self.distance_field in queryset.query.annotations:
+            ranking.append(self.distance_field)
+        return [*ranking, *(ordering or [])] if ranking else ordering
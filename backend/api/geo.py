@@ -0,0 +1,144 @@
+"""
+Offline geocoding of Swiss postal codes and localities, and radius search on the job feed.
+
+The gazetteer is a CSV file shipped with the code (`GAZETTEER_PATH`, one row per postal code
+with its locality, canton, coordinates and other names of the locality), loaded once per
+process: no network service is involved. Job posts and profiles are geocoded as they are saved
+(see `signals.py`) into indexed latitude/longitude columns. A radius search first keeps the
+rows inside the bounding box of the circle, which the index on (latitude, longitude) answers,
+then computes the exact haversine distance of those rows only, to drop the corners of the box
+and to sort by distance.
+"""
+import csv
+import math
+import re
+import unicodedata
+from functools import lru_cache
+
+from django.conf import settings
+from django.db.models import F, FloatField, Value
+from django.db.models.functions import ASin, Cos, Power, Radians, Sin, Sqrt
+
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = 111.32
+
+POSTAL_CODE = re.compile(r'\b(\d{4})\b')
+
+
+def normalize(name):
+    """ 'St. Gallen', 'st gallen' and 'ST-GALLEN' are the same locality """
+    name = unicodedata.normalize('NFKD', name or '').encode('ascii', 'ignore').decode().lower()
+    return ' '.join(re.findall(r'[a-z0-9]+', name))
+
+
+@lru_cache(maxsize=1)
+def load_gazetteer():
+    """ ({postal code: (latitude, longitude)}, {normalized locality name: (latitude, longitude)}) """
+    postal_codes, names = {}, {}
+    with open(settings.GAZETTEER_PATH, newline='', encoding='utf-8') as gazetteer:
+        for row in csv.DictReader(gazetteer):
+            point = (float(row['latitude']), float(row['longitude']))
+            postal_codes[row['postal_code']] = point
+            # A locality spread over several postal codes is placed at its first one
+            for name in [row['city'], *filter(None, (row.get('aliases') or '').split('|'))]:
+                names.setdefault(normalize(name), point)
+    return postal_codes, names
+
+
+def locate_postal_code(postal_code):
+    postal_codes, names = load_gazetteer()
+    postal_code = (postal_code or '').strip()
+    if postal_code in postal_codes:
+        return postal_codes[postal_code]
+    # Swiss postal codes are grouped by area, a code missing from the gazetteer is close to its neighbours
+    neighbours = [point for code, point in postal_codes.items() if code[:3] == postal_code[:3]] if len(postal_code) == 4 else []
+    if neighbours:
+        return (sum(lat for lat, lon in neighbours) / len(neighbours), sum(lon for lat, lon in neighbours) / len(neighbours))
+    return None
+
+
+def locate_name(name):
+    postal_codes, names = load_gazetteer()
+    normalized = normalize(name)
+    if normalized in names:
+        return names[normalized]
+    # "Lausanne, VD", "Biel (BE)", "Zürich / Remote", "Sion VS": the first part that starts with a known locality
+    for part in re.split(r'[,;/()]', name or ''):
+        words = normalize(part).split()
+        for length in range(len(words), 0, -1):
+            if ' '.join(words[:length]) in names:
+                return names[' '.join(words[:length])]
+    return None
+
+
+def locate(postal_code=None, city=None):
+    """ (latitude, longitude) of a postal code and/or locality, or of a free text location, or None """
+    point = None
+    if postal_code:
+        point = locate_postal_code(postal_code)
+    if point is None and city:
+        match = POSTAL_CODE.search(city)
+        point = locate_name(city) or (locate_postal_code(match.group(1)) if match else None)
+    return point
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """ (min latitude, max latitude, min longitude, max longitude) of the square around the circle """
+    delta_latitude = radius_km / KM_PER_DEGREE
+    delta_longitude = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 0.01))
+    return latitude - delta_latitude, latitude + delta_latitude, longitude - delta_longitude, longitude + delta_longitude
+
+
+def distance_expression(latitude, longitude):
+    """ Haversine distance in km between the latitude/longitude columns of a row and a point """
+    half_delta_latitude = (Radians(F('latitude')) - Radians(Value(latitude))) / 2
+    half_delta_longitude = (Radians(F('longitude')) - Radians(Value(longitude))) / 2
+    return 2 * EARTH_RADIUS_KM * ASin(Sqrt(
+        Power(Sin(half_delta_latitude), 2)
+        + math.cos(math.radians(latitude)) * Cos(Radians(F('latitude'))) * Power(Sin(half_delta_longitude), 2)
+    ), output_field=FloatField())
+
+
+def within_radius(queryset, latitude, longitude, radius_km):
+    """ Rows of `queryset` within `radius_km` of the point, annotated with their `distance_km` """
+    min_latitude, max_latitude, min_longitude, max_longitude = bounding_box(latitude, longitude, radius_km)
+    return (
+        queryset
+        .filter(latitude__range=(min_latitude, max_latitude), longitude__range=(min_longitude, max_longitude))
+        .annotate(distance_km=distance_expression(latitude, longitude))
+        .filter(distance_km__lte=radius_km)
+    )
+
+
+def geocode_profile(profile):
+    """ Sets the coordinates of a job seeker from their address, or of an employer from their company address """
+    if hasattr(profile, 'company_postal_code'):
+        point = locate(profile.company_postal_code, profile.company_city)
+    else:
+        point = locate(profile.postal_code, profile.city)
+    profile.latitude, profile.longitude = point or (None, None)
+
+
+def geocode_job_post(job_post, employer=None):
+    """ Sets the coordinates of a job post from its location, or else from the company address of `employer` """
+    point = locate(city=job_post.location)
+    if point is None and employer is not None:
+        point = locate(employer.company_postal_code, employer.company_city)
+    job_post.latitude, job_post.longitude = point or (None, None)
+
+
+def geocode_rows(queryset, geocode, chunk_size=500):
+    """ Recomputes the coordinates of the rows of `queryset` with `geocode(row)`. Returns the number of rows changed """
+    changed, count = [], 0
+    for row in queryset.iterator(chunk_size=chunk_size):
+        previous = (row.latitude, row.longitude)
+        geocode(row)
+        if (row.latitude, row.longitude) != previous:
+            changed.append(row)
+        if len(changed) >= chunk_size:
+            queryset.model._base_manager.bulk_update(changed, ['latitude', 'longitude'])
+            count, changed = count + len(changed), []
+    if changed:
+        queryset.model._base_manager.bulk_update(changed, ['latitude', 'longitude'])
+    return count + len(changed)
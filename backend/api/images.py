@@ -0,0 +1,165 @@
+"""
+Resized variants of the uploaded images (profile pictures and company logos).
+
+Each variant is stored next to the original, under the full file name and the first digits of the
+SHA-256 of its content (`company_logos/abc.png` -> `company_logos/variants/abc.png.1a2b3c4d.thumb.webp`),
+so `abc.png` and `abc.jpg` get their own variants, and a new file stored under an old name never
+reuses the variants of the previous one. Variants are generated in a thread pool once the upload is
+committed (see `signals.py`), re-encoded without any metadata. Until a variant exists, the original
+is served instead, and the job feed cache is invalidated once the variants of a job post logo are
+ready so the cached pages switch to them.
+
+Only the background task reads and hashes the original. It writes the digest to a small file next
+to the variants (`company_logos/variants/abc.png.digest`) once they are all stored, and the digest
+is kept in the cache, so serializing a page of images reads neither the storage nor the originals.
+A file uploaded under the name of a deleted image drops that digest before its own variants are made.
+"""
+import hashlib
+import io
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.cache import cache as shared_cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import transaction
+from PIL import Image, ImageOps
+
+from . import cache
+
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.IMAGE_VARIANTS['WORKERS'], thread_name_prefix='image-variants'
+            )
+    return _executor
+
+
+def variant_name(name, variant, digest):
+    directory, filename = os.path.split(name)
+    extension = settings.IMAGE_VARIANTS['FORMAT'].lower()
+    return os.path.join(directory, 'variants', f"{filename}.{digest}.{variant}.{extension}")
+
+
+def digest_name(name):
+    directory, filename = os.path.split(name)
+    return os.path.join(directory, 'variants', f"{filename}.digest")
+
+
+def readiness_key(name):
+    return f"image-variants:{name}"
+
+
+def mark_ready(name, digest):
+    # The pending state is checked again after a while, in case another process generated the variants
+    timeout = None if digest else settings.IMAGE_VARIANTS['PENDING_TIMEOUT']
+    shared_cache.set(readiness_key(name), digest or '', timeout=timeout)
+
+
+def find_variants(name, storage=default_storage):
+    """ Digest of the image stored under `name` if all its variants exist, else None. Updates the cached state """
+    try:
+        with storage.open(digest_name(name), 'rb') as file:
+            digest = file.read().decode() or None
+    except (OSError, UnicodeDecodeError):
+        digest = None
+    mark_ready(name, digest)
+    return digest
+
+
+def forget_variants(name, storage=default_storage):
+    """ Drops the digest of the variants of a previous image stored under `name` """
+    storage.delete(digest_name(name))
+    mark_ready(name, None)
+
+
+def ready_digest(name, storage=default_storage):
+    """ Same as `find_variants`, from the cache when possible """
+    digest = shared_cache.get(readiness_key(name))
+    if digest is None:
+        return find_variants(name, storage)
+    return digest or None
+
+
+def variant_url(file, variant, storage=default_storage):
+    """ URL of the `variant` of an image field file, or of the original while the variant is not ready """
+    if not file:
+        return None
+    digest = ready_digest(file.name, storage)
+    if digest is None:
+        return file.url
+    return storage.url(variant_name(file.name, variant, digest))
+
+
+def render_variant(image, size):
+    """ Fits `image` in a `size` x `size` box and encodes it, dropping EXIF, ICC and any other metadata """
+    config = settings.IMAGE_VARIANTS
+    image = image.copy()
+    image.thumbnail((size, size), Image.Resampling.LANCZOS)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA' if 'transparency' in image.info or image.mode in ('LA', 'PA') else 'RGB')
+    output = io.BytesIO()
+    image.save(output, format=config['FORMAT'], quality=config['QUALITY'], method=4)
+    return output.getvalue()
+
+
+def generate_variants(name, storage=default_storage, force=False):
+    """
+    Writes every variant of the image stored under `name`. Returns the names of the variants written.
+    """
+    sizes = settings.IMAGE_VARIANTS['SIZES']
+    if not force and ready_digest(name, storage) is not None:
+        return []
+    with storage.open(name, 'rb') as source:
+        content = source.read()
+    digest = hashlib.sha256(content).hexdigest()[:8]
+    image = Image.open(io.BytesIO(content))
+    # Apply the camera orientation before the EXIF data is dropped
+    image = ImageOps.exif_transpose(image)
+    image.load()
+
+    written = []
+    for variant, size in sizes.items():
+        target = variant_name(name, variant, digest)
+        if storage.exists(target):
+            storage.delete(target)
+        storage.save(target, ContentFile(render_variant(image, size)))
+        written.append(target)
+    # Written last, the digest file tells that every variant is stored
+    storage.delete(digest_name(name))
+    storage.save(digest_name(name), ContentFile(digest.encode()))
+    mark_ready(name, digest)
+    return written
+
+
+def _generate_in_background(name, in_job_feed, new_file):
+    try:
+        if new_file:
+            forget_variants(name)
+        if generate_variants(name) and in_job_feed:
+            # Cached pages hold the URL of the original
+            cache.invalidate_job_feed()
+    except Exception:
+        # The original is still served, the backfill command can retry later
+        logger.exception("Could not generate the variants of %s", name)
+
+
+def schedule_variants(name, in_job_feed=False, new_file=False):
+    """
+    Generates the missing variants of `name` in the worker pool, once the current transaction is committed.
+    `in_job_feed` tells that the image is shown in the job feed, whose cached pages must then be refreshed.
+    `new_file` tells that the file was just uploaded, maybe under the name of a deleted image.
+    """
+    transaction.on_commit(lambda: get_executor().submit(_generate_in_background, name, in_job_feed, new_file))
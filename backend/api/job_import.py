@@ -0,0 +1,155 @@
+"""
+Bulk import of job posts from a CSV or JSON Lines stream.
+
+Rows are read one at a time and validated with the rules of `JobPostSerializer`. Valid rows are
+inserted in chunks. For each chunk, one query finds the titles the employer already uses, and
+one `bulk_create` runs in its own transaction. Only the current chunk and the seen titles are
+kept in memory, so files of any size can be imported.
+"""
+import codecs
+import csv
+import json
+
+from django.db import transaction
+
+from . import cache, geo, recommendations
+from .models import JobPost
+from .search import JOB_POST_INDEX, get_search_backend
+from .serializers import JobPostSerializer
+
+
+CHUNK_SIZE = 500
+
+# The report lists the first errors only, the rest are counted
+MAX_REPORTED_ERRORS = 1000
+
+FORMATS = {
+    'csv': ['text/csv', 'application/csv', '.csv'],
+    'jsonl': ['application/x-ndjson', 'application/jsonl', 'application/x-jsonlines', '.jsonl', '.ndjson'],
+}
+
+
+class JobPostImportSerializer(JobPostSerializer):
+    """ Same validation rules as JobPostSerializer, the employer fields are filled in by the importer """
+    company_logo = None
+
+    class Meta(JobPostSerializer.Meta):
+        fields = None
+        exclude = ['employer', 'company_name', 'company_logo', 'is_visible', *JobPost.COUNTER_FIELDS]
+
+
+def detect_format(content_type='', filename=''):
+    """ Returns 'csv' or 'jsonl' from a content type or a file name, None if neither matches """
+    content_type = (content_type or '').split(';')[0].strip().lower()
+    filename = (filename or '').lower()
+    for name, markers in FORMATS.items():
+        if content_type in markers or any(filename.endswith(marker) for marker in markers if marker.startswith('.')):
+            return name
+    return None
+
+
+def read_lines(stream):
+    """ Decodes a binary stream line by line, with or without a byte order mark """
+    return codecs.getreader('utf-8-sig')(stream)
+
+
+def read_rows(stream, format):
+    """
+    Yields (line number, row, error) for each record of the stream. Either `row` or `error` is None.
+    """
+    lines = read_lines(stream)
+    if format == 'csv':
+        reader = csv.DictReader(lines)
+        for row in reader:
+            if None in row:
+                yield reader.line_num, None, "Too many values on this line."
+            else:
+                yield reader.line_num, row, None
+        return
+
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as error:
+            yield line_number, None, f"Invalid JSON: {error}"
+            continue
+        if not isinstance(row, dict):
+            yield line_number, None, "Each line must be a JSON object."
+            continue
+        yield line_number, row, None
+
+
+class JobPostImporter:
+    def __init__(self, employer, chunk_size=CHUNK_SIZE):
+        self.employer = employer
+        self.chunk_size = chunk_size
+        self.created = 0
+        self.duplicates = 0
+        self.error_count = 0
+        self.errors = []
+        self.seen_titles = set()
+        self.search = get_search_backend()
+
+    def add_error(self, line, errors):
+        self.error_count += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({'line': line, 'errors': errors})
+
+    def run(self, stream, format):
+        chunk = []
+        for line, row, error in read_rows(stream, format):
+            if error:
+                self.add_error(line, {'non_field_errors': [error]})
+                continue
+            serializer = JobPostImportSerializer(data=row)
+            if not serializer.is_valid():
+                self.add_error(line, serializer.errors)
+                continue
+            chunk.append((line, serializer.validated_data))
+            if len(chunk) >= self.chunk_size:
+                self.insert(chunk)
+                chunk = []
+        if chunk:
+            self.insert(chunk)
+        if self.created:
+            cache.invalidate_job_feed()
+        return self.report()
+
+    def insert(self, chunk):
+        titles = {data['title'] for line, data in chunk}
+        # Same rule as a single job post: the employer cannot post the same title twice
+        existing = set(JobPost.objects.filter(employer=self.employer, title__in=titles).values_list('title', flat=True))
+
+        job_posts = []
+        for line, data in chunk:
+            if data['title'] in existing or data['title'] in self.seen_titles:
+                self.duplicates += 1
+                self.add_error(line, {'title': ["A similar job posting already exists."]})
+                continue
+            self.seen_titles.add(data['title'])
+            job_post = JobPost(
+                **data, is_visible=True, employer=self.employer, company_name=self.employer.company_name,
+                employer_is_premium=self.employer.is_premium,
+            )
+            if self.employer.company_logo:
+                job_post.company_logo = self.employer.company_logo
+            geo.geocode_job_post(job_post, self.employer)
+            job_posts.append(job_post)
+
+        with transaction.atomic():
+            # bulk_create skips the signals (hence the employer fields and geocoding above), the search index
+            # and the recommendations are updated for the whole chunk at once
+            created = JobPost.objects.bulk_create(job_posts)
+            self.search.index_many(JOB_POST_INDEX, [job_post.pk for job_post in created])
+            recommendations.schedule_update([job_post.pk for job_post in created])
+        self.created += len(created)
+
+    def report(self):
+        return {
+            'created': self.created,
+            'duplicates': self.duplicates,
+            'error_count': self.error_count,
+            'errors': sorted(self.errors, key=lambda error: error['line']),
+        }
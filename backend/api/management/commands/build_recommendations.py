@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from backend.api import recommendations
+
+
+class Command(BaseCommand):
+    help = 'Fits the job recommendation model on every job post and replaces the current one'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING("=> Building the recommendation model..."))
+        count = recommendations.build(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"=> {count} job posts in the model"))
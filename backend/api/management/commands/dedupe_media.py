@@ -0,0 +1,87 @@
+import hashlib
+import os
+from collections import Counter
+
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from backend.api import storage
+from backend.api.models import ChunkedUpload, Document, JobApplication, JobSeekerProfile, StoredBlob
+
+
+BLOB_FIELDS = [
+    (ChunkedUpload, 'file'),
+    (Document, 'file'),
+    (JobSeekerProfile, 'cv'),
+    (JobApplication, 'cv_file'),
+    (JobApplication, 'cover_letter_file'),
+]
+
+
+class Command(BaseCommand):
+    help = 'Moves the existing CVs and documents to the content-addressed storage, and recounts the blob references'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be moved')
+        parser.add_argument('--keep-originals', action='store_true', help='Leave the original files on disk')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.MIGRATE_HEADING("=== Media Deduplication Starting ==="))
+        cas = storage.content_addressed_storage
+        moved = {}  # Original name -> blob name, each file is only hashed once
+        missing = 0
+
+        for model, field in BLOB_FIELDS:
+            self.stdout.write(self.style.WARNING(f"=> Moving {model.__name__}.{field}..."))
+            rows = model.objects.exclude(**{f'{field}__startswith': f'{storage.BLOB_PREFIX}/'}).exclude(**{field: ''}).exclude(**{f'{field}__isnull': True})
+            for pk, name in rows.values_list('pk', field).iterator():
+                if name not in moved:
+                    if not os.path.exists(cas.path(name)):
+                        missing += 1
+                        self.stdout.write(self.style.ERROR(f"   Missing file {name} ({model.__name__} {pk})"))
+                        continue
+                    if options['dry_run']:
+                        moved[name] = self.digest(cas.path(name))
+                        continue
+                    with open(cas.path(name), 'rb') as original:
+                        moved[name] = cas.save(name, File(original))
+                if not options['dry_run']:
+                    # update() rather than save(), the references are recounted below
+                    model.objects.filter(pk=pk).update(**{field: moved[name]})
+
+        sizes = {name: os.path.getsize(cas.path(name)) for name in moved}
+        blobs = {blob: sizes[name] for name, blob in moved.items()}
+        original_bytes, blob_bytes = sum(sizes.values()), sum(blobs.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"=> {len(moved)} files moved to {len(blobs)} blobs, {original_bytes - blob_bytes} bytes saved, {missing} missing"
+        ))
+        if options['dry_run']:
+            return
+
+        if not options['keep_originals']:
+            for name in moved:
+                if os.path.exists(cas.path(name)):
+                    os.remove(cas.path(name))
+
+        self.stdout.write(self.style.WARNING("=> Recounting blob references..."))
+        with transaction.atomic():
+            references = Counter()
+            for model, field in BLOB_FIELDS:
+                references.update(
+                    model.objects.filter(**{f'{field}__startswith': f'{storage.BLOB_PREFIX}/'}).values_list(field, flat=True).iterator()
+                )
+            for blob in StoredBlob.objects.all().iterator():
+                count = references.get(blob.name, 0)
+                if blob.reference_count != count:
+                    StoredBlob.objects.filter(pk=blob.pk).update(reference_count=count)
+        removed = storage.collect_blobs()
+        self.stdout.write(self.style.SUCCESS(f"=> References recounted, {removed} unreferenced blobs removed"))
+        self.stdout.write(self.style.MIGRATE_HEADING("=== Media Deduplication Completed ==="))
+
+    def digest(self, path):
+        sha256 = hashlib.sha256()
+        with open(path, 'rb') as original:
+            for chunk in iter(lambda: original.read(storage.CHUNK_SIZE), b''):
+                sha256.update(chunk)
+        return sha256.hexdigest()
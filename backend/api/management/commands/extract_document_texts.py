@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from backend.api import document_text
+
+
+class Command(BaseCommand):
+    help = 'Extracts the text of the PDF and DOCX files not extracted yet, or by an older extractor version'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING("=> Extracting the text of the pending documents..."))
+        processed, failed = document_text.extract_pending(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"=> {processed} documents processed, {failed} could not be read"))
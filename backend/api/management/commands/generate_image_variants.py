@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from backend.api import images
+from backend.api.models import EmployerProfile, JobPost, JobSeekerProfile
+
+
+class Command(BaseCommand):
+    help = 'Generates the missing resized variants of the profile pictures and company logos'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Regenerate the variants that already exist')
+
+    def handle(self, *args, **options):
+        names = set()
+        for model, field in [(JobSeekerProfile, 'profile_picture'), (EmployerProfile, 'company_logo'), (JobPost, 'company_logo')]:
+            names.update(model.objects.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True}).values_list(field, flat=True).distinct())
+
+        self.stdout.write(self.style.WARNING(f"=> Generating variants of {len(names)} images..."))
+        executor = images.get_executor()
+        futures = {name: executor.submit(images.generate_variants, name, force=options['force']) for name in sorted(names)}
+        generated = 0
+        for name, future in futures.items():
+            try:
+                if future.result():
+                    generated += 1
+            except Exception as error:
+                self.stdout.write(self.style.ERROR(f"=> {name}: {error}"))
+        self.stdout.write(self.style.SUCCESS(f"=> Variants generated for {generated} images"))
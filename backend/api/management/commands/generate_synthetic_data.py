@@ -0,0 +1,300 @@
+import contextlib
+import datetime
+import itertools
+import random
+import time
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from backend.api import cache, counters, geo
+from backend.api.models import EmployerProfile, JobApplication, JobPost, JobSeekerProfile, Message
+from backend.api.search import JOB_POST_INDEX, get_search_backend
+
+
+CITIES = [
+    ("Zürich", "8001"), ("Genève", "1201"), ("Basel", "4001"), ("Lausanne", "1003"), ("Bern", "3011"),
+    ("Winterthur", "8400"), ("Luzern", "6003"), ("St. Gallen", "9000"), ("Lugano", "6900"), ("Biel/Bienne", "2502"),
+    ("Thun", "3600"), ("Fribourg", "1700"), ("Neuchâtel", "2000"), ("Sion", "1950"), ("Chur", "7000"),
+]
+COMPANIES = [
+    "Helvetia Systems", "Alpine Data", "Léman Logistics", "Rhein Pharma", "Jura Robotics", "Matterhorn Finance",
+    "Ticino Foods", "Aare Energy", "Limmat Software", "Säntis Health", "Pilatus Engineering", "Gotthard Transport",
+]
+ROLES = [
+    "Software Engineer", "Data Analyst", "Project Manager", "Accountant", "Sales Representative", "Nurse",
+    "Mechanical Engineer", "Customer Support Agent", "Marketing Specialist", "DevOps Engineer", "HR Officer",
+    "Logistics Coordinator", "Electrician", "Pharmacist", "Graphic Designer", "Teacher", "Chef", "Architect",
+]
+LEVELS = ["Junior", "", "", "Senior", "Lead"]
+FIRST_NAMES = ["Luca", "Noah", "Léa", "Mia", "Elias", "Emma", "Matteo", "Sofia", "Nina", "Louis", "Anna", "Jonas", "Chiara", "Yann", "Laura"]
+LAST_NAMES = ["Müller", "Meier", "Schmid", "Keller", "Weber", "Huber", "Rochat", "Favre", "Bernasconi", "Rossi", "Gerber", "Brunner", "Baumann", "Fischer"]
+SENTENCES = [
+    "You will join a growing team working on products used across Switzerland.",
+    "We offer flexible working hours and up to two days of remote work per week.",
+    "Fluency in French or German is required, English is an asset.",
+    "You have a strong sense of responsibility and enjoy working with customers.",
+    "The position includes a yearly training budget and a public transport pass.",
+    "Experience with modern tools and a willingness to learn are expected.",
+    "You will report directly to the head of the department.",
+    "Our offices are a few minutes away from the main train station.",
+]
+MESSAGES = [
+    "Thank you for your application, are you available for a call this week?",
+    "Yes, I am available on Tuesday or Thursday afternoon.",
+    "Could you send us references from your previous employer?",
+    "Here are the documents you asked for.",
+    "We would like to invite you to an interview.",
+    "Thank you, I look forward to meeting you.",
+]
+STATUSES = ['received'] * 5 + ['in_progress'] * 3 + ['accepted', 'rejected', 'rejected']
+
+
+@contextlib.contextmanager
+def explicit_dates(*fields):
+    """ Lets bulk_create keep the dates we set, instead of overwriting them with now() """
+    saved = [(field, field.auto_now, field.auto_now_add) for field in fields]
+    for field in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in saved:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(itertools.islice(iterator, size)):
+        yield chunk
+
+
+def spread(total, buckets, rng):
+    """ Splits `total` items over `buckets`, unevenly, like real activity """
+    weights = [rng.paretovariate(1.5) for _ in range(buckets)]
+    scale = total / sum(weights)
+    counts = [int(weight * scale) for weight in weights]
+    for index in rng.sample(range(buckets), min(buckets, total - sum(counts))):
+        counts[index] += 1
+    return counts
+
+
+class Command(BaseCommand):
+    help = 'Creates a large synthetic dataset (users, job posts, applications and messages) for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employers', type=int, default=1_000)
+        parser.add_argument('--jobseekers', type=int, default=10_000)
+        parser.add_argument('--jobposts', type=int, default=100_000)
+        parser.add_argument('--applications', type=int, default=1_000_000)
+        parser.add_argument('--messages', type=int, default=5_000_000)
+        parser.add_argument('--days', type=int, default=365, help='Activity is spread over the last DAYS days')
+        parser.add_argument('--chunk-size', type=int, default=5_000)
+        parser.add_argument('--seed', type=int, default=None, help='Seed of the random generator, for reproducible datasets')
+        parser.add_argument('--password', default='synthetic', help='Password of every generated user')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['seed'])
+        self.chunk_size = options['chunk_size']
+        self.now = timezone.now()
+        self.start = self.now - datetime.timedelta(days=options['days'])
+        # Hashing is slow on purpose, every user shares the same hash
+        self.password = make_password(options['password'])
+        # Tells the users of this run apart from the previous ones: the number of synthetic users created before it
+        self.run_id = User.objects.filter(username__startswith='synthetic_').count()
+
+        self.stdout.write(self.style.MIGRATE_HEADING("=== Synthetic Data Generation Starting ==="))
+        employers = self.step("employers", self.create_employers, options['employers'])
+        jobseekers = self.step("job seekers", self.create_jobseekers, options['jobseekers'])
+        jobs = self.step("job posts", self.create_job_posts, options['jobposts'], employers)
+        self.step("applications", self.create_applications, options['applications'], jobs, jobseekers)
+        self.step("messages", self.create_messages, options['messages'])
+        cache.invalidate_job_feed()
+        self.stdout.write(self.style.MIGRATE_HEADING("=== Synthetic Data Generation Completed ==="))
+
+    def step(self, label, create, count, *args):
+        self.stdout.write(self.style.WARNING(f"=> Creating {count} {label}..."))
+        started = time.perf_counter()
+        result = create(count, *args)
+        self.stdout.write(self.style.SUCCESS(f"=> {count} {label} created in {time.perf_counter() - started:.1f}s"))
+        return result
+
+    def random_date(self, after=None):
+        after = after or self.start
+        return after + (self.now - after) * self.rng.random()
+
+    def create_users(self, count, role):
+        """ Returns the ids of `count` new users, in the `role` group """
+        group = Group.objects.get(name=role)
+        user_ids = []
+        for chunk in chunked(range(count), self.chunk_size):
+            with transaction.atomic():
+                users = User.objects.bulk_create(
+                    User(
+                        username=f"synthetic_{role}_{self.run_id}_{index}",
+                        email=f"synthetic_{role}_{self.run_id}_{index}@example.com",
+                        password=self.password,
+                        first_name=self.rng.choice(FIRST_NAMES),
+                        last_name=self.rng.choice(LAST_NAMES),
+                        date_joined=self.random_date(),
+                    )
+                    for index in chunk
+                )
+                User.groups.through.objects.bulk_create(
+                    User.groups.through(user_id=user.pk, group_id=group.pk) for user in users
+                )
+            user_ids.extend(user.pk for user in users)
+        return user_ids
+
+    def create_employers(self, count):
+        user_ids = self.create_users(count, 'employer')
+        profiles = []
+        for chunk in chunked(user_ids, self.chunk_size):
+            with transaction.atomic():
+                profiles.extend(EmployerProfile.objects.bulk_create(self.employer_profile(user_id) for user_id in chunk))
+        return profiles
+
+    def employer_profile(self, user_id):
+        city, postal_code = self.rng.choice(CITIES)
+        profile = EmployerProfile(
+            user_id=user_id,
+            first_name=self.rng.choice(FIRST_NAMES),
+            last_name=self.rng.choice(LAST_NAMES),
+            address=f"Rue du Marché {self.rng.randint(1, 80)}",
+            postal_code=postal_code,
+            city=city,
+            email=f"contact{user_id}@example.com",
+            phone=f"+41 {self.rng.randint(21, 91)} {self.rng.randint(100, 999)} {self.rng.randint(10, 99)} {self.rng.randint(10, 99)}",
+            birthdate=datetime.date(self.rng.randint(1960, 2000), self.rng.randint(1, 12), self.rng.randint(1, 28)),
+            company_name=f"{self.rng.choice(COMPANIES)} {self.rng.choice(['SA', 'AG', 'Sàrl', 'GmbH'])}",
+            company_address=f"Bahnhofstrasse {self.rng.randint(1, 120)}",
+            company_postal_code=postal_code,
+            company_city=city,
+            company_phone=f"+41 {self.rng.randint(21, 91)} {self.rng.randint(100, 999)} {self.rng.randint(10, 99)} {self.rng.randint(10, 99)}",
+            is_premium=self.rng.random() < 0.1,
+        )
+        # bulk_create skips the signals that geocode the profiles
+        geo.geocode_profile(profile)
+        return profile
+
+    def create_jobseekers(self, count):
+        user_ids = self.create_users(count, 'jobseeker')
+        profiles = []
+        for chunk in chunked(user_ids, self.chunk_size):
+            with transaction.atomic():
+                profiles.extend(JobSeekerProfile.objects.bulk_create(self.jobseeker_profile(user_id) for user_id in chunk))
+        return [(profile.pk, profile.user_id) for profile in profiles]
+
+    def jobseeker_profile(self, user_id):
+        city, postal_code = self.rng.choice(CITIES)
+        profile = JobSeekerProfile(
+            user_id=user_id,
+            first_name=self.rng.choice(FIRST_NAMES),
+            last_name=self.rng.choice(LAST_NAMES),
+            postal_code=postal_code,
+            city=city,
+            email=f"candidate{user_id}@example.com",
+            is_premium=self.rng.random() < 0.05,
+        )
+        geo.geocode_profile(profile)
+        return profile
+
+    def create_job_posts(self, count, employers):
+        if not employers:
+            return []
+        search = get_search_backend()
+        jobs = []
+        with explicit_dates(JobPost._meta.get_field('created_at')):
+            for chunk in chunked(self.job_posts(count, employers), self.chunk_size):
+                with transaction.atomic():
+                    created = JobPost.objects.bulk_create(chunk)
+                    # bulk_create skips the signals that keep the search index up to date
+                    search.index_many(JOB_POST_INDEX, [job.pk for job in created])
+                jobs.extend((job.pk, job.employer.user_id, job.created_at) for job in created)
+        return jobs
+
+    def job_posts(self, count, employers):
+        for employer, posts in zip(employers, spread(count, len(employers), self.rng)):
+            for _ in range(posts):
+                salary_min = self.rng.randrange(50_000, 140_000, 1_000)
+                level = self.rng.choice(LEVELS)
+                job_post = JobPost(
+                    employer=employer,
+                    title=f"{level} {self.rng.choice(ROLES)}".strip(),
+                    description=" ".join(self.rng.sample(SENTENCES, 4)),
+                    location=self.rng.choice(CITIES)[0] if self.rng.random() < 0.3 else employer.company_city,
+                    salary_min=salary_min,
+                    salary_max=salary_min + self.rng.randrange(5_000, 40_000, 1_000),
+                    years_experience=self.rng.randint(0, 10),
+                    company_name=employer.company_name,
+                    employer_is_premium=employer.is_premium,
+                    is_visible=self.rng.random() < 0.9,
+                    created_at=self.random_date(),
+                )
+                geo.geocode_job_post(job_post, employer)
+                yield job_post
+
+    def create_applications(self, count, jobs, jobseekers):
+        if not jobs or not jobseekers:
+            return
+        fields = [JobApplication._meta.get_field('applied_at'), JobApplication._meta.get_field('status_updated_at')]
+        with explicit_dates(*fields):
+            for chunk in chunked(self.applications(count, jobs, jobseekers), self.chunk_size):
+                with transaction.atomic():
+                    JobApplication.objects.bulk_create(chunk)
+        # bulk_create skips the signals that maintain the counters of the job posts
+        counters.reconcile(job_id for job_id, _, _ in jobs)
+
+    def applications(self, count, jobs, jobseekers):
+        for (candidate_id, _), applications in zip(jobseekers, spread(count, len(jobseekers), self.rng)):
+            # A candidate applies at most once to each job
+            for job_id, _, job_created_at in self.rng.sample(jobs, min(applications, len(jobs))):
+                applied_at = self.random_date(job_created_at)
+                yield JobApplication(
+                    job_id=job_id,
+                    candidate_id=candidate_id,
+                    applied_at=applied_at,
+                    status=self.rng.choice(STATUSES),
+                    status_updated_at=self.random_date(applied_at),
+                )
+
+    def create_messages(self, count):
+        if not count:
+            return
+        # Streams the applications just created with both participants, without holding them all in memory
+        applications = (
+            JobApplication.objects
+            .filter(candidate__user__username__startswith=f"synthetic_jobseeker_{self.run_id}_")
+            .values_list('id', 'candidate__user_id', 'job__employer__user_id', 'applied_at')
+            .order_by('id')
+        )
+        total = applications.count()
+        if not total:
+            return
+        fields = [Message._meta.get_field('created_at'), Message._meta.get_field('updated_at')]
+        with explicit_dates(*fields):
+            # Uneven conversations: many applications get no message, a few get long threads
+            counts = spread(count, total, self.rng)
+            messages = self.messages(applications.iterator(chunk_size=self.chunk_size), counts)
+            for chunk in chunked(messages, self.chunk_size):
+                with transaction.atomic():
+                    Message.objects.bulk_create(chunk)
+
+    def messages(self, applications, counts):
+        for (application_id, candidate_user_id, employer_user_id, applied_at), messages in zip(applications, counts):
+            created_at = applied_at
+            for index in range(messages):
+                created_at = self.random_date(created_at) if index == 0 else min(self.now, created_at + datetime.timedelta(minutes=self.rng.randint(1, 3_000)))
+                sender, receiver = (employer_user_id, candidate_user_id) if index % 2 == 0 else (candidate_user_id, employer_user_id)
+                yield Message(
+                    application_id=application_id,
+                    sender_id=sender,
+                    receiver_id=receiver,
+                    subject=f"Application {application_id}",
+                    body=self.rng.choice(MESSAGES),
+                    created_at=created_at,
+                    updated_at=created_at,
+                )
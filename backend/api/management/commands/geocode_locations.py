@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from backend.api import cache, geo
+from backend.api.models import EmployerProfile, JobPost, JobSeekerProfile
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the coordinates of the job posts and profiles from the gazetteer, after a migration or an update of the gazetteer'
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING("=> Geocoding profiles and job posts..."))
+        jobseekers = geo.geocode_rows(JobSeekerProfile.objects.all(), geo.geocode_profile)
+        employers = geo.geocode_rows(EmployerProfile.objects.all(), geo.geocode_profile)
+        job_posts = geo.geocode_rows(
+            JobPost.objects.select_related('employer'), lambda job_post: geo.geocode_job_post(job_post, job_post.employer)
+        )
+        if job_posts:
+            # bulk_update sends no signals, the cached pages hold the previous coordinates
+            cache.invalidate_job_feed()
+        self.stdout.write(self.style.SUCCESS(
+            f"=> {job_posts} job posts, {jobseekers} job seekers and {employers} employers moved"
+        ))
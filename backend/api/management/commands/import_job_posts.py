@@ -0,0 +1,35 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from backend.api import job_import
+from backend.api.models import EmployerProfile
+
+
+class Command(BaseCommand):
+    help = 'Imports the job posts of an employer from a CSV or JSON Lines file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username', help='Username of the employer')
+        parser.add_argument('path', help='CSV or JSON Lines file')
+        parser.add_argument('--format', choices=sorted(job_import.FORMATS), help='Defaults to the extension of the file')
+        parser.add_argument('--chunk-size', type=int, default=job_import.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        try:
+            employer = EmployerProfile.objects.get(user__username=options['username'])
+        except EmployerProfile.DoesNotExist:
+            raise CommandError(f"No employer profile for {options['username']}.")
+        format = options['format'] or job_import.detect_format(filename=options['path'])
+        if format is None:
+            raise CommandError("Unknown file format, use --format.")
+
+        self.stdout.write(self.style.WARNING(f"=> Importing job posts of {employer.company_name} from {options['path']}..."))
+        with open(options['path'], 'rb') as stream:
+            report = job_import.JobPostImporter(employer, chunk_size=options['chunk_size']).run(stream, format)
+
+        for error in report['errors']:
+            self.stdout.write(self.style.ERROR(f"Line {error['line']}: {json.dumps(error['errors'])}"))
+        self.stdout.write(self.style.SUCCESS(
+            f"=> {report['created']} job posts created, {report['duplicates']} duplicates, {report['error_count']} errors"
+        ))
@@ -46,6 +46,8 @@ class Command(BaseCommand):
                 import traceback
                 traceback.print_exc()
         self.stdout.write(self.style.SUCCESS("=> Fixtures loaded"))
+
+        call_command("generate_image_variants")
         self.stdout.write(self.style.MIGRATE_HEADING("=== Initial Setup Successfully Completed ==="))
                 
     def clean_media_folders(self):
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from backend.api import uploads
+
+
+class Command(BaseCommand):
+    help = 'Removes the chunked uploads left unfinished or unattached past their expiry, and their chunk files'
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING("=> Purging expired uploads..."))
+        removed_uploads, removed_files = uploads.purge_expired()
+        self.stdout.write(self.style.SUCCESS(f"=> {removed_uploads} uploads and {removed_files} orphan chunk files removed"))
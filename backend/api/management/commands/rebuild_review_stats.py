@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+
+from backend.api import review_stats
+
+
+class Command(BaseCommand):
+    help = 'Recomputes the system review statistics rollup from the reviews'
+
+    def handle(self, *args, **kwargs):
+        self.stdout.write(self.style.WARNING("=> Rebuilding system review statistics..."))
+        count = review_stats.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"=> Statistics rebuilt from {count} reviews"))
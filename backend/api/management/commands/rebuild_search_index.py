@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from backend.api.search import DOCUMENT_TEXT_INDEX, JOB_POST_INDEX, get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search indexes of the job posts and of the document texts from scratch'
+
+    def handle(self, *args, **kwargs):
+        self.stdout.write(self.style.WARNING("=> Rebuilding job post search index..."))
+        get_search_backend().rebuild(JOB_POST_INDEX)
+        self.stdout.write(self.style.WARNING("=> Rebuilding document text search index..."))
+        get_search_backend().rebuild(DOCUMENT_TEXT_INDEX)
+        self.stdout.write(self.style.SUCCESS("=> Search indexes rebuilt"))
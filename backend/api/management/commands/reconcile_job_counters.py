@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from backend.api import counters
+
+
+class Command(BaseCommand):
+    help = 'Recounts the applications and favorites of every job post, and repairs the counters that drifted'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=counters.CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING("=> Reconciling job post counters..."))
+        repaired = counters.reconcile(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"=> {repaired} job posts repaired"))
@@ -0,0 +1,149 @@
+import datetime
+import json
+import platform
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+from backend.api import cache
+from backend.api.models import JobApplication, JobPost, JobSeekerProfile, Message
+
+
+def percentile(quantiles, rank):
+    return round(quantiles[rank - 1], 2)
+
+
+def summarize(timings, queries):
+    quantiles = statistics.quantiles(timings, n=100, method='inclusive') if len(timings) > 1 else timings * 99
+    return {
+        'requests': len(timings),
+        'p50_ms': percentile(quantiles, 50),
+        'p95_ms': percentile(quantiles, 95),
+        'p99_ms': percentile(quantiles, 99),
+        'mean_ms': round(statistics.fmean(timings), 2),
+        'max_ms': round(max(timings), 2),
+        'queries_min': min(queries),
+        'queries_max': max(queries),
+        'queries_mean': round(statistics.fmean(queries), 2),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Measures the latency and query count of the main API endpoints, in process, through the test client'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=50, help='Measured requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=5, help='Requests per endpoint run before measuring')
+        parser.add_argument('--endpoint', action='append', dest='endpoints', help='Only run this endpoint, can be repeated')
+        parser.add_argument('--output', default='benchmark-results.json', help='File the results are written to, as JSON')
+        parser.add_argument('--label', default='', help='Name of the run, stored with the results')
+        parser.add_argument('--compare', help='Results file of a previous run to compare with')
+        parser.add_argument('--cold-cache', action='store_true', help='Invalidate the job feed cache before every request')
+
+    def handle(self, *args, **options):
+        scenarios = self.scenarios()
+        if options['endpoints']:
+            unknown = set(options['endpoints']) - {name for name, *_ in scenarios}
+            if unknown:
+                raise CommandError(f"Unknown endpoints: {', '.join(sorted(unknown))}")
+            scenarios = [scenario for scenario in scenarios if scenario[0] in options['endpoints']]
+
+        self.stdout.write(self.style.MIGRATE_HEADING("=== Benchmark Starting ==="))
+        results = {
+            'label': options['label'],
+            'cold_cache': options['cold_cache'],
+            'started_at': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+            'database': connection.vendor,
+            'python': platform.python_version(),
+            'dataset': {
+                'job_posts': JobPost.objects.count(),
+                'applications': JobApplication.objects.count(),
+                'messages': Message.objects.count(),
+                'users': User.objects.count(),
+            },
+            'endpoints': {},
+        }
+        for name, url, user in scenarios:
+            self.stdout.write(self.style.WARNING(f"=> {name}: GET {url}"))
+            results['endpoints'][name] = {'url': url, **self.run(url, user, options['warmup'], options['requests'], options['cold_cache'])}
+            self.report(name, results['endpoints'][name])
+
+        with open(options['output'], 'w') as output:
+            json.dump(results, output, indent=2)
+        self.stdout.write(self.style.SUCCESS(f"=> Results written to {options['output']}"))
+
+        if options['compare']:
+            self.compare(options['compare'], results)
+        self.stdout.write(self.style.MIGRATE_HEADING("=== Benchmark Completed ==="))
+
+    def scenarios(self):
+        """ (name, url, user) of each endpoint, with the busiest users and job so the numbers reflect the worst cases """
+        recent = JobApplication.objects.order_by('-id').values('job_id')[:10_000]
+        busiest_job = (
+            JobApplication.objects.filter(job_id__in=recent).values('job_id')
+            .annotate(total=Count('id')).order_by('-total').values_list('job_id', flat=True).first()
+        )
+        job = JobPost.objects.select_related('employer__user').filter(pk=busiest_job).first() or JobPost.objects.select_related('employer__user').first()
+        jobseeker = JobSeekerProfile.objects.select_related('user').order_by('-id').first()
+        if job is None or jobseeker is None:
+            raise CommandError("The database is empty, run generate_synthetic_data first.")
+        employer = job.employer.user
+        query = job.title.split()[-1]
+
+        return [
+            ('job_feed', '/api/jobposts/', None),
+            ('job_feed_page_5', '/api/jobposts/?page=5', None),
+            ('job_feed_cursor', '/api/jobposts/?pagination=cursor', None),
+            ('job_search', f'/api/jobposts/?q={query}', None),
+            ('conversations_employer', '/api/conversations/', employer),
+            ('conversations_jobseeker', '/api/conversations/', jobseeker.user),
+            ('applications_by_job', f'/api/jobposts/{job.pk}/applications/', employer),
+            ('session', '/api/session/', jobseeker.user),
+        ]
+
+    def run(self, url, user, warmup, requests, cold_cache=False):
+        client = Client()
+        if user is not None:
+            client.force_login(user)
+
+        timings, queries, statuses, cache_hits = [], [], {}, 0
+        for index in range(warmup + requests):
+            if cold_cache:
+                cache.bump_generation()
+            with CaptureQueriesContext(connection) as captured:
+                started = time.perf_counter()
+                response = client.get(url)
+                elapsed = (time.perf_counter() - started) * 1000
+            if index < warmup:
+                continue
+            timings.append(elapsed)
+            queries.append(len(captured))
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            cache_hits += response.get('X-Cache') == 'HIT'
+        return {**summarize(timings, queries), 'status_codes': statuses, 'cache_hits': cache_hits}
+
+    def report(self, name, result):
+        self.stdout.write(
+            f"   p50 {result['p50_ms']:8.2f} ms   p95 {result['p95_ms']:8.2f} ms   p99 {result['p99_ms']:8.2f} ms   "
+            f"queries {result['queries_mean']:6.1f}   cache hits {result['cache_hits']}   statuses {result['status_codes']}"
+        )
+
+    def compare(self, path, results):
+        with open(path) as previous_file:
+            previous = json.load(previous_file)
+        self.stdout.write(self.style.WARNING(f"=> Compared with {path} ({previous.get('label') or previous['started_at']})"))
+        for name, result in results['endpoints'].items():
+            before = previous['endpoints'].get(name)
+            if before is None:
+                continue
+            changes = []
+            for metric in ('p50_ms', 'p95_ms', 'p99_ms', 'queries_mean'):
+                delta = (result[metric] - before[metric]) / before[metric] * 100 if before[metric] else 0.0
+                changes.append(f"{metric} {before[metric]} -> {result[metric]} ({delta:+.0f}%)")
+            self.stdout.write(f"   {name}: " + ", ".join(changes))
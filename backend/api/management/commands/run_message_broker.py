@@ -0,0 +1,48 @@
+import asyncio
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Runs the local message broker that relays chat events between the workers (see backend/api/realtime.py)'
+
+    def handle(self, *args, **kwargs):
+        host, port = settings.REALTIME['BROKER_ADDRESS']
+        self.subscribers = {}
+        self.stdout.write(self.style.MIGRATE_HEADING(f"=== Message broker listening on {host}:{port} ==="))
+        try:
+            asyncio.run(self.serve(host, port))
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.WARNING("=> Message broker stopped"))
+
+    async def serve(self, host, port):
+        server = await asyncio.start_server(self.handle_client, host, port)
+        async with server:
+            await server.serve_forever()
+
+    async def handle_client(self, reader, writer):
+        channels = set()
+        try:
+            while line := await reader.readline():
+                try:
+                    message = json.loads(line)
+                except ValueError:
+                    continue
+                channel = message.get('channel')
+                if message.get('action') == 'subscribe':
+                    channels.add(channel)
+                    self.subscribers.setdefault(channel, set()).add(writer)
+                elif message.get('action') == 'publish':
+                    payload = (json.dumps(message.get('event')) + "\n").encode()
+                    for subscriber in list(self.subscribers.get(channel, ())):
+                        subscriber.write(payload)
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+        finally:
+            for channel in channels:
+                self.subscribers[channel].discard(writer)
+                if not self.subscribers[channel]:
+                    del self.subscribers[channel]
+            writer.close()
@@ -0,0 +1,309 @@
+"""
+Request metrics: latency, SQL queries, response sizes and status codes of each route.
+
+`MetricsMiddleware` records every request in a per-process store, labelled by the name of the
+matched URL pattern (e.g. `job-applications-by-job`) rather than the raw path, so the number
+of series stays bounded. Each gunicorn worker periodically writes its store to its own file in
+`settings.METRICS['DIRECTORY']`, and `/api/metrics/` merges the files of all the workers into
+the Prometheus text format.
+
+Other modules count events of their own in the same store with `increment()`, e.g. the hits
+and misses of the job feed cache (see `cache.py`): a per-process counter costs nothing on the
+request path, where a counter in a shared cache would cost a round-trip or a file write.
+"""
+import bisect
+import contextlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+from django.conf import settings
+from django.db import connections
+
+
+UNMATCHED_ROUTE = 'unmatched'
+OTHER_ROUTE = 'other'
+
+# {name: description} of the counters of increment(), exposed as <prefix>_<name>_total
+COUNTERS = {}
+
+
+def counter(name, description):
+    COUNTERS[name] = description
+    return name
+
+
+class RouteStats:
+    """ Counters of one (route, method) pair. Histograms keep one count per bucket, the last one is +Inf """
+    def __init__(self, latency_buckets, query_buckets, size_buckets):
+        self.requests = 0
+        self.statuses = {}
+        self.latency_sum = 0.0
+        self.latency_counts = [0] * (len(latency_buckets) + 1)
+        self.queries_sum = 0
+        self.query_time_sum = 0.0
+        self.query_counts = [0] * (len(query_buckets) + 1)
+        self.response_bytes_sum = 0
+        self.response_size_counts = [0] * (len(size_buckets) + 1)
+
+    def to_dict(self):
+        return dict(self.__dict__)
+
+
+class MetricsStore:
+    """
+    In-memory metrics of the current process, bounded to `max_routes` series.
+    """
+    def __init__(self, config):
+        self.latency_buckets = config['LATENCY_BUCKETS']
+        self.query_buckets = config['QUERY_BUCKETS']
+        self.size_buckets = config['SIZE_BUCKETS']
+        self.max_routes = config['MAX_ROUTES']
+        self.routes = {}
+        self.counters = {}
+        self.lock = threading.Lock()
+        self.last_flush = 0.0
+
+    def record(self, route, method, status, latency, queries, query_time, response_bytes):
+        """ `response_bytes` is None for streamed responses, which are left out of the size histogram """
+        with self.lock:
+            key = (route, method)
+            stats = self.routes.get(key)
+            if stats is None:
+                if len(self.routes) >= self.max_routes:
+                    key = (OTHER_ROUTE, method)
+                stats = self.routes.setdefault(key, RouteStats(self.latency_buckets, self.query_buckets, self.size_buckets))
+            stats.requests += 1
+            stats.statuses[str(status)] = stats.statuses.get(str(status), 0) + 1
+            stats.latency_sum += latency
+            stats.latency_counts[bisect.bisect_left(self.latency_buckets, latency)] += 1
+            stats.queries_sum += queries
+            stats.query_time_sum += query_time
+            stats.query_counts[bisect.bisect_left(self.query_buckets, queries)] += 1
+            if response_bytes is not None:
+                stats.response_bytes_sum += response_bytes
+                stats.response_size_counts[bisect.bisect_left(self.size_buckets, response_bytes)] += 1
+
+    def increment(self, name, value=1):
+        with self.lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                'latency_buckets': self.latency_buckets,
+                'query_buckets': self.query_buckets,
+                'size_buckets': self.size_buckets,
+                'counters': dict(self.counters),
+                'routes': [
+                    {'route': route, 'method': method, **stats.to_dict()}
+                    for (route, method), stats in self.routes.items()
+                ],
+            }
+
+    def flush(self, directory):
+        """ Writes the snapshot to this worker's file, atomically so readers never see half of it """
+        os.makedirs(directory, exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(dir=directory, prefix='.tmp-')
+        with os.fdopen(descriptor, 'w') as output:
+            json.dump(self.snapshot(), output)
+        os.replace(temporary, os.path.join(directory, f"metrics-{os.getpid()}.json"))
+        self.last_flush = time.monotonic()
+
+    def maybe_flush(self, directory, interval):
+        if time.monotonic() - self.last_flush >= interval:
+            self.flush(directory)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        # A forked worker starts with a copy of the parent's store, give it its own
+        if _store is None or _store.pid != os.getpid():
+            _store = MetricsStore(settings.METRICS)
+            _store.pid = os.getpid()
+    return _store
+
+
+def increment(name, value=1):
+    """ Adds `value` to a counter declared with counter() """
+    get_store().increment(name, value)
+
+
+def get_counters():
+    """ Counters of all the workers, summed """
+    config = settings.METRICS
+    return merge_counters(load_snapshots(config['DIRECTORY'], config['RETENTION']))
+
+
+def route_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return UNMATCHED_ROUTE
+    return match.url_name or match.route or UNMATCHED_ROUTE
+
+
+class QueryTimer:
+    """ Database execute wrapper counting the queries of a request and the time spent in them """
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+class MetricsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        config = settings.METRICS
+        if not config['ENABLED']:
+            return self.get_response(request)
+
+        timer = QueryTimer()
+        started = time.perf_counter()
+        with contextlib.ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(timer))
+            response = self.get_response(request)
+        latency = time.perf_counter() - started
+
+        # Streamed responses have no known size, and their latency only covers the first byte
+        response_bytes = None if response.streaming else len(response.content)
+        store = get_store()
+        store.record(route_name(request), request.method, response.status_code, latency, timer.count, timer.duration, response_bytes)
+        try:
+            store.maybe_flush(config['DIRECTORY'], config['FLUSH_INTERVAL'])
+        except OSError:
+            # Losing a flush must never fail the request, the next one retries
+            pass
+        return response
+
+
+def load_snapshots(directory, max_age):
+    """ Snapshots of every worker, including the current process. Files older than `max_age` seconds are removed """
+    store = get_store()
+    buckets = (store.latency_buckets, store.query_buckets, store.size_buckets)
+    snapshots = []
+    if os.path.isdir(directory):
+        own_file = f"metrics-{os.getpid()}.json"
+        for filename in os.listdir(directory):
+            if not filename.startswith('metrics-') or filename == own_file:
+                continue
+            path = os.path.join(directory, filename)
+            try:
+                if time.time() - os.path.getmtime(path) > max_age:
+                    os.remove(path)
+                    continue
+                with open(path) as snapshot_file:
+                    snapshot = json.load(snapshot_file)
+            except (OSError, ValueError):
+                continue
+            # Histograms of workers started with other buckets, e.g. before a deploy, cannot be summed
+            if (snapshot.get('latency_buckets'), snapshot.get('query_buckets'), snapshot.get('size_buckets')) == buckets:
+                snapshots.append(snapshot)
+    snapshots.append(store.snapshot())
+    return snapshots
+
+
+def merge_snapshots(snapshots):
+    merged = {}
+    for snapshot in snapshots:
+        for route in snapshot['routes']:
+            key = (route['route'], route['method'])
+            if key not in merged:
+                merged[key] = {**route, 'statuses': dict(route['statuses'])}
+                continue
+            total = merged[key]
+            for name in ('requests', 'latency_sum', 'queries_sum', 'query_time_sum', 'response_bytes_sum'):
+                total[name] += route[name]
+            for status, count in route['statuses'].items():
+                total['statuses'][status] = total['statuses'].get(status, 0) + count
+            for name in ('latency_counts', 'query_counts', 'response_size_counts'):
+                total[name] = [a + b for a, b in zip(total[name], route[name])]
+    return [merged[key] for key in sorted(merged)]
+
+
+def merge_counters(snapshots):
+    totals = {name: 0 for name in COUNTERS}
+    for snapshot in snapshots:
+        for name, value in snapshot.get('counters', {}).items():
+            totals[name] = totals.get(name, 0) + value
+    return totals
+
+
+def escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def labels(**values):
+    return "{" + ",".join(f'{name}="{escape_label(value)}"' for name, value in values.items()) + "}"
+
+
+def histogram_lines(name, route_labels, buckets, counts, total_sum, total_count):
+    lines = []
+    cumulative = 0
+    for bound, count in zip([*buckets, '+Inf'], counts):
+        cumulative += count
+        lines.append(f"{name}_bucket{labels(**route_labels, le=bound)} {cumulative}")
+    lines.append(f"{name}_sum{labels(**route_labels)} {total_sum}")
+    lines.append(f"{name}_count{labels(**route_labels)} {total_count}")
+    return lines
+
+
+def render_prometheus():
+    config = settings.METRICS
+    snapshots = load_snapshots(config['DIRECTORY'], config['RETENTION'])
+    routes = merge_snapshots(snapshots)
+    latency_buckets, query_buckets, size_buckets = config['LATENCY_BUCKETS'], config['QUERY_BUCKETS'], config['SIZE_BUCKETS']
+    prefix = config['PREFIX']
+
+    sections = {
+        'http_requests_total': ('counter', "Requests handled, by route, method and status code"),
+        'http_request_duration_seconds': ('histogram', "Time spent handling the request"),
+        'db_queries_per_request': ('histogram', "SQL queries issued by a request"),
+        'db_query_duration_seconds_total': ('counter', "Time spent in SQL queries"),
+        'http_response_size_bytes': ('histogram', "Size of the response body, streamed responses excluded"),
+    }
+    samples = {name: [] for name in sections}
+    for route in routes:
+        route_labels = {'route': route['route'], 'method': route['method']}
+        for status, count in sorted(route['statuses'].items()):
+            samples['http_requests_total'].append(f"{prefix}_http_requests_total{labels(**route_labels, status=status)} {count}")
+        samples['http_request_duration_seconds'] += histogram_lines(
+            f"{prefix}_http_request_duration_seconds", route_labels, latency_buckets,
+            route['latency_counts'], route['latency_sum'], route['requests'],
+        )
+        samples['db_queries_per_request'] += histogram_lines(
+            f"{prefix}_db_queries_per_request", route_labels, query_buckets,
+            route['query_counts'], route['queries_sum'], route['requests'],
+        )
+        samples['db_query_duration_seconds_total'].append(f"{prefix}_db_query_duration_seconds_total{labels(**route_labels)} {route['query_time_sum']}")
+        samples['http_response_size_bytes'] += histogram_lines(
+            f"{prefix}_http_response_size_bytes", route_labels, size_buckets,
+            route['response_size_counts'], route['response_bytes_sum'], sum(route['response_size_counts']),
+        )
+
+    lines = []
+    for name, (kind, description) in sections.items():
+        lines.append(f"# HELP {prefix}_{name} {description}")
+        lines.append(f"# TYPE {prefix}_{name} {kind}")
+        lines += samples[name]
+    for name, value in sorted(merge_counters(snapshots).items()):
+        lines.append(f"# HELP {prefix}_{name}_total {COUNTERS.get(name, name)}")
+        lines.append(f"# TYPE {prefix}_{name}_total counter")
+        lines.append(f"{prefix}_{name}_total {value}")
+    return "\n".join(lines) + "\n"
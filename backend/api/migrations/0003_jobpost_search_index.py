@@ -0,0 +1,45 @@
+from django.db import migrations
+
+
+# Frozen copy of the index definition and SQL of search.py at the time of this migration,
+# so later changes to search.py do not change what the migration does
+TABLE = 'api_jobpost'
+FIELDS = [('title', 'A'), ('company_name', 'B'), ('location', 'B'), ('description', 'C')]
+
+
+def create_search_index(apps, schema_editor):
+    columns = ", ".join(column for column, weight in FIELDS)
+    if schema_editor.connection.vendor == 'sqlite':
+        sources = ", ".join(f"COALESCE({column}, '')" for column, weight in FIELDS)
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE}_fts "
+            f"USING fts5({columns}, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+        schema_editor.execute(f"DELETE FROM {TABLE}_fts")
+        schema_editor.execute(f"INSERT INTO {TABLE}_fts (rowid, {columns}) SELECT id, {sources} FROM {TABLE}")
+    elif schema_editor.connection.vendor == 'postgresql':
+        vector = " || ".join(
+            f"setweight(to_tsvector('simple', COALESCE({column}, '')), '{weight}')" for column, weight in FIELDS
+        )
+        schema_editor.execute(f"ALTER TABLE {TABLE} ADD COLUMN IF NOT EXISTS search_vector tsvector")
+        schema_editor.execute(f"CREATE INDEX IF NOT EXISTS {TABLE}_search_gin ON {TABLE} USING GIN (search_vector)")
+        schema_editor.execute(f"UPDATE {TABLE} SET search_vector = {vector}")
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {TABLE}_fts")
+    elif schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f"DROP INDEX IF EXISTS {TABLE}_search_gin")
+        schema_editor.execute(f"ALTER TABLE {TABLE} DROP COLUMN IF EXISTS search_vector")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_employerprofile_is_premium_and_more'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,47 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:12
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_jobpost_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['employer', 'appointment_time'], name='appointment_employer_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='appointment',
+            index=models.Index(fields=['job_seeker', 'appointment_time'], name='appointment_seeker_time_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jobapplication',
+            index=models.Index(fields=['job', 'applied_at'], name='application_job_applied_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jobapplication',
+            index=models.Index(fields=['candidate', 'applied_at'], name='application_cand_applied_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jobfavorite',
+            index=models.Index(fields=['job_seeker', 'created_at'], name='favorite_seeker_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jobpost',
+            index=models.Index(condition=models.Q(('is_visible', True)), fields=['-created_at'], name='jobpost_visible_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jobpost',
+            index=models.Index(fields=['employer', 'title'], name='jobpost_employer_title_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['application', 'created_at'], name='message_app_created_idx'),
+        ),
+    ]
@@ -0,0 +1,70 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:21
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+
+METRICS = ['rating', 'job_search_effectiveness', 'application_process_simplicity', 'message_system_effectiveness', 'ease_of_navigation']
+
+
+def fill_review_stats(apps, schema_editor):
+    SystemReview = apps.get_model('api', 'SystemReview')
+    SystemReviewStats = apps.get_model('api', 'SystemReviewStats')
+    SystemReviewDailyStats = apps.get_model('api', 'SystemReviewDailyStats')
+    sums = {f'{field}_sum': Sum(field) for field in METRICS}
+
+    daily = (
+        SystemReview.objects
+        .annotate(day=TruncDate('created_at', tzinfo=timezone.get_current_timezone()))
+        .values('day')
+        .annotate(review_count=Count('id'), **sums)
+        .order_by('day')
+    )
+    SystemReviewDailyStats.objects.bulk_create(SystemReviewDailyStats(**row) for row in daily)
+    totals = SystemReview.objects.aggregate(review_count=Count('id'), **sums)
+    SystemReviewStats.objects.create(pk=1, **{name: value or 0 for name, value in totals.items()})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_hot_query_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SystemReviewDailyStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('review_count', models.IntegerField(default=0)),
+                ('rating_sum', models.IntegerField(default=0)),
+                ('job_search_effectiveness_sum', models.IntegerField(default=0)),
+                ('application_process_simplicity_sum', models.IntegerField(default=0)),
+                ('message_system_effectiveness_sum', models.IntegerField(default=0)),
+                ('ease_of_navigation_sum', models.IntegerField(default=0)),
+                ('day', models.DateField(unique=True)),
+            ],
+            options={
+                'ordering': ['day'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SystemReviewStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('review_count', models.IntegerField(default=0)),
+                ('rating_sum', models.IntegerField(default=0)),
+                ('job_search_effectiveness_sum', models.IntegerField(default=0)),
+                ('application_process_simplicity_sum', models.IntegerField(default=0)),
+                ('message_system_effectiveness_sum', models.IntegerField(default=0)),
+                ('ease_of_navigation_sum', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+        migrations.RunPython(fill_review_stats, migrations.RunPython.noop),
+    ]
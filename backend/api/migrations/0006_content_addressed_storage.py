@@ -0,0 +1,45 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:27
+
+import backend.api.storage
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_system_review_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoredBlob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255, unique=True)),
+                ('sha256', models.CharField(max_length=64)),
+                ('size', models.BigIntegerField()),
+                ('reference_count', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='document',
+            name='file',
+            field=models.FileField(storage=backend.api.storage.get_content_addressed_storage, upload_to='documents/'),
+        ),
+        migrations.AlterField(
+            model_name='jobapplication',
+            name='cover_letter_file',
+            field=models.FileField(blank=True, null=True, storage=backend.api.storage.get_content_addressed_storage, upload_to='cover_letters/'),
+        ),
+        migrations.AlterField(
+            model_name='jobapplication',
+            name='cv_file',
+            field=models.FileField(blank=True, null=True, storage=backend.api.storage.get_content_addressed_storage, upload_to='cvs/'),
+        ),
+        migrations.AlterField(
+            model_name='jobseekerprofile',
+            name='cv',
+            field=models.FileField(blank=True, null=True, storage=backend.api.storage.get_content_addressed_storage, upload_to='cvs/'),
+        ),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:35
+
+from django.db import migrations, models
+from django.db.models import Count
+
+
+STATUSES = ['received', 'in_progress', 'accepted', 'rejected']
+
+
+def fill_job_post_counters(apps, schema_editor):
+    JobPost = apps.get_model('api', 'JobPost')
+    JobApplication = apps.get_model('api', 'JobApplication')
+    JobFavorite = apps.get_model('api', 'JobFavorite')
+
+    counts = {}
+    for job_id, status, total in JobApplication.objects.values_list('job_id', 'status').annotate(total=Count('id')).order_by():
+        job_counts = counts.setdefault(job_id, {})
+        job_counts['application_count'] = job_counts.get('application_count', 0) + total
+        if status in STATUSES:
+            job_counts[f'{status}_count'] = total
+    for job_id, total in JobFavorite.objects.values_list('job_post_id').annotate(total=Count('id')).order_by():
+        counts.setdefault(job_id, {})['favorite_count'] = total
+    for job_id, job_counts in counts.items():
+        JobPost.objects.filter(pk=job_id).update(**job_counts)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_chunked_uploads'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jobpost',
+            name='accepted_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='jobpost',
+            name='application_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='jobpost',
+            name='favorite_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='jobpost',
+            name='in_progress_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='jobpost',
+            name='received_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='jobpost',
+            name='rejected_count',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.RunPython(fill_job_post_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,61 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:45
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+# Schema only: the coordinates of the existing rows are filled by `manage.py geocode_locations`, which
+# follows the current gazetteer, while this migration must stay the same whatever the gazetteer becomes
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0008_job_post_counters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employerprofile',
+            name='latitude',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='employerprofile',
+            name='longitude',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='jobpost',
+            name='latitude',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='jobpost',
+            name='longitude',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='jobseekerprofile',
+            name='latitude',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='jobseekerprofile',
+            name='longitude',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='employerprofile',
+            index=models.Index(fields=['latitude', 'longitude'], name='employer_location_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jobpost',
+            index=models.Index(fields=['latitude', 'longitude'], name='jobpost_location_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='jobseekerprofile',
+            index=models.Index(fields=['latitude', 'longitude'], name='jobseeker_location_idx'),
+        ),
+    ]
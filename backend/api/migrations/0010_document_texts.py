@@ -0,0 +1,53 @@
+# Generated by Django 5.1.7 on 2026-10-18 11:52
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+# Frozen copy of the index definition and SQL of search.py at the time of this migration,
+# so later changes to search.py do not change what the migration does. The table is new, there is nothing to fill.
+TABLE = 'api_documenttext'
+FIELDS = [('text', 'A')]
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        columns = ", ".join(column for column, weight in FIELDS)
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE}_fts "
+            f"USING fts5({columns}, tokenize = 'unicode61 remove_diacritics 2')"
+        )
+    elif schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f"ALTER TABLE {TABLE} ADD COLUMN IF NOT EXISTS search_vector tsvector")
+        schema_editor.execute(f"CREATE INDEX IF NOT EXISTS {TABLE}_search_gin ON {TABLE} USING GIN (search_vector)")
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        schema_editor.execute(f"DROP TABLE IF EXISTS {TABLE}_fts")
+    elif schema_editor.connection.vendor == 'postgresql':
+        schema_editor.execute(f"DROP INDEX IF EXISTS {TABLE}_search_gin")
+        schema_editor.execute(f"ALTER TABLE {TABLE} DROP COLUMN IF EXISTS search_vector")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0009_geocoded_locations'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DocumentText',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('text', models.TextField(blank=True)),
+                ('status', models.CharField(choices=[('extracted', 'Extracted'), ('failed', 'Failed')], max_length=20)),
+                ('error', models.CharField(blank=True, max_length=255)),
+                ('extractor_version', models.PositiveIntegerField()),
+                ('extracted_at', models.DateTimeField(auto_now=True)),
+                ('blob', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='document_text', to='api.storedblob')),
+            ],
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.1.7 on 2026-10-18 12:05
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def copy_employer_premium(apps, schema_editor):
+    JobPost = apps.get_model('api', 'JobPost')
+    EmployerProfile = apps.get_model('api', 'EmployerProfile')
+    JobPost.objects.update(employer_is_premium=Subquery(
+        EmployerProfile.objects.filter(pk=OuterRef('employer_id')).values('is_premium')[:1]
+    ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0010_document_texts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='jobpost',
+            name='employer_is_premium',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.RunPython(copy_employer_premium, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='jobpost',
+            index=models.Index(condition=models.Q(('is_visible', True)), fields=['-employer_is_premium', '-created_at'], name='jobpost_visible_feed_idx'),
+        ),
+    ]
@@ -1,14 +1,82 @@
-from django.db import models
+import uuid
+
+from django.db import models, router, transaction
 from django.contrib.auth.models import User
 
+from .storage import get_content_addressed_storage
+
+class StoredBlob(models.Model):
+    """
+    A unique file of the content-addressed storage, with the number of file fields pointing to it (see storage.py).
+    """
+    name = models.CharField(max_length=255, unique=True)
+    sha256 = models.CharField(max_length=64)
+    size = models.BigIntegerField()
+    reference_count = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.name} ({self.reference_count} references)"
+
+
+class DocumentText(models.Model):
+    """
+    Plain text extracted from a PDF or DOCX blob for the candidate search (see document_text.py).
+    """
+    STATUS_CHOICES = [
+        ('extracted', 'Extracted'),
+        ('failed', 'Failed'),
+    ]
+
+    blob = models.OneToOneField(StoredBlob, on_delete=models.CASCADE, related_name='document_text')
+    text = models.TextField(blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES)
+    error = models.CharField(max_length=255, blank=True)
+    # Version of text_extraction.py that produced the text, older ones are extracted again
+    extractor_version = models.PositiveIntegerField()
+    extracted_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.blob.name} ({self.status})"
+
+
 class Document(models.Model):
-    file = models.FileField(upload_to='documents/')
+    file = models.FileField(upload_to='documents/', storage=get_content_addressed_storage)
     uploaded_at = models.DateTimeField(auto_now_add=True)
     def __str__(self):
         # Displays only the file name, not the full path
         return self.file.name.split('/')[-1]
 
 
+class ChunkedUpload(models.Model):
+    """
+    A file sent in chunks (see uploads.py). Once complete, `file` holds a blob reference until the upload is attached.
+    """
+    STATUS_CHOICES = [
+        ('uploading', 'Uploading'),
+        ('complete', 'Complete'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="chunked_uploads")
+    filename = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading')
+    file = models.FileField(upload_to='uploads/', storage=get_content_addressed_storage, blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Expired uploads, see the purge_uploads command
+            models.Index(fields=['updated_at'], name='chunked_upload_updated_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.size} bytes, {self.status})"
+
+
 class JobSeekerProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     first_name = models.CharField(max_length=100)
@@ -20,10 +88,19 @@ class JobSeekerProfile(models.Model):
     phone = models.CharField(max_length=20, blank=True, null=True)
     birthdate = models.DateField(blank=True, null=True)
     profile_picture = models.ImageField(upload_to="profile_pictures/", blank=True, null=True, default="profile_pictures/place_holder.png")
-    cv = models.FileField(upload_to='cvs/', blank=True, null=True)
+    cv = models.FileField(upload_to='cvs/', storage=get_content_addressed_storage, blank=True, null=True)
     additional_documents = models.ManyToManyField(Document, blank=True, related_name='jobseeker_profiles')
     is_premium = models.BooleanField(default=False)
     premium_since = models.DateTimeField(null=True, blank=True)
+    # Geocoded from postal_code and city on save, see geo.py
+    latitude = models.FloatField(null=True, blank=True, editable=False)
+    longitude = models.FloatField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['latitude', 'longitude'], name='jobseeker_location_idx'),
+        ]
+
     def __str__(self):
         return f"JobSeeker: {self.user.username}"
 
@@ -46,6 +123,14 @@ class EmployerProfile(models.Model):
     company_logo = models.ImageField(upload_to="company_logos/", blank=True, null=True,default="company_logos/place_holder.png")
     is_premium = models.BooleanField(default=False)
     premium_since = models.DateTimeField(null=True, blank=True)
+    # Geocoded from company_postal_code and company_city on save, see geo.py
+    latitude = models.FloatField(null=True, blank=True, editable=False)
+    longitude = models.FloatField(null=True, blank=True, editable=False)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['latitude', 'longitude'], name='employer_location_idx'),
+        ]
 
     def __str__(self):
         return f"Employer: {self.user.username} ({self.company_name})"
@@ -63,6 +148,43 @@ class JobPost(models.Model):
     company_logo = models.ImageField(upload_to="company_logos/", blank=True, null=True,default="company_logos/place_holder.png")
     is_visible = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Copy of employer.is_premium, so the job feed is read in the order of an index (see signals.py)
+    employer_is_premium = models.BooleanField(default=False, editable=False)
+    # Maintained by F() updates as applications and favorites change, see counters.py
+    application_count = models.IntegerField(default=0)
+    received_count = models.IntegerField(default=0)
+    in_progress_count = models.IntegerField(default=0)
+    accepted_count = models.IntegerField(default=0)
+    rejected_count = models.IntegerField(default=0)
+    favorite_count = models.IntegerField(default=0)
+    # Geocoded from location, or else from the company address, on save, see geo.py
+    latitude = models.FloatField(null=True, blank=True, editable=False)
+    longitude = models.FloatField(null=True, blank=True, editable=False)
+
+    COUNTER_FIELDS = ['application_count', 'received_count', 'in_progress_count', 'accepted_count', 'rejected_count', 'favorite_count']
+
+    class Meta:
+        indexes = [
+            # Public job feed: only visible posts, premium employers first, newest first
+            models.Index(
+                fields=['-employer_is_premium', '-created_at'], condition=models.Q(is_visible=True), name='jobpost_visible_feed_idx',
+            ),
+            # Visible posts, newest first
+            models.Index(fields=['-created_at'], condition=models.Q(is_visible=True), name='jobpost_visible_created_idx'),
+            # Duplicate title check when an employer publishes a post
+            models.Index(fields=['employer', 'title'], name='jobpost_employer_title_idx'),
+            # Bounding box of a radius search
+            models.Index(fields=['latitude', 'longitude'], name='jobpost_location_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        # The counters loaded with the instance may be stale by now, an update never writes them back
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS
+            ]
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return f"{self.title} at {self.company_name}"
@@ -78,12 +200,19 @@ class JobApplication(models.Model):
         
     job = models.ForeignKey("JobPost", on_delete=models.CASCADE, related_name="applications")
     candidate = models.ForeignKey(JobSeekerProfile, on_delete=models.CASCADE)
-    cover_letter_file = models.FileField(upload_to="cover_letters/", blank=True, null=True)
-    cv_file = models.FileField(upload_to="cvs/", blank=True, null=True)
+    cover_letter_file = models.FileField(upload_to="cover_letters/", storage=get_content_addressed_storage, blank=True, null=True)
+    cv_file = models.FileField(upload_to="cvs/", storage=get_content_addressed_storage, blank=True, null=True)
     applied_at = models.DateTimeField(auto_now_add=True)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='received')
     status_updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Applications of a job post, and of a candidate, by date
+            models.Index(fields=['job', 'applied_at'], name='application_job_applied_idx'),
+            models.Index(fields=['candidate', 'applied_at'], name='application_cand_applied_idx'),
+        ]
+
     def __str__(self):
         return f"{self.candidate.user.username} -> {self.job.title}"
     
@@ -97,7 +226,12 @@ class Message(models.Model):
     body = models.TextField()
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
-    
+
+    class Meta:
+        indexes = [
+            # Messages of a conversation in order, and its last message for the inbox
+            models.Index(fields=['application', 'created_at'], name='message_app_created_idx'),
+        ]
 
     def __str__(self):
         return f'Message from {self.sender.username} on {self.application.id}'
@@ -131,6 +265,49 @@ class SystemReview(models.Model):
     def __str__(self):
         return f"System review by {self.user.username} - {self.rating}/5"
 
+    def save(self, *args, **kwargs):
+        # The review statistics rollup is updated by signals.py, in the same transaction
+        with transaction.atomic(using=kwargs.get('using') or router.db_for_write(SystemReview, instance=self)):
+            super().save(*args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        with transaction.atomic(using=kwargs.get('using') or router.db_for_write(SystemReview, instance=self)):
+            return super().delete(*args, **kwargs)
+
+
+class SystemReviewTotals(models.Model):
+    """
+    Running count and sums of the system review ratings, see review_stats.py.
+    """
+    review_count = models.IntegerField(default=0)
+    rating_sum = models.IntegerField(default=0)
+    job_search_effectiveness_sum = models.IntegerField(default=0)
+    application_process_simplicity_sum = models.IntegerField(default=0)
+    message_system_effectiveness_sum = models.IntegerField(default=0)
+    ease_of_navigation_sum = models.IntegerField(default=0)
+
+    class Meta:
+        abstract = True
+
+
+class SystemReviewStats(SystemReviewTotals):
+    """ Totals over all the reviews, a single row """
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"System review stats ({self.review_count} reviews)"
+
+
+class SystemReviewDailyStats(SystemReviewTotals):
+    """ Totals of the reviews created on each day, for the trend charts """
+    day = models.DateField(unique=True)
+
+    class Meta:
+        ordering = ['day']
+
+    def __str__(self):
+        return f"System review stats of {self.day} ({self.review_count} reviews)"
+
 class JobApplicationStatusHistory(models.Model):
     application = models.ForeignKey(JobApplication, on_delete=models.CASCADE, related_name="status_history")
     status = models.CharField(max_length=20, choices=JobApplication.STATUS_CHOICES)
@@ -148,6 +325,9 @@ class JobFavorite(models.Model):
     class Meta:
         unique_together = ('job_seeker', 'job_post')
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['job_seeker', 'created_at'], name='favorite_seeker_created_idx'),
+        ]
 
     def __str__(self):
         return f"{self.job_seeker.user.username} - {self.job_post.title}"
@@ -168,6 +348,13 @@ class Appointment(models.Model):
     job_seeker_response_message = models.TextField(blank=True, null=True)
     job_seeker_response_date = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
-    
+
+    class Meta:
+        indexes = [
+            # Appointments of the employer or of the job seeker, in chronological order
+            models.Index(fields=['employer', 'appointment_time'], name='appointment_employer_time_idx'),
+            models.Index(fields=['job_seeker', 'appointment_time'], name='appointment_seeker_time_idx'),
+        ]
+
     def __str__(self):
         return f"Appointment: {self.job_seeker.user.username} with {self.employer.user.username} on {self.appointment_time} ({self.status})"
\ No newline at end of file
@@ -1,6 +1,233 @@
-from rest_framework.pagination import PageNumberPagination
+import base64
+import binascii
+import json
+from datetime import datetime
+from decimal import Decimal
+
+from django.core.exceptions import ValidationError
+from django.db import connections
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, CursorPagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
 
 class JobPostPagination(PageNumberPagination):
     page_size = 5  # Number of results per page
     page_size_query_param = 'page_size'  # Allows you to customise the page size using a parameter
-    max_page_size = 50  # Maximum number of results per page
\ No newline at end of file
+    max_page_size = 50  # Maximum number of results per page
+
+
+class JobApplicationPagination(PageNumberPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+
+
+class ConversationPagination(CursorPagination):
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    ordering = '-last_activity'  # Conversations with the most recent activity first
+
+
+class KeysetCursorPagination(BasePagination):
+    """
+    Keyset pagination that follows the ordering of the queryset, with the id as the last tie-breaker.
+    Each page is read with a WHERE clause on the last row seen instead of an OFFSET, so page N costs as much
+    as page 1 and rows added in the meantime never shift the pages already seen.
+    """
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
+    cursor_query_param = 'cursor'
+    count_query_param = 'count'  # ?count=approx adds an approximate total to the response
+    approximate_count_limit = 1000
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+        self.approximate_count = None
+        if request.query_params.get(self.count_query_param) == 'approx':
+            self.approximate_count = approximate_count(queryset, self.approximate_count_limit)
+
+        position, self.reverse = self.decode_cursor(request)
+        ordering = [(field, not descending) for field, descending in self.ordering] if self.reverse else self.ordering
+        queryset = queryset.order_by(*[('-' if descending else '') + field for field, descending in ordering])
+        if position is not None:
+            queryset = self.filter_after(queryset, ordering, position)
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        if self.reverse:
+            self.page.reverse()
+            self.has_next, self.has_previous = True, has_more
+        else:
+            self.has_next, self.has_previous = has_more, position is not None
+        return self.page
+
+    def get_paginated_response(self, data):
+        response = {
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+        }
+        if self.approximate_count is not None:
+            response['count'], response['count_is_approximate'] = self.approximate_count
+        response['results'] = data
+        return Response(response)
+
+    def get_page_size(self, request):
+        try:
+            page_size = int(request.query_params[self.page_size_query_param])
+            if page_size > 0:
+                return min(page_size, self.max_page_size)
+        except (KeyError, ValueError):
+            pass
+        return self.page_size
+
+    def get_ordering(self, queryset):
+        """ Reads the ordering from the queryset, with the primary key as a tie-breaker so every position is unique """
+        ordering = []
+        for term in queryset.query.order_by:
+            if not isinstance(term, str):
+                raise ValueError("Keyset pagination only supports orderings given by field name.")
+            ordering.append((term.lstrip('-'), term.startswith('-')))
+        if not any(field in ('id', 'pk') for field, descending in ordering):
+            ordering.append(('id', ordering[-1][1] if ordering else False))
+        return ordering
+
+    def keyset_filter(self, ordering, position):
+        """ Rows strictly after `position`: (a < x) OR (a = x AND b < y) OR (a = x AND b = y AND c < z)... """
+        condition = Q()
+        for index, (field, descending) in enumerate(ordering):
+            equal = {previous_field: position[previous_index] for previous_index, (previous_field, _) in enumerate(ordering[:index])}
+            lookup = f"{field}__{'lt' if descending else 'gt'}"
+            condition |= Q(**equal, **{lookup: position[index]})
+        return condition
+
+    def filter_after(self, queryset, ordering, position):
+        try:
+            return queryset.filter(self.keyset_filter(ordering, position))
+        except (TypeError, ValueError, ValidationError):
+            # A cursor edited by the client, with values that do not fit the fields
+            raise NotFound("Invalid cursor")
+
+    def get_position(self, instance):
+        position = []
+        for field, descending in self.ordering:
+            value = instance
+            for attribute in field.split('__'):
+                value = getattr(value, attribute)
+            if isinstance(value, datetime):
+                value = value.isoformat()
+            elif isinstance(value, Decimal):
+                value = str(value)
+            position.append(value)
+        return position
+
+    def encode_token(self, position, reverse=False):
+        payload = json.dumps({'p': position, 'r': reverse}, separators=(',', ':'))
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_token(self, token):
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.encode()).decode())
+            position, reverse = payload['p'], bool(payload['r'])
+        except (TypeError, ValueError, KeyError, binascii.Error):
+            raise NotFound("Invalid cursor")
+        if not isinstance(position, list) or len(position) != len(self.ordering):
+            raise NotFound("Invalid cursor")
+        return position, reverse
+
+    def encode_cursor(self, position, reverse):
+        cursor = self.encode_token(position, reverse)
+        return replace_query_param(self.request.build_absolute_uri(), self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None, False
+        return self.decode_token(cursor)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.get_position(self.page[-1]), reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.get_position(self.page[0]), reverse=True)
+
+
+class JobPostCursorPagination(KeysetCursorPagination):
+    """
+    Keyset pagination of the job feed (premium, creation date, id).
+    """
+    page_size = 5
+    max_page_size = 50
+
+
+class MessageCursorPagination(KeysetCursorPagination):
+    """
+    Messages of a conversation, the newest page first: `next` scrolls back in time.
+    Every response carries a `latest` token. Sent back as ?since=<token>, it returns only the messages posted
+    after it, oldest first, so refreshing a long thread reads the new rows only.
+    """
+    page_size = 30
+    max_page_size = 100
+    since_query_param = 'since'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        since = request.query_params.get(self.since_query_param)
+        if since is None:
+            self.since = None
+            page = super().paginate_queryset(queryset, request, view)
+            # Only the first page holds the newest message
+            self.latest = page[0] if page and not self.has_previous else None
+            return page
+
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+        self.since, _ = self.decode_token(since)
+        ordering = [(field, False) for field, descending in self.ordering]
+        queryset = self.filter_after(queryset.order_by(*[field for field, descending in ordering]), ordering, self.since)
+        results = list(queryset[:self.page_size + 1])
+        self.has_more = len(results) > self.page_size
+        self.page = results[:self.page_size]
+        self.latest = self.page[-1] if self.page else None
+        return self.page
+
+    def get_latest_token(self):
+        if self.latest is not None:
+            return self.encode_token(self.get_position(self.latest))
+        if self.since is not None:
+            return self.request.query_params[self.since_query_param]
+        return None
+
+    def get_paginated_response(self, data):
+        if self.since is None:
+            response = super().get_paginated_response(data)
+            response.data['latest'] = self.get_latest_token()
+            return response
+        # More than a page of new messages: the client asks again with the new `latest` right away
+        return Response({'latest': self.get_latest_token(), 'has_more': self.has_more, 'results': data})
+
+
+def approximate_count(queryset, limit):
+    """
+    Cheap estimate of the number of rows of `queryset`, as a (count, is_approximate) pair.
+    PostgreSQL reads the planner's row estimate, other databases count at most `limit` rows.
+    """
+    queryset = queryset.order_by()
+    if queryset.db and connections[queryset.db].vendor == 'postgresql':
+        plan = json.loads(queryset.explain(format='json'))
+        return int(plan[0]['Plan']['Plan Rows']), True
+    count = queryset[:limit + 1].count()
+    if count > limit:
+        return limit, True
+    return count, False
@@ -1,15 +1,17 @@
 from rest_framework.permissions import BasePermission
 
+from .user_context import get_user_context
+
 
 class IsEmployer(BasePermission):
     def has_permission(self, request, view):
-        return request.user.groups.filter(name='employer').exists()
+        return get_user_context(request).is_employer
 
     
 class IsJobSeeker(BasePermission):
     def has_permission(self, request, view):
-        return request.user.groups.filter(name='jobseeker').exists()
+        return get_user_context(request).is_jobseeker
     
 class IsAdmin(BasePermission):
     def has_permission(self, request, view):
-        return request.user.groups.filter(name='administrator').exists()
\ No newline at end of file
+        return get_user_context(request).is_admin
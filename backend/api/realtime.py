@@ -0,0 +1,199 @@
+"""
+Push channel for chat messages and inbox updates.
+
+Events are published on one channel per user and streamed to the browser as Server-Sent Events
+by `event_stream`, an async view served by the ASGI application (`uvicorn backend.asgi:application`):
+an open stream waits on the event loop and holds no worker thread. Under WSGI (`runserver`), Django
+buffers the whole stream until it ends, so the events arrive late. A stream still ends after
+`STREAM_LIFETIME` seconds and the browser reconnects, then fetches the messages sent meanwhile.
+
+Events are published from the sync views. The default broker only reaches the clients connected to
+the same process. With several workers, `RemoteBroker` relays the events through the local broker
+started with `manage.py run_message_broker`, a stand-in for a real message broker.
+"""
+import asyncio
+import json
+import socket
+import threading
+
+from django.conf import settings
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils.module_loading import import_string
+
+
+class InProcessBroker:
+    """
+    Delivers events to the subscribers of the current process.
+    """
+    queue_size = 100
+
+    def __init__(self):
+        self.subscribers = {}
+        self.lock = threading.Lock()
+
+    def publish(self, channel, event):
+        # Called from the sync views, which run in a worker thread: hand the event over to each subscriber's loop
+        with self.lock:
+            subscribers = list(self.subscribers.get(channel, ()))
+        for loop, queue in subscribers:
+            try:
+                loop.call_soon_threadsafe(self._deliver, queue, event)
+            except RuntimeError:
+                # The loop of the subscriber closed, its stream is gone
+                pass
+
+    @staticmethod
+    def _deliver(queue, event):
+        if not queue.full():  # A client that stopped reading misses events instead of growing the queue forever
+            queue.put_nowait(event)
+
+    async def subscribe(self, channel, timeout):
+        """
+        Yields the events of `channel` as they are published.
+        None is yielded once subscribed, then after every `timeout` seconds without events.
+        """
+        subscriber = (asyncio.get_running_loop(), asyncio.Queue(self.queue_size))
+        with self.lock:
+            self.subscribers.setdefault(channel, set()).add(subscriber)
+        try:
+            yield None
+            while True:
+                try:
+                    yield await asyncio.wait_for(subscriber[1].get(), timeout)
+                except asyncio.TimeoutError:
+                    yield None
+        finally:
+            with self.lock:
+                self.subscribers[channel].discard(subscriber)
+                if not self.subscribers[channel]:
+                    del self.subscribers[channel]
+
+
+class RemoteBroker:
+    """
+    Relays events through the broker of `run_message_broker`, so that every worker receives them.
+    The wire protocol is one JSON object per line: {"action": "publish" | "subscribe", "channel": ..., "event": ...}
+    """
+    timeout = 2
+
+    def __init__(self):
+        self.host, self.port = settings.REALTIME['BROKER_ADDRESS']
+        # One connection per process for all the published events, opened on first use
+        self.connection = None
+        self.lock = threading.Lock()
+
+    def publish(self, channel, event):
+        message = (json.dumps({'action': 'publish', 'channel': channel, 'event': event}) + "\n").encode()
+        with self.lock:
+            # A connection closed by the broker since the last event is only noticed on sending, try again once
+            for attempt in range(2):
+                try:
+                    if self.connection is None:
+                        self.connection = socket.create_connection((self.host, self.port), timeout=self.timeout)
+                    self.connection.sendall(message)
+                    return
+                except OSError:
+                    self.disconnect()
+            # Clients fall back to fetching the messages, losing a push must never fail the request
+
+    def disconnect(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    async def subscribe(self, channel, timeout):
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout)
+        try:
+            writer.write((json.dumps({'action': 'subscribe', 'channel': channel}) + "\n").encode())
+            await writer.drain()
+            yield None
+            while True:
+                try:
+                    line = await asyncio.wait_for(reader.readline(), timeout)
+                except asyncio.TimeoutError:
+                    yield None
+                    continue
+                if not line:
+                    return
+                yield json.loads(line)
+        finally:
+            writer.close()
+
+
+_broker = None
+_broker_lock = threading.Lock()
+
+
+def get_broker():
+    global _broker
+    with _broker_lock:
+        if _broker is None:
+            _broker = import_string(settings.REALTIME['BROKER'])()
+    return _broker
+
+
+def user_channel(user_id):
+    return f"user:{user_id}"
+
+
+def publish_to_users(user_ids, event_type, data):
+    broker = get_broker()
+    for user_id in set(user_ids):
+        broker.publish(user_channel(user_id), {'type': event_type, 'data': data})
+
+
+def notify_new_message(message):
+    """
+    Pushes a new message, and the matching inbox update, to both sides of the conversation.
+    """
+    from .serializers import MessageSerializer
+
+    data = MessageSerializer(message).data
+    participants = [message.sender_id, message.receiver_id]
+    publish_to_users(participants, 'message', {**data, 'application_id': message.application_id})
+    publish_to_users(participants, 'conversation', {
+        'application_id': message.application_id,
+        'last_message': message.body[:50] + "...",
+        'last_activity': data['created_at'],
+    })
+
+
+def format_event(event):
+    return f"event: {event['type']}\ndata: {json.dumps(event['data'], default=str)}\n\n"
+
+
+async def stream_user_events(user_id):
+    """ Server-Sent Events of the user, until the stream has been open for `STREAM_LIFETIME` seconds """
+    options = settings.REALTIME
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + options['STREAM_LIFETIME']
+    # Heartbeats come at least this often, so the stream ends close to its deadline
+    timeout = min(options['HEARTBEAT'], options['STREAM_LIFETIME'])
+    events = get_broker().subscribe(user_channel(user_id), timeout=timeout)
+    try:
+        await anext(events)  # Subscribed, no event is missed from now on
+        # Reconnection delay of the browser once the stream ends, in milliseconds
+        yield f"retry: {options['RETRY'] * 1000}\n\n"
+        async for event in events:
+            if event is None:
+                # Comment line, keeps proxies from closing an idle connection
+                yield ": heartbeat\n\n"
+            else:
+                yield format_event(event)
+            if loop.time() >= deadline:
+                return
+    finally:
+        await events.aclose()
+
+
+async def event_stream(request):
+    """
+    API endpoint that streams the new messages and inbox updates of the authenticated user as Server-Sent Events.
+    """
+    user = await request.auser()
+    if not user.is_authenticated:
+        return JsonResponse({"detail": "Authentication credentials were not provided."}, status=403)
+    response = StreamingHttpResponse(stream_user_events(user.id), content_type="text/event-stream")
+    response["Cache-Control"] = "no-cache"
+    response["X-Accel-Buffering"] = "no"  # Don't let nginx buffer the stream
+    return response
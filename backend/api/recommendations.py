@@ -0,0 +1,337 @@
+"""
+"Recommended for you": job posts whose title and description resemble those of the job posts a
+job seeker applied to or marked as favorite.
+
+Each job post is a TF-IDF vector of its words, hashed into `FEATURES` columns (the title counts
+twice), normalized to unit length. The vectors of all the job posts form a sparse CSR matrix,
+stored as plain .npy arrays in `RECOMMENDATIONS['DIRECTORY']`: every worker opens them with
+`mmap_mode='r'`, so they share the single copy of the page cache instead of each loading its own.
+A job seeker is the sum of the vectors of their applications and favorites, and the score of
+every job post is one sparse matrix-vector product over the memory-mapped arrays.
+
+The `build_recommendations` command fits the model on every job post. New and edited job posts
+are then added as small extra segments, with the IDF of the last build, by a background thread
+once their transaction is committed (see `signals.py`, and `job_import.py` for the bulk imports). A job post present in several segments
+takes its most recent vector. Past `MAX_SEGMENTS`, the extra segments are merged into one. Each
+update writes new files and then swaps the manifest, so readers never see a partial model.
+"""
+import contextlib
+import json
+import logging
+import os
+import shutil
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+
+from .models import JobApplication, JobFavorite, JobPost
+from .search import TOKEN_RE
+
+
+logger = logging.getLogger(__name__)
+
+ARRAYS = ['job_ids', 'indptr', 'indices', 'data']
+TITLE_WEIGHT = 2
+APPLICATION_WEIGHT = 1.5
+FAVORITE_WEIGHT = 1.0
+SCORE_BLOCK_ROWS = 4096  # Job posts scored at once, bounds the memory a request allocates
+
+_executor = None
+_executor_lock = threading.Lock()
+_loaded = None
+_loaded_lock = threading.Lock()
+
+
+def directory():
+    return settings.RECOMMENDATIONS['DIRECTORY']
+
+
+def hash_token(token, features):
+    return zlib.crc32(token.encode()) % features
+
+
+def term_counts(job_post, features):
+    """ (sorted feature indices, counts) of the words of a job post """
+    text = f"{job_post.title} " * TITLE_WEIGHT + (job_post.description or '')
+    hashed = np.fromiter((hash_token(token, features) for token in TOKEN_RE.findall(text.lower())), dtype=np.int64)
+    return np.unique(hashed, return_counts=True)
+
+
+def weigh(counts, idf):
+    """ Sublinear TF-IDF rows of unit length, from (feature indices, counts) pairs """
+    rows = []
+    for indices, frequencies in counts:
+        weights = ((1 + np.log(frequencies)) * idf[indices]).astype(np.float32)
+        norm = np.linalg.norm(weights)
+        rows.append((indices.astype(np.int32), weights / norm if norm else weights))
+    return rows
+
+
+def write_segment(path, job_ids, rows):
+    os.makedirs(path, exist_ok=True)
+    lengths = [len(indices) for indices, weights in rows]
+    arrays = {
+        'job_ids': np.asarray(job_ids, dtype=np.int64),
+        'indptr': np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)]),
+        'indices': np.concatenate([indices for indices, weights in rows]) if rows else np.zeros(0, np.int32),
+        'data': np.concatenate([weights for indices, weights in rows]) if rows else np.zeros(0, np.float32),
+    }
+    for name, array in arrays.items():
+        np.save(os.path.join(path, f"{name}.npy"), array)
+
+
+def read_segment(path):
+    return {name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode='r') for name in ARRAYS}
+
+
+@contextlib.contextmanager
+def write_lock():
+    """ One writer at a time across all the processes sharing the directory """
+    os.makedirs(directory(), exist_ok=True)
+    with open(os.path.join(directory(), '.lock'), 'a+b') as lock:
+        lock_file(lock)
+        try:
+            yield
+        finally:
+            unlock_file(lock)
+
+
+def lock_file(lock):
+    """ Waits for an exclusive lock on the open file `lock`, with fcntl on POSIX and msvcrt on Windows """
+    if os.name == 'nt':
+        import msvcrt
+        lock.seek(0)
+        while True:
+            try:
+                # Retries for 10 seconds before it raises, the previous writer may still be merging segments
+                msvcrt.locking(lock.fileno(), msvcrt.LK_LOCK, 1)
+                return
+            except OSError:
+                continue
+    import fcntl
+    fcntl.flock(lock, fcntl.LOCK_EX)
+
+
+def unlock_file(lock):
+    if os.name == 'nt':
+        import msvcrt
+        lock.seek(0)
+        msvcrt.locking(lock.fileno(), msvcrt.LK_UNLCK, 1)
+        return
+    import fcntl
+    fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def read_manifest():
+    try:
+        with open(os.path.join(directory(), 'manifest.json')) as manifest:
+            return json.load(manifest)
+    except FileNotFoundError:
+        return None
+
+
+def write_manifest(manifest):
+    path = os.path.join(directory(), 'manifest.json')
+    with open(f"{path}.tmp", 'w') as output:
+        json.dump(manifest, output)
+    os.replace(f"{path}.tmp", path)
+
+
+def remove_unused(manifest):
+    # A worker still reading a removed file keeps its mapping until it reloads the manifest
+    used = {manifest['version'], *manifest['segments']}
+    for entry in os.scandir(directory()):
+        if entry.is_dir() and entry.name not in used:
+            shutil.rmtree(entry.path, ignore_errors=True)
+
+
+def build(chunk_size=1000):
+    """ Fits the model on every job post and replaces the current one. Returns the number of job posts """
+    features = settings.RECOMMENDATIONS['FEATURES']
+    job_ids, counts = [], []
+    document_frequency = np.zeros(features, dtype=np.int64)
+    for job_post in JobPost.objects.only('id', 'title', 'description').order_by('pk').iterator(chunk_size=chunk_size):
+        indices, frequencies = term_counts(job_post, features)
+        document_frequency[indices] += 1
+        job_ids.append(job_post.pk)
+        counts.append((indices, frequencies))
+    idf = (np.log((1 + len(job_ids)) / (1 + document_frequency)) + 1).astype(np.float32)
+
+    with write_lock():
+        version = f"model-{time.time_ns()}"
+        path = os.path.join(directory(), version)
+        os.makedirs(path)
+        np.save(os.path.join(path, 'idf.npy'), idf)
+        base = f"{version}-base"
+        write_segment(os.path.join(directory(), base), job_ids, weigh(counts, idf))
+        manifest = {'version': version, 'features': features, 'segments': [base], 'built_at': time.time()}
+        write_manifest(manifest)
+        remove_unused(manifest)
+    return len(job_ids)
+
+
+def add_job_posts(job_ids):
+    """ Adds or replaces the vectors of `job_ids` with a new segment. Does nothing until the model is built """
+    with write_lock():
+        manifest = read_manifest()
+        if manifest is None:
+            return 0
+        idf = np.load(os.path.join(directory(), manifest['version'], 'idf.npy'), mmap_mode='r')
+        job_posts = list(JobPost.objects.filter(pk__in=job_ids).only('id', 'title', 'description').order_by('pk'))
+        if not job_posts:
+            return 0
+        rows = weigh([term_counts(job_post, manifest['features']) for job_post in job_posts], idf)
+
+        segment = f"{manifest['version']}-{time.time_ns()}"
+        write_segment(os.path.join(directory(), segment), [job_post.pk for job_post in job_posts], rows)
+        segments = [*manifest['segments'], segment]
+        if len(segments) > settings.RECOMMENDATIONS['MAX_SEGMENTS']:
+            segments = [segments[0], merge_segments(manifest['version'], segments[1:])]
+        manifest = {**manifest, 'segments': segments}
+        write_manifest(manifest)
+        remove_unused(manifest)
+    return len(job_posts)
+
+
+def merge_segments(version, segments):
+    """ Merges extra segments into one, keeping the most recent vector of each job post """
+    rows = {}
+    for name in segments:
+        segment = read_segment(os.path.join(directory(), name))
+        for row, job_id in enumerate(segment['job_ids']):
+            start, end = segment['indptr'][row], segment['indptr'][row + 1]
+            rows[int(job_id)] = (np.array(segment['indices'][start:end]), np.array(segment['data'][start:end]))
+    merged = f"{version}-{time.time_ns()}"
+    job_ids = sorted(rows)
+    write_segment(os.path.join(directory(), merged), job_ids, [rows[job_id] for job_id in job_ids])
+    return merged
+
+
+def load():
+    """ Segments of the current model, reopened only when the manifest changed. None before the first build """
+    global _loaded
+    try:
+        modified = os.stat(os.path.join(directory(), 'manifest.json')).st_mtime_ns
+    except FileNotFoundError:
+        return None
+    with _loaded_lock:
+        if _loaded is None or _loaded[0] != modified:
+            for attempt in range(3):
+                manifest = read_manifest()
+                try:
+                    segments = [read_segment(os.path.join(directory(), name)) for name in manifest['segments']]
+                    break
+                except FileNotFoundError:
+                    # Replaced by a writer between the manifest and the segments, the next manifest is complete
+                    if attempt == 2:
+                        raise
+            _loaded = (modified, manifest, segments)
+        return _loaded[1], _loaded[2]
+
+
+def schedule_update(job_ids):
+    """ Adds job posts to the model in the background, once they are committed """
+    job_ids = list(job_ids)
+
+    def submit():
+        get_executor().submit(update_in_background, job_ids)
+    transaction.on_commit(submit)
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # A single thread, the segments of a worker are written one after the other
+            _executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='recommendations')
+    return _executor
+
+
+def update_in_background(job_ids):
+    from django.db import connection
+    try:
+        add_job_posts(job_ids)
+    except Exception:
+        logger.exception("Could not add job posts %s to the recommendations", job_ids)
+    finally:
+        connection.close()
+
+
+def seeker_vector(segments, weights, features):
+    """ Weighted sum of the vectors of the job posts of `weights` ({job id: weight}), as a dense array """
+    vector = np.zeros(features, dtype=np.float32)
+    remaining = dict(weights)
+    # Most recent segments first: an edited job post counts with its last vector
+    for segment in reversed(segments):
+        if not remaining:
+            break
+        job_ids = np.fromiter(remaining, dtype=np.int64)
+        positions = np.searchsorted(segment['job_ids'], job_ids)
+        for job_id, position in zip(job_ids, positions):
+            if position < len(segment['job_ids']) and segment['job_ids'][position] == job_id:
+                start, end = segment['indptr'][position], segment['indptr'][position + 1]
+                np.add.at(vector, segment['indices'][start:end], segment['data'][start:end] * remaining.pop(int(job_id)))
+    return vector
+
+
+def score_segment(segment, vector):
+    """
+    Product of the CSR matrix of a segment with a dense vector: the score of each of its job posts.
+    Computed `SCORE_BLOCK_ROWS` rows at a time, so a request only allocates the products of one block
+    instead of copying the whole memory-mapped matrix.
+    """
+    indptr = np.asarray(segment['indptr'])
+    rows = len(indptr) - 1
+    scores = np.zeros(rows, dtype=np.float64)
+    for first in range(0, rows, SCORE_BLOCK_ROWS):
+        offsets = indptr[first:first + SCORE_BLOCK_ROWS + 1]
+        start, end = offsets[0], offsets[-1]
+        products = segment['data'][start:end] * vector[segment['indices'][start:end]]
+        cumulative = np.concatenate([[0], np.cumsum(products, dtype=np.float64)])
+        local = offsets - start
+        scores[first:first + len(offsets) - 1] = cumulative[local[1:]] - cumulative[local[:-1]]
+    return scores
+
+
+def recommend(jobseeker, limit=10):
+    """
+    [(job id, score)] of the best job posts for `jobseeker`, best first, excluding those they already applied
+    to or marked as favorite. About 3 * `limit` candidates are returned, some may be hidden job posts. Empty when
+    the model is not built or the job seeker has no history yet.
+    """
+    model = load()
+    if model is None:
+        return []
+    manifest, segments = model
+
+    weights = {}
+    for job_id in JobApplication.objects.filter(candidate=jobseeker).values_list('job_id', flat=True):
+        weights[job_id] = weights.get(job_id, 0) + APPLICATION_WEIGHT
+    for job_id in JobFavorite.objects.filter(job_seeker=jobseeker).values_list('job_post_id', flat=True):
+        weights[job_id] = weights.get(job_id, 0) + FAVORITE_WEIGHT
+    if not weights:
+        return []
+    vector = seeker_vector(segments, weights, manifest['features'])
+    if not vector.any():
+        return []
+
+    scores = {}
+    known = np.fromiter(weights, dtype=np.int64)
+    superseded = np.zeros(0, dtype=np.int64)
+    # Most recent segments first, the older vectors of an edited job post are left out
+    for segment in reversed(segments):
+        segment_scores = score_segment(segment, vector)
+        segment_scores[np.isin(segment['job_ids'], np.concatenate([known, superseded]))] = 0
+        superseded = np.concatenate([superseded, segment['job_ids']])
+        # Enough candidates per segment to fill `limit` once the hidden job posts are dropped
+        count = min(len(segment_scores), limit * 3)
+        best = np.argpartition(-segment_scores, count - 1)[:count] if count else []
+        for row in best:
+            if segment_scores[row] > 0:
+                scores[int(segment['job_ids'][row])] = float(segment_scores[row])
+    return sorted(scores.items(), key=lambda item: -item[1])
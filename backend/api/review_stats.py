@@ -0,0 +1,117 @@
+"""
+Rollup of the system review ratings.
+
+Instead of aggregating the whole review table on every call, a running count and sum of each rating
+is kept on a single row, plus one row per creation day for the trend charts. The receivers in
+`signals.py` apply the difference made by each create, update or delete, with F() expressions so
+concurrent writes never lose an update. `rebuild_review_stats` recomputes everything from scratch,
+e.g. after bulk changes that bypass signals.
+"""
+import datetime
+
+from django.db import transaction
+from django.db.models import Count, F, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+
+from .models import SystemReview, SystemReviewDailyStats, SystemReviewStats
+
+
+STATS_PK = 1
+
+# Rated field of the review -> key of its average in the API
+METRICS = {
+    'rating': 'average_rating',
+    'ease_of_navigation': 'average_ease',
+    'job_search_effectiveness': 'average_job_search',
+    'application_process_simplicity': 'average_application_process',
+    'message_system_effectiveness': 'average_message_system',
+}
+
+MAX_TREND_DAYS = 365
+
+
+def review_values(review):
+    """ What a review contributes to the totals """
+    return {'review_count': 1, **{f'{field}_sum': getattr(review, field) for field in METRICS}}
+
+
+def review_day(review):
+    return timezone.localdate(review.created_at)
+
+
+def apply_delta(model, lookup, delta, using='default'):
+    delta = {name: value for name, value in delta.items() if value}
+    if not delta:
+        return
+    model.objects.using(using).get_or_create(**lookup)
+    model.objects.using(using).filter(**lookup).update(**{name: F(name) + value for name, value in delta.items()})
+
+
+def record_change(previous, current, using='default'):
+    """
+    Applies the change from `previous` to `current` to the rollup. Each is a (day, values) pair,
+    or None for a review that does not exist (yet, or anymore).
+    """
+    deltas = {}
+    for sign, state in ((-1, previous), (1, current)):
+        if state is None:
+            continue
+        day, values = state
+        for bucket in (None, day):
+            bucket_delta = deltas.setdefault(bucket, {})
+            for name, value in values.items():
+                bucket_delta[name] = bucket_delta.get(name, 0) + sign * value
+
+    with transaction.atomic(using=using):
+        for bucket, delta in deltas.items():
+            if bucket is None:
+                apply_delta(SystemReviewStats, {'pk': STATS_PK}, delta, using)
+            else:
+                apply_delta(SystemReviewDailyStats, {'day': bucket}, delta, using)
+
+
+def averages(totals):
+    count = totals.review_count if totals else 0
+    result = {'total_reviews': count}
+    for field, key in METRICS.items():
+        result[key] = getattr(totals, f'{field}_sum') / count if count else 0
+    return result
+
+
+def get_stats():
+    """ Same figures as aggregating every review, read from a single row """
+    return averages(SystemReviewStats.objects.filter(pk=STATS_PK).first())
+
+
+def get_trend(days):
+    """ Daily totals and averages of the reviews created in the last `days` days, oldest first """
+    days = max(1, min(days, MAX_TREND_DAYS))
+    today = timezone.localdate()
+    start = today - datetime.timedelta(days=days - 1)
+    buckets = {row.day: row for row in SystemReviewDailyStats.objects.filter(day__gte=start, day__lte=today)}
+    return [
+        {'date': day, **averages(buckets.get(day))}
+        for day in (start + datetime.timedelta(days=offset) for offset in range(days))
+    ]
+
+
+@transaction.atomic
+def rebuild():
+    """ Recomputes the rollup from the reviews table """
+    sums = {f'{field}_sum': Sum(field) for field in METRICS}
+    SystemReviewDailyStats.objects.all().delete()
+    daily = (
+        SystemReview.objects
+        .annotate(day=TruncDate('created_at', tzinfo=timezone.get_current_timezone()))
+        .values('day')
+        .annotate(review_count=Count('id'), **sums)
+        .order_by('day')
+    )
+    SystemReviewDailyStats.objects.bulk_create(SystemReviewDailyStats(**row) for row in daily)
+
+    totals = SystemReview.objects.aggregate(review_count=Count('id'), **sums)
+    SystemReviewStats.objects.update_or_create(
+        pk=STATS_PK, defaults={name: value or 0 for name, value in totals.items()}
+    )
+    return totals['review_count']
@@ -0,0 +1,253 @@
+"""
+Full-text search indexes.
+
+SQLite (development) keeps each index in an FTS5 virtual table, PostgreSQL (production)
+keeps it in a `tsvector` column with a GIN index on the source table. Both are hidden
+behind the same backend interface, so views and filters never deal with raw SQL.
+The indexes are kept up to date by the receivers in `signals.py`.
+"""
+import re
+from abc import ABC, abstractmethod
+
+from django.db import connections
+from django.db.models import BooleanField, FloatField, Value
+from django.db.models.expressions import RawSQL
+
+
+# Relevance weight of each PostgreSQL weight class, reused for the FTS5 bm25() ranking
+WEIGHT_FACTORS = {'A': 10.0, 'B': 4.0, 'C': 2.0, 'D': 1.0}
+
+# Longer queries are truncated, they only slow the index down without improving relevance
+MAX_QUERY_TERMS = 10
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class FullTextIndex:
+    """
+    Describes which columns of a table are indexed, and how much each of them weighs.
+    """
+    def __init__(self, name, table, fields):
+        self.name = name
+        self.table = table
+        self.fields = fields  # Sequence of (column, weight class) pairs
+
+    @property
+    def columns(self):
+        return [column for column, weight in self.fields]
+
+    @property
+    def fts_table(self):
+        return f"{self.table}_fts"
+
+
+JOB_POST_INDEX = FullTextIndex(
+    name='jobposts',
+    table='api_jobpost',
+    fields=[
+        ('title', 'A'),
+        ('company_name', 'B'),
+        ('location', 'B'),
+        ('description', 'C'),
+    ],
+)
+
+
+# Text of the CVs, cover letters and documents, see document_text.py
+DOCUMENT_TEXT_INDEX = FullTextIndex(
+    name='documents',
+    table='api_documenttext',
+    fields=[
+        ('text', 'A'),
+    ],
+)
+
+
+def tokenize(query):
+    """ Splits a user query into lower-case search terms """
+    return TOKEN_RE.findall((query or '').lower())[:MAX_QUERY_TERMS]
+
+
+class BaseSearchBackend(ABC):
+    def __init__(self, connection):
+        self.connection = connection
+
+    def create_index(self, index):
+        """ Creates the index structures and fills them with the existing rows """
+
+    def drop_index(self, index):
+        """ Removes the index structures """
+
+    def index(self, index, obj):
+        """ Adds or refreshes a single row """
+
+    def index_many(self, index, ids):
+        """ Adds or refreshes several rows at once, for bulk inserts that bypass signals """
+
+    def remove(self, index, pk):
+        """ Removes a single row """
+
+    def rebuild(self, index):
+        """ Re-indexes the whole table from scratch """
+
+    @abstractmethod
+    def search(self, index, queryset, query):
+        """ Filters `queryset` on `query` and annotates each row with a `search_rank` (higher is better) """
+
+
+class SQLiteSearchBackend(BaseSearchBackend):
+    """
+    FTS5 virtual table keyed by the rowid of the source table.
+    """
+    def create_index(self, index):
+        columns = ", ".join(index.columns)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {index.fts_table} "
+                f"USING fts5({columns}, tokenize = 'unicode61 remove_diacritics 2')"
+            )
+        self.rebuild(index)
+
+    def drop_index(self, index):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DROP TABLE IF EXISTS {index.fts_table}")
+
+    def index(self, index, obj):
+        columns = ", ".join(index.columns)
+        placeholders = ", ".join(["%s"] * len(index.columns))
+        values = [getattr(obj, column) or '' for column in index.columns]
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {index.fts_table} WHERE rowid = %s", [obj.pk])
+            cursor.execute(
+                f"INSERT INTO {index.fts_table} (rowid, {columns}) VALUES (%s, {placeholders})",
+                [obj.pk, *values],
+            )
+
+    def index_many(self, index, ids):
+        ids = list(ids)
+        if not ids:
+            return
+        columns = ", ".join(index.columns)
+        sources = ", ".join(f"COALESCE({column}, '')" for column in index.columns)
+        placeholders = ", ".join(["%s"] * len(ids))
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {index.fts_table} WHERE rowid IN ({placeholders})", ids)
+            cursor.execute(
+                f"INSERT INTO {index.fts_table} (rowid, {columns}) "
+                f"SELECT id, {sources} FROM {index.table} WHERE id IN ({placeholders})",
+                ids,
+            )
+
+    def remove(self, index, pk):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {index.fts_table} WHERE rowid = %s", [pk])
+
+    def rebuild(self, index):
+        columns = ", ".join(index.columns)
+        sources = ", ".join(f"COALESCE({column}, '')" for column in index.columns)
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {index.fts_table}")
+            cursor.execute(
+                f"INSERT INTO {index.fts_table} (rowid, {columns}) SELECT id, {sources} FROM {index.table}"
+            )
+
+    def search(self, index, queryset, query):
+        terms = tokenize(query)
+        if not terms:
+            return queryset.none()
+        # Every term must match, the last one as a prefix so results show up while typing
+        match = " ".join(f'"{term}"' for term in terms) + "*"
+        weights = ", ".join(str(WEIGHT_FACTORS[weight]) for column, weight in index.fields)
+        matches = RawSQL(f"SELECT rowid FROM {index.fts_table} WHERE {index.fts_table} MATCH %s", [match])
+        # bm25() only works within a MATCH query, so each matching row looks its rank up by rowid
+        rank = RawSQL(
+            f"SELECT -bm25({index.fts_table}, {weights}) FROM {index.fts_table} "
+            f"WHERE {index.fts_table} MATCH %s AND rowid = {index.table}.id",
+            [match], output_field=FloatField(),
+        )
+        return queryset.filter(pk__in=matches).annotate(search_rank=rank)
+
+
+class PostgresSearchBackend(BaseSearchBackend):
+    """
+    `search_vector` tsvector column on the source table, with a GIN index.
+    """
+    def _vector_sql(self, index):
+        return " || ".join(
+            f"setweight(to_tsvector('simple', COALESCE({column}, '')), '{weight}')"
+            for column, weight in index.fields
+        )
+
+    def create_index(self, index):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"ALTER TABLE {index.table} ADD COLUMN IF NOT EXISTS search_vector tsvector")
+            cursor.execute(
+                f"CREATE INDEX IF NOT EXISTS {index.table}_search_gin ON {index.table} USING GIN (search_vector)"
+            )
+        self.rebuild(index)
+
+    def drop_index(self, index):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"DROP INDEX IF EXISTS {index.table}_search_gin")
+            cursor.execute(f"ALTER TABLE {index.table} DROP COLUMN IF EXISTS search_vector")
+
+    def index(self, index, obj):
+        self.index_many(index, [obj.pk])
+
+    def index_many(self, index, ids):
+        ids = list(ids)
+        if not ids:
+            return
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {index.table} SET search_vector = {self._vector_sql(index)} WHERE id = ANY(%s)",
+                [ids],
+            )
+
+    def remove(self, index, pk):
+        # The vector lives on the row itself and goes away with it
+        pass
+
+    def rebuild(self, index):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"UPDATE {index.table} SET search_vector = {self._vector_sql(index)}")
+
+    def search(self, index, queryset, query):
+        terms = tokenize(query)
+        if not terms:
+            return queryset.none()
+        tsquery = " & ".join(terms) + ":*"
+        matches = RawSQL(f"{index.table}.search_vector @@ to_tsquery('simple', %s)", [tsquery], output_field=BooleanField())
+        rank = RawSQL(f"ts_rank_cd({index.table}.search_vector, to_tsquery('simple', %s))", [tsquery], output_field=FloatField())
+        return queryset.filter(matches).annotate(search_rank=rank)
+
+
+class SimpleSearchBackend(BaseSearchBackend):
+    """
+    Fallback for databases without full-text support: every term must appear in one of the columns.
+    """
+    def search(self, index, queryset, query):
+        from django.db.models import Q
+
+        terms = tokenize(query)
+        if not terms:
+            return queryset.none()
+        for term in terms:
+            condition = Q()
+            for column in index.columns:
+                condition |= Q(**{f"{column}__icontains": term})
+            queryset = queryset.filter(condition)
+        return queryset.annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+
+SEARCH_BACKENDS = {
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def get_search_backend(using='default', connection=None):
+    """ Returns the search backend matching the database vendor of `using` """
+    connection = connection or connections[using]
+    backend_class = SEARCH_BACKENDS.get(connection.vendor, SimpleSearchBackend)
+    return backend_class(connection)
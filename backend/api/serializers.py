@@ -1,9 +1,33 @@
+import os
+
+from django.conf import settings
 from django.contrib.auth.models import User, Group
+from django.db import models
 from rest_framework import serializers
 
 
-from .models import JobApplication, JobFavorite, Message, JobSeekerProfile, EmployerProfile, JobPost, SystemReview, Document, Appointment
+from . import uploads
+from .images import variant_url
+from .user_context import get_user_context
+from .models import ChunkedUpload, JobApplication, JobFavorite, Message, JobSeekerProfile, EmployerProfile, JobPost, SystemReview, Document, Appointment
+
 
+class ImageVariantField(serializers.ImageField):
+    """
+    Image field that returns the URL of a resized variant (see images.py) instead of the original upload.
+    """
+    def __init__(self, variant, **kwargs):
+        self.variant = variant
+        super().__init__(**kwargs)
+
+    def to_representation(self, value):
+        url = variant_url(value, self.variant)
+        if url is None:
+            return None
+        request = self.context.get('request', None)
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
 
 
 class UserSerializer(serializers.ModelSerializer):
@@ -33,34 +57,69 @@ class MessageSerializer(serializers.ModelSerializer):
 
 
 class JobSeekerProfileSerializer(serializers.ModelSerializer):
-    profile_picture = serializers.ImageField(required=False, allow_null=True)
+    profile_picture = ImageVariantField('medium', required=False, allow_null=True)
     class Meta:
         model = JobSeekerProfile
         fields = '__all__'
 
+def get_favorite_job_ids(request, job_ids):
+    """
+    Returns the subset of `job_ids` that the authenticated job seeker has in their favorites, in a single query.
+    """
+    if not request or not request.user.is_authenticated or not job_ids:
+        return set()
+    job_seeker = get_user_context(request).jobseeker_profile
+    if job_seeker is None:
+        return set()
+    return set(
+        JobFavorite.objects.filter(job_seeker=job_seeker, job_post_id__in=job_ids)
+        .values_list('job_post_id', flat=True)
+    )
+
+
+class JobPostListSerializer(serializers.ListSerializer):
+    """
+    Loads the favorite flags of the whole page at once instead of once per job post.
+    """
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, models.manager.BaseManager) else data)
+        self.context['favorite_job_ids'] = get_favorite_job_ids(self.context.get('request'), [item.pk for item in items])
+        return super().to_representation(items)
+
+
 class JobPostSerializer(serializers.ModelSerializer):
-    company_logo = serializers.ImageField(required=False, allow_null=True)
+    # Shown on the job cards, the thumbnail is enough
+    company_logo = ImageVariantField('thumb', required=False, allow_null=True)
     is_favorite = serializers.SerializerMethodField()
     is_employer_premium = serializers.SerializerMethodField()
+    # Only in the results of a radius search (?near=), see geo.py
+    distance_km = serializers.FloatField(read_only=True)
     
     class Meta: 
         model = JobPost
-        fields = '__all__' 
+        # The counters are for the employer only, see EmployerJobPostSerializer
+        exclude = JobPost.COUNTER_FIELDS
+        list_serializer_class = JobPostListSerializer
         
     def get_is_favorite(self, obj):
-        request = self.context.get('request')
-        if request and request.user.is_authenticated:
-            try:
-                job_seeker = JobSeekerProfile.objects.get(user=request.user)
-                return JobFavorite.objects.filter(job_seeker=job_seeker, job_post=obj).exists()
-            except JobSeekerProfile.DoesNotExist:
-                return False
-        return False 
+        favorite_job_ids = self.context.get('favorite_job_ids')
+        if favorite_job_ids is None:
+            # Serialized on its own, outside of a list
+            favorite_job_ids = get_favorite_job_ids(self.context.get('request'), [obj.pk])
+        return obj.pk in favorite_job_ids
        
     def get_is_employer_premium(self, obj):
         return obj.employer.is_premium
 
 
+class EmployerJobPostSerializer(JobPostSerializer):
+    """ Job post as its employer sees it, with its application and favorite counters """
+    class Meta(JobPostSerializer.Meta):
+        exclude = None
+        fields = '__all__'
+        read_only_fields = JobPost.COUNTER_FIELDS
+
+
 class DocumentSerializer(serializers.ModelSerializer):
     class Meta:
         model = Document
@@ -69,7 +128,7 @@ class DocumentSerializer(serializers.ModelSerializer):
 
 
 class JobSeekerProfileSerializer(serializers.ModelSerializer):
-    profile_picture = serializers.ImageField(required=False, allow_null=True)
+    profile_picture = ImageVariantField('medium', required=False, allow_null=True)
     cv = serializers.FileField(required=False, allow_null=True)
     additional_documents = DocumentSerializer(many=True, read_only=True)
     class Meta:
@@ -78,8 +137,12 @@ class JobSeekerProfileSerializer(serializers.ModelSerializer):
 
 
 
+# Relations read by JobApplicationSerializer
+APPLICATION_RELATED = ['job', 'candidate__user']
+
+
 class JobApplicationSerializer(serializers.ModelSerializer):
-    candidate_username = serializers.CharField(source="candidate.username", read_only=True)
+    candidate_username = serializers.CharField(source="candidate.user.username", read_only=True)
     candidate_email = serializers.CharField(source="candidate.email", read_only=True)
     job_title = serializers.CharField(source="job.title", read_only=True)
     job_location = serializers.CharField(source="job.location", read_only=True)   
@@ -95,10 +158,8 @@ class JobApplicationSerializer(serializers.ModelSerializer):
         fields = '__all__'
         read_only_fields = ['id', 'applied_at', 'candidate_username', 'candidate_email', 'job_title', 'status_updated_at']
     
+    # Lists must load the applications with APPLICATION_RELATED, so that no row costs a query of its own
     def get_candidate_name(self, obj):
-        if hasattr(obj.candidate, 'jobseekerprofile'):
-            profile = obj.candidate.jobseekerprofile
-            return f"{profile.first_name} {profile.last_name}"
         return f"{obj.candidate.first_name} {obj.candidate.last_name}"
     
     def get_status_display(self, obj):
@@ -109,7 +170,7 @@ class JobApplicationSerializer(serializers.ModelSerializer):
 
 
 class EmployerProfileSerializer(serializers.ModelSerializer):
-    company_logo = serializers.ImageField(required=False, allow_null=True)
+    company_logo = ImageVariantField('medium', required=False, allow_null=True)
 
     class Meta:
         model = EmployerProfile
@@ -129,6 +190,22 @@ class JobApplicationCreateSerializer(serializers.ModelSerializer):
         model = JobApplication
         fields = ['job', 'candidate', 'cv_file', 'cover_letter_file']
 
+class ChunkedUploadSerializer(serializers.ModelSerializer):
+    max_chunk_size = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ChunkedUpload
+        fields = ['id', 'filename', 'size', 'offset', 'status', 'file', 'max_chunk_size', 'created_at']
+        read_only_fields = ['offset', 'status', 'file', 'created_at']
+
+    def get_max_chunk_size(self, obj):
+        return settings.CHUNKED_UPLOADS['MAX_CHUNK_SIZE']
+
+    def validate(self, data):
+        data['filename'] = os.path.basename(data['filename'].replace('\\', '/'))
+        uploads.validate_file(data['filename'], data['size'])
+        return data
+
 class JobFavoriteSerializer(serializers.ModelSerializer):
     job_title = serializers.CharField(source='job_post.title', read_only=True)
     company_name = serializers.CharField(source='job_post.company_name', read_only=True)
@@ -137,7 +214,7 @@ class JobFavoriteSerializer(serializers.ModelSerializer):
     salary_max = serializers.DecimalField(source='job_post.salary_max', max_digits=10, decimal_places=2, read_only=True)
     years_experience = serializers.IntegerField(source='job_post.years_experience', read_only=True)
     description = serializers.CharField(source='job_post.description', read_only=True)
-    company_logo = serializers.ImageField(source='job_post.company_logo', read_only=True)
+    company_logo = ImageVariantField('thumb', source='job_post.company_logo', read_only=True)
     created_at = serializers.DateTimeField(source='job_post.created_at', read_only=True)
     
     class Meta:
@@ -1,6 +1,11 @@
-from django.db.models.signals import post_migrate
+from django.db.models.signals import m2m_changed, post_migrate, pre_save, post_save, post_delete
 from django.dispatch import receiver
-from django.contrib.auth.models import Group, Permission
+from django.contrib.auth.models import Group, Permission, User
+
+from . import analytics, cache, counters, document_text, geo, images, recommendations, review_stats, storage
+from .models import ChunkedUpload, Document, DocumentText, EmployerProfile, JobApplication, JobFavorite, JobPost, JobSeekerProfile, StoredBlob, SystemReview
+from .search import DOCUMENT_TEXT_INDEX, JOB_POST_INDEX, get_search_backend
+from .user_context import invalidate_user_context
 
 
 @receiver(post_migrate)
@@ -8,4 +13,241 @@ def create_default_groups(sender, **kwargs):
     Group.objects.get_or_create(name='administrator')
     Group.objects.get_or_create(name='employer')
     Group.objects.get_or_create(name='jobseeker')
-    
+
+
+@receiver(post_save, sender=JobPost)
+def index_job_post(sender, instance, using, **kwargs):
+    # Keep the full-text search index in sync with the job post
+    get_search_backend(using).index(JOB_POST_INDEX, instance)
+    cache.invalidate_job_feed()
+
+
+@receiver(post_save, sender=JobPost)
+def update_recommendations(sender, instance, raw=False, **kwargs):
+    # New and edited job posts join the recommendation model in the background, the fixtures wait for the next build
+    if not raw:
+        recommendations.schedule_update([instance.pk])
+
+
+@receiver(post_delete, sender=JobPost)
+def unindex_job_post(sender, instance, using, **kwargs):
+    get_search_backend(using).remove(JOB_POST_INDEX, instance.pk)
+    cache.invalidate_job_feed()
+
+
+@receiver(pre_save, sender=JobSeekerProfile)
+@receiver(pre_save, sender=EmployerProfile)
+def geocode_profile(sender, instance, **kwargs):
+    geo.geocode_profile(instance)
+
+
+@receiver(pre_save, sender=JobPost)
+def copy_employer_fields(sender, instance, using, **kwargs):
+    # The premium flag of the employer orders the job feed. The company address is only read
+    # when the location itself is unknown to the gazetteer.
+    if JobPost.employer.is_cached(instance):
+        employer = instance.employer
+    else:
+        employer = EmployerProfile.objects.using(using).filter(pk=instance.employer_id).only(
+            'is_premium', 'company_postal_code', 'company_city',
+        ).first()
+    instance.employer_is_premium = bool(employer and employer.is_premium)
+    geo.geocode_job_post(instance, employer)
+
+
+def previous_values(sender, instance, using, *fields):
+    """ Saved values of `fields` of `instance`, before the current save, or None for a new row """
+    return sender.objects.using(using).filter(pk=instance.pk).values_list(*fields).first() if instance.pk else None
+
+
+@receiver(pre_save, sender=JobApplication)
+def track_application_state(sender, instance, using, **kwargs):
+    # Read along with the file names, so a save of an application costs a single SELECT, see track_blob_references()
+    previous = previous_values(sender, instance, using, 'job_id', 'status', *BLOB_FIELDS[sender])
+    instance._counted_state = previous[:2] if previous else None
+    instance._previous_blobs = list(previous[2:]) if previous else []
+
+
+@receiver(post_save, sender=JobApplication)
+def count_application(sender, instance, using, **kwargs):
+    # Applications of the job post, in total and per status
+    current = counters.application_state(instance)
+    counters.record_application_changes([(getattr(instance, '_counted_state', None), current)], using)
+    instance._counted_state = current
+
+
+@receiver(post_delete, sender=JobApplication)
+def uncount_application(sender, instance, using, **kwargs):
+    counters.record_application_changes([(counters.application_state(instance), None)], using)
+
+
+@receiver(post_save, sender=JobApplication)
+@receiver(post_delete, sender=JobApplication)
+def invalidate_employer_funnel(sender, instance, using, **kwargs):
+    analytics.invalidate_funnel_of_application(instance, using)
+
+
+@receiver(post_save, sender=JobFavorite)
+def count_favorite(sender, instance, created, using, **kwargs):
+    if created:
+        counters.record_favorite(instance.job_post_id, 1, using)
+
+
+@receiver(post_delete, sender=JobFavorite)
+def uncount_favorite(sender, instance, using, **kwargs):
+    counters.record_favorite(instance.job_post_id, -1, using)
+
+
+IMAGE_FIELDS = {
+    JobSeekerProfile: 'profile_picture',
+    EmployerProfile: 'company_logo',
+    JobPost: 'company_logo',
+}
+
+
+@receiver(pre_save, sender=JobSeekerProfile)
+@receiver(pre_save, sender=EmployerProfile)
+@receiver(pre_save, sender=JobPost)
+def track_image_change(sender, instance, using, raw=False, **kwargs):
+    if raw:
+        return
+    field = IMAGE_FIELDS[sender]
+    image = getattr(instance, field)
+    # An upload is only stored, under its final name, by the save itself
+    instance._image_uploaded = bool(image) and not image._committed
+    if instance._image_uploaded:
+        instance._image_changed = True
+    else:
+        previous = previous_values(sender, instance, using, field)
+        instance._image_changed = previous is None or previous[0] != image.name
+
+
+@receiver(post_save, sender=JobSeekerProfile)
+@receiver(post_save, sender=EmployerProfile)
+@receiver(post_save, sender=JobPost)
+def generate_image_variants(sender, instance, raw=False, **kwargs):
+    # Thumbnails of new images are made in the background, the original is served meanwhile.
+    # Fixtures are left to the generate_image_variants command.
+    image = getattr(instance, IMAGE_FIELDS[sender])
+    if raw or not image or not getattr(instance, '_image_changed', False):
+        return
+    images.schedule_variants(image.name, in_job_feed=sender is JobPost, new_file=instance._image_uploaded)
+
+
+@receiver(pre_save, sender=EmployerProfile)
+def track_premium_change(sender, instance, **kwargs):
+    previous = sender.objects.filter(pk=instance.pk).values_list('is_premium', flat=True).first() if instance.pk else None
+    instance._premium_changed = previous != instance.is_premium
+
+
+@receiver(post_save, sender=EmployerProfile)
+def invalidate_job_feed_on_premium_change(sender, instance, **kwargs):
+    # Premium employers are listed first, so their job posts move and the cached job feed is stale
+    if getattr(instance, '_premium_changed', False):
+        JobPost.objects.filter(employer=instance).update(employer_is_premium=instance.is_premium)
+        cache.invalidate_job_feed()
+
+
+# File fields stored in the content-addressed storage, whose blobs are reference counted
+BLOB_FIELDS = {
+    ChunkedUpload: ['file'],
+    Document: ['file'],
+    JobSeekerProfile: ['cv'],
+    JobApplication: ['cv_file', 'cover_letter_file'],
+}
+
+
+def blob_names(instance):
+    return [getattr(instance, field).name for field in BLOB_FIELDS[type(instance)]]
+
+
+@receiver(pre_save, sender=ChunkedUpload)
+@receiver(pre_save, sender=Document)
+@receiver(pre_save, sender=JobSeekerProfile)
+def track_blob_references(sender, instance, using, **kwargs):
+    # The blobs of a JobApplication are tracked by track_application_state()
+    instance._previous_blobs = list(previous_values(sender, instance, using, *BLOB_FIELDS[sender]) or [])
+
+
+@receiver(post_save, sender=ChunkedUpload)
+@receiver(post_save, sender=Document)
+@receiver(post_save, sender=JobSeekerProfile)
+@receiver(post_save, sender=JobApplication)
+def update_blob_references(sender, instance, **kwargs):
+    previous = getattr(instance, '_previous_blobs', [])
+    current = blob_names(instance)
+    # Files uploaded by this save already hold their reference, see ContentAddressedStorage._save()
+    claimed = [name for name in current if isinstance(name, storage.ClaimedBlobName)]
+    if previous != current or claimed:
+        storage.add_references([name for name in current if not isinstance(name, storage.ClaimedBlobName)])
+        storage.remove_references(previous)
+    for field in BLOB_FIELDS[sender]:
+        file = getattr(instance, field)
+        if isinstance(file.name, storage.ClaimedBlobName):
+            file.name = str(file.name)
+    instance._previous_blobs = blob_names(instance)
+
+
+@receiver(post_delete, sender=ChunkedUpload)
+@receiver(post_delete, sender=Document)
+@receiver(post_delete, sender=JobSeekerProfile)
+@receiver(post_delete, sender=JobApplication)
+def release_blob_references(sender, instance, **kwargs):
+    storage.remove_references(blob_names(instance))
+
+
+@receiver(post_save, sender=StoredBlob)
+def extract_document_text(sender, instance, created, raw=False, **kwargs):
+    # A changed file is a new blob, so each content is extracted once, in the background
+    if created and not raw:
+        document_text.schedule_extraction(instance.name)
+
+
+@receiver(post_delete, sender=DocumentText)
+def unindex_document_text(sender, instance, using, **kwargs):
+    # Deleted along with its blob by collect_blobs()
+    get_search_backend(using).remove(DOCUMENT_TEXT_INDEX, instance.pk)
+
+
+@receiver(pre_save, sender=SystemReview)
+def track_review_change(sender, instance, using, **kwargs):
+    previous = sender.objects.using(using).filter(pk=instance.pk).first() if instance.pk else None
+    instance._review_previous = (review_stats.review_day(previous), review_stats.review_values(previous)) if previous else None
+
+
+@receiver(post_save, sender=SystemReview)
+def update_review_stats(sender, instance, using, **kwargs):
+    current = (review_stats.review_day(instance), review_stats.review_values(instance))
+    review_stats.record_change(getattr(instance, '_review_previous', None), current, using)
+
+
+@receiver(post_delete, sender=SystemReview)
+def remove_review_stats(sender, instance, using, **kwargs):
+    previous = (review_stats.review_day(instance), review_stats.review_values(instance))
+    review_stats.record_change(previous, None, using)
+
+
+@receiver(post_save, sender=JobSeekerProfile)
+@receiver(post_save, sender=EmployerProfile)
+@receiver(post_delete, sender=JobSeekerProfile)
+@receiver(post_delete, sender=EmployerProfile)
+def invalidate_profile_context(sender, instance, **kwargs):
+    # The cached user context holds a copy of the profile
+    invalidate_user_context(instance.user_id)
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalidate_roles_context(sender, instance, action, reverse, pk_set, using, **kwargs):
+    if reverse and action == 'pre_clear':
+        # group.user_set.clear() does not say which users were removed, and they are gone after the clear
+        instance._cleared_user_ids = list(instance.user_set.using(using).values_list('pk', flat=True))
+    if not action.startswith('post_'):
+        return
+    if not reverse:
+        invalidate_user_context(instance.pk)
+    elif pk_set is not None:
+        for user_id in pk_set:
+            invalidate_user_context(user_id)
+    else:
+        for user_id in instance.__dict__.pop('_cleared_user_ids', ()):
+            invalidate_user_context(user_id)
@@ -0,0 +1,146 @@
+"""
+Content-addressed storage for CVs, cover letters and documents.
+
+Uploads are hashed while they are written to disk, and each distinct content is kept once under
+its SHA-256 (`blobs/3f/a2/3fa2....pdf`), so the same CV sent with every application takes the
+space of a single file. Every file field pointing to a blob is counted in `StoredBlob`: the
+receivers in `signals.py` add and drop references as rows are saved and deleted, and a blob
+is removed from disk once nothing points to it anymore. For the same reason, deleting a field
+file (`instance.cv.delete()`) only drops its reference and never removes a shared blob.
+
+An upload takes the reference of its row itself, in the same transaction that makes sure the
+blob is on disk, and before the row is even saved: a blob is never unreferenced between its
+upload and the save of the row pointing to it, when `collect_blobs()` could remove it. The
+reference of an upload whose row is never saved is left over until `dedupe_media` recounts them.
+"""
+import hashlib
+import os
+import tempfile
+
+from django.core.files.storage import FileSystemStorage
+from django.db import IntegrityError, transaction
+from django.db.models import F
+from django.utils.deconstruct import deconstructible
+
+
+BLOB_PREFIX = 'blobs'
+CHUNK_SIZE = 64 * 1024
+
+
+def blob_name(digest, extension):
+    return f"{BLOB_PREFIX}/{digest[:2]}/{digest[2:4]}/{digest}{extension.lower()}"
+
+
+def is_blob_name(name):
+    return bool(name) and name.startswith(f"{BLOB_PREFIX}/")
+
+
+class ClaimedBlobName(str):
+    """ Name of a blob returned by an upload, which already holds the reference of the row it is saved to """
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    def get_available_name(self, name, max_length=None):
+        # The final name comes from the content, see _save()
+        return name
+
+    def _save(self, name, content):
+        """ Streams `content` to a temporary file while hashing it, then keeps it only if the blob is new """
+        extension = os.path.splitext(name)[1][:10]
+        directory = os.path.join(self.location, BLOB_PREFIX)
+        os.makedirs(directory, exist_ok=True)
+
+        digest = hashlib.sha256()
+        size = 0
+        descriptor, temporary = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        try:
+            with os.fdopen(descriptor, 'wb') as output:
+                if hasattr(content, 'seek') and content.seekable():
+                    content.seek(0)
+                for chunk in content.chunks(CHUNK_SIZE):
+                    digest.update(chunk)
+                    output.write(chunk)
+                    size += len(chunk)
+
+            name = blob_name(digest.hexdigest(), extension)
+            with transaction.atomic():
+                # Referenced first: from here on, collect_blobs() waits for this transaction and then keeps the blob
+                claim_blob(name, digest.hexdigest(), size)
+                path = self.path(name)
+                if os.path.exists(path):
+                    os.remove(temporary)
+                else:
+                    os.makedirs(os.path.dirname(path), exist_ok=True)
+                    if self.file_permissions_mode is not None:
+                        os.chmod(temporary, self.file_permissions_mode)
+                    os.replace(temporary, path)
+        except BaseException:
+            if os.path.exists(temporary):
+                os.remove(temporary)
+            raise
+        return ClaimedBlobName(name)
+
+    def delete(self, name):
+        # Blobs are shared, they are removed by collect_blobs() once unreferenced
+        pass
+
+    def delete_blob(self, name):
+        super().delete(name)
+
+
+content_addressed_storage = ContentAddressedStorage()
+
+
+def get_content_addressed_storage():
+    return content_addressed_storage
+
+
+def claim_blob(name, sha256, size):
+    """ Adds a reference to the blob `name`, creating its row if needed """
+    from .models import StoredBlob
+
+    if StoredBlob.objects.filter(name=name).update(reference_count=F('reference_count') + 1):
+        return
+    try:
+        with transaction.atomic():
+            StoredBlob.objects.create(name=name, sha256=sha256, size=size, reference_count=1)
+    except IntegrityError:
+        # Created by a concurrent upload of the same content
+        StoredBlob.objects.filter(name=name).update(reference_count=F('reference_count') + 1)
+
+
+def add_references(names, delta=1):
+    """ Adds `delta` references to each blob of `names`, a name can appear several times """
+    from .models import StoredBlob
+
+    counts = {}
+    for name in names:
+        if is_blob_name(name):
+            counts[name] = counts.get(name, 0) + delta
+    for name, count in counts.items():
+        StoredBlob.objects.filter(name=name).update(reference_count=F('reference_count') + count)
+    if delta < 0 and counts:
+        transaction.on_commit(lambda: collect_blobs(list(counts)))
+
+
+def remove_references(names):
+    add_references(names, delta=-1)
+
+
+def collect_blobs(names=None):
+    """ Removes the unreferenced blobs among `names`, or all of them. Returns the number of blobs removed """
+    from .models import StoredBlob
+
+    unreferenced = StoredBlob.objects.filter(reference_count__lte=0)
+    if names is not None:
+        unreferenced = unreferenced.filter(name__in=names)
+    removed = 0
+    for name in unreferenced.values_list('name', flat=True).iterator():
+        with transaction.atomic():
+            # Re-checked row by row: a row saved or an upload made since the query above may have
+            # referenced the blob. An upload that comes after the delete creates the row and the file again.
+            if StoredBlob.objects.filter(name=name, reference_count__lte=0).delete()[0]:
+                content_addressed_storage.delete_blob(name)
+                removed += 1
+    return removed
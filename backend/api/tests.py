@@ -1,3 +1,1445 @@
-from django.test import TestCase
+import asyncio
+import base64
+import csv
+import datetime
+import json
+import os
+import re
+import socket
+import tempfile
+import unittest
+import zipfile
+import zlib
+from io import BytesIO, StringIO
+from types import SimpleNamespace
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache as django_cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import FileSystemStorage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.db.models import Avg, Count
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from PIL import Image
+from pypdf import PdfWriter
+from rest_framework.test import APIClient
+
+from . import cache, document_text, exports, geo, images, job_import, realtime, recommendations, storage, text_extraction, uploads
+from .models import Appointment, ChunkedUpload, Document, DocumentText, EmployerProfile, JobApplication, JobApplicationStatusHistory, JobFavorite, JobPost, JobSeekerProfile, Message, StoredBlob, SystemReview, SystemReviewDailyStats, SystemReviewStats
+from .pagination import JobPostCursorPagination, approximate_count
+from .serializers import JobPostSerializer
+from .user_context import get_user_context
+from .views import JobPostViewSet, MyConversationsView
+
+
+def setUpModule():
+    # Every request goes through MetricsMiddleware, whose files must not outlive the test run
+    directory = tempfile.TemporaryDirectory()
+    metrics_settings = override_settings(METRICS={**settings.METRICS, "DIRECTORY": directory.name})
+    metrics_settings.enable()
+    unittest.addModuleCleanup(directory.cleanup)
+    unittest.addModuleCleanup(metrics_settings.disable)
+
+
+def create_employer(username, **kwargs):
+    user = User.objects.create_user(username=username, email=f"{username}@example.com")
+    Group.objects.get(name='employer').user_set.add(user)
+    fields = {
+        "first_name": "Employer", "last_name": username, "address": "Rue du Rhône 1", "postal_code": "1204",
+        "city": "Geneva", "email": user.email, "phone": "0220000000", "birthdate": datetime.date(1980, 1, 1),
+        "company_name": f"{username} SA", "company_address": "Rue du Rhône 1", "company_postal_code": "1204",
+        "company_city": "Geneva", "company_phone": "0220000000",
+    }
+    fields.update(kwargs)
+    return EmployerProfile.objects.create(user=user, **fields)
+
+
+def create_jobseeker(username, **kwargs):
+    user = User.objects.create_user(username=username, email=f"{username}@example.com")
+    Group.objects.get(name='jobseeker').user_set.add(user)
+    fields = {"first_name": "Seeker", "last_name": username, "email": user.email, "postal_code": "1003", "city": "Lausanne"}
+    fields.update(kwargs)
+    return JobSeekerProfile.objects.create(user=user, **fields)
+
+
+def create_job_post(employer, title="Software Engineer", **kwargs):
+    fields = {
+        "description": "Build and maintain our platform.", "location": "Geneva", "salary_min": 80000,
+        "salary_max": 100000, "years_experience": 2, "company_name": employer.company_name,
+    }
+    fields.update(kwargs)
+    return JobPost.objects.create(employer=employer, title=title, **fields)
+
+
+class ConversationInboxTests(TestCase):
+    """
+    Benchmark of the conversation inbox: the number of queries must not depend on the number of conversations.
+    """
+    def setUp(self):
+        self.employer = create_employer("inbox-employer")
+        self.job = create_job_post(self.employer)
+
+    def add_conversations(self, count):
+        for _ in range(count):
+            index = JobApplication.objects.count()
+            candidate = create_jobseeker(f"inbox-candidate-{index}")
+            application = JobApplication.objects.create(job=self.job, candidate=candidate)
+            Message.objects.create(
+                application=application, sender=candidate.user, receiver=self.employer.user,
+                subject="Message", body=f"Hello from candidate {index}",
+            )
+
+    def count_inbox_queries(self, user):
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/api/conversations/", {"page_size": 100})
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response.json()["results"]
+
+    def test_query_count_is_constant(self):
+        self.add_conversations(3)
+        small_count, small_results = self.count_inbox_queries(self.employer.user)
+        self.add_conversations(30)
+        large_count, large_results = self.count_inbox_queries(self.employer.user)
+
+        self.assertEqual(len(small_results), 3)
+        self.assertEqual(len(large_results), 33)
+        self.assertEqual(small_count, large_count)
+
+    def test_ordered_by_last_activity_with_cursor(self):
+        self.add_conversations(3)
+        self.client.force_login(self.employer.user)
+        oldest = JobApplication.objects.order_by('applied_at').first()
+        Message.objects.create(
+            application=oldest, sender=self.employer.user, receiver=oldest.candidate.user,
+            subject="Message", body="Latest reply",
+        )
+
+        first_page = self.client.get("/api/conversations/", {"page_size": 2}).json()
+        self.assertEqual(first_page["results"][0]["application_id"], oldest.id)
+        self.assertEqual(first_page["results"][0]["last_message"], "Latest reply...")
+        self.assertEqual(first_page["results"][0]["name"], f"Seeker {oldest.candidate.last_name}")
+
+        second_page = self.client.get(first_page["next"]).json()
+        self.assertEqual(len(second_page["results"]), 1)
+        self.assertIsNone(second_page["next"])
+
+    def test_candidate_sees_employer(self):
+        self.add_conversations(1)
+        candidate = JobApplication.objects.get().candidate
+        count, results = self.count_inbox_queries(candidate.user)
+        self.assertEqual(results[0]["name"], f"Employer {self.employer.user.username}")
+        self.assertEqual(results[0]["job_title"], self.job.title)
+
+
+    def test_thread_pages_and_updates_since_latest(self):
+        self.add_conversations(1)
+        application = JobApplication.objects.get()
+        for index in range(40):
+            Message.objects.create(
+                application=application, sender=self.employer.user, receiver=application.candidate.user,
+                subject="Message", body=f"Reply {index}",
+            )
+        self.client.force_login(self.employer.user)
+        url = f"/api/applications/{application.id}/messages/"
+
+        newest = self.client.get(url, {"page_size": 30}).json()
+        self.assertEqual(newest["results"][0]["body"], "Reply 39")
+        older = self.client.get(newest["next"]).json()
+        self.assertEqual(len(older["results"]), 11)
+        self.assertIsNone(older["next"])
+
+        self.assertEqual(self.client.get(url, {"since": newest["latest"]}).json()["results"], [])
+        Message.objects.create(
+            application=application, sender=application.candidate.user, receiver=self.employer.user,
+            subject="Message", body="New message",
+        )
+        updates = self.client.get(url, {"since": newest["latest"]}).json()
+        self.assertEqual([message["body"] for message in updates["results"]], ["New message"])
+        self.assertFalse(updates["has_more"])
+
+
+class EventStreamTests(TestCase):
+    def setUp(self):
+        self.employer = create_employer("stream-employer")
+        self.application = JobApplication.objects.create(job=create_job_post(self.employer), candidate=create_jobseeker("stream-candidate"))
+
+    def send_message(self, body):
+        sender = APIClient()
+        sender.force_authenticate(self.employer.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            sender.post(f"/api/applications/{self.application.id}/messages/", {"subject": "Message", "body": body})
+
+    async def test_published_message_is_streamed(self):
+        await self.async_client.aforce_login(self.application.candidate.user)
+        response = await self.async_client.get("/api/events/")
+        self.assertEqual(response["Content-Type"], "text/event-stream")
+        stream = aiter(response.streaming_content)
+        self.assertEqual(await anext(stream), b"retry: 1000\n\n")
+
+        await sync_to_async(self.send_message)("Hello")
+        event, data = (await anext(stream)).decode().splitlines()[:2]
+        self.assertEqual(event, "event: message")
+        self.assertEqual(json.loads(data.removeprefix("data: "))["body"], "Hello")
+        self.assertTrue((await anext(stream)).startswith(b"event: conversation\n"))
+        await stream.aclose()
+
+    async def test_stream_ends_after_its_lifetime(self):
+        await self.async_client.aforce_login(self.application.candidate.user)
+        realtime = {**settings.REALTIME, "HEARTBEAT": 0.05, "STREAM_LIFETIME": 0.1}
+        with override_settings(REALTIME=realtime):
+            response = await self.async_client.get("/api/events/")
+            chunks = [chunk async for chunk in response.streaming_content]
+        self.assertEqual(chunks[0], b"retry: 1000\n\n")
+        self.assertEqual(set(chunks[1:]), {b": heartbeat\n\n"})
+
+    async def test_anonymous_user_is_refused(self):
+        self.assertEqual((await self.async_client.get("/api/events/")).status_code, 403)
+
+    def test_remote_broker_reuses_its_connection(self):
+        with socket.create_server(("127.0.0.1", 0)) as server:
+            with override_settings(REALTIME={**settings.REALTIME, "BROKER_ADDRESS": server.getsockname()}):
+                broker = realtime.RemoteBroker()
+            broker.publish("user:1", {"type": "message", "data": 1})
+            broker.publish("user:1", {"type": "message", "data": 2})
+            connection, address = server.accept()
+            server.settimeout(0.1)
+            self.assertRaises(socket.timeout, server.accept)
+            broker.disconnect()
+            with connection:
+                lines = connection.makefile().read().splitlines()
+        self.assertEqual([json.loads(line)["event"]["data"] for line in lines], [1, 2])
+
+    async def test_remote_broker_streams_the_relayed_events(self):
+        async def relay(reader, writer):
+            subscription = json.loads(await reader.readline())
+            writer.write((json.dumps({"type": "message", "data": subscription["channel"]}) + "\n").encode())
+            await writer.drain()
+            writer.close()
+
+        server = await asyncio.start_server(relay, "127.0.0.1", 0)
+        async with server:
+            with override_settings(REALTIME={**settings.REALTIME, "BROKER_ADDRESS": server.sockets[0].getsockname()}):
+                broker = realtime.RemoteBroker()
+            events = [event async for event in broker.subscribe("user:1", timeout=1)]
+        self.assertEqual(events, [None, {"type": "message", "data": "user:1"}])
+
+    def test_remote_broker_reuses_its_connection(self):
+        with socket.create_server(("127.0.0.1", 0)) as server:
+            with override_settings(REALTIME={**settings.REALTIME, "BROKER_ADDRESS": server.getsockname()}):
+                broker = realtime.RemoteBroker()
+            broker.publish("user:1", {"type": "message", "data": 1})
+            broker.publish("user:1", {"type": "message", "data": 2})
+            connection, address = server.accept()
+            server.settimeout(0.1)
+            self.assertRaises(socket.timeout, server.accept)
+            broker.disconnect()
+            with connection:
+                lines = connection.makefile().read().splitlines()
+        self.assertEqual([json.loads(line)["event"]["data"] for line in lines], [1, 2])
+
+
+class ApplicationListQueryTests(TestCase):
+    """
+    The application lists load the job and candidate of every row with the page: their query count is fixed.
+    """
+    def setUp(self):
+        self.employer = create_employer("list-employer")
+        self.job = create_job_post(self.employer)
+
+    def add_applications(self, count):
+        for _ in range(count):
+            candidate = create_jobseeker(f"list-candidate-{JobApplication.objects.count()}")
+            JobApplication.objects.create(job=self.job, candidate=candidate)
+
+    def get_page(self, url, queries):
+        self.client.get(url)  # The roles and profile of the user are cached by the first request
+        with self.assertNumQueries(queries):
+            return self.client.get(url, {"page_size": 100}).json()
+
+    def test_applications_by_job(self):
+        self.client.force_login(self.employer.user)
+        url = f"/api/jobposts/{self.job.id}/applications/"
+        self.add_applications(2)
+        # Session, user, job post, count, page
+        self.assertEqual(len(self.get_page(url, 5)["results"]), 2)
+        self.add_applications(30)
+        page = self.get_page(url, 5)
+        self.assertEqual(page["count"], 32)
+        self.assertEqual(page["results"][0]["candidate_username"], "list-candidate-31")
+
+    def test_applications_of_jobseeker(self):
+        candidate = create_jobseeker("list-seeker")
+        for index in range(12):
+            JobApplication.objects.create(job=create_job_post(self.employer, title=f"Job {index}"), candidate=candidate)
+        self.client.force_login(candidate.user)
+        # Session, user, count, page
+        page = self.get_page("/api/jobseeker/applications/", 4)
+        self.assertEqual(page["count"], 12)
+        self.assertEqual(page["results"][0]["job_title"], "Job 11")
+
+
+class ApplicationStatusTests(TestCase):
+    def setUp(self):
+        self.employer = create_employer("status-employer")
+        self.job = create_job_post(self.employer)
+        self.applications = [
+            JobApplication.objects.create(job=self.job, candidate=create_jobseeker(f"status-candidate-{index}")) for index in range(20)
+        ]
+        self.client.force_login(self.employer.user)
+
+    def bulk_update(self, data):
+        return self.client.post("/api/applications/bulk-update-status/", data, content_type="application/json")
+
+    def test_bulk_update_is_all_or_nothing(self):
+        other = JobApplication.objects.create(job=create_job_post(create_employer("status-other")), candidate=create_jobseeker("status-other-candidate"))
+        response = self.bulk_update({"ids": [self.applications[0].id, other.id], "status": "rejected"})
+        self.assertEqual(response.status_code, 403)
+        self.assertIn(str(other.id), response.json()["detail"])
+        self.assertFalse(JobApplication.objects.filter(status="rejected").exists())
+        self.assertEqual(self.bulk_update({"ids": [self.applications[0].id], "status": "hired"}).status_code, 400)
+
+    def test_bulk_update_writes_history_and_counters(self):
+        self.bulk_update({"ids": [self.applications[0].id], "status": "in_progress"})  # Caches the roles and profile
+        changes = [{"id": application.id, "status": "rejected"} for application in self.applications[1:]]
+        changes.append({"id": self.applications[0].id, "status": "in_progress"})
+        # Session, user, locked select, bulk_update, history, counters, and their savepoints
+        with self.assertNumQueries(10):
+            response = self.bulk_update({"changes": changes})
+        self.assertEqual(response.json()["updated"], 19)
+        self.assertEqual(response.json()["unchanged"], 1)
+        self.assertEqual(JobApplicationStatusHistory.objects.filter(status="rejected").count(), 19)
+        self.job.refresh_from_db()
+        self.assertEqual((self.job.rejected_count, self.job.in_progress_count, self.job.received_count), (19, 1, 0))
+
+        # A single update is recorded too, once per actual change
+        for _ in range(2):
+            self.client.patch(f"/api/applications/{self.applications[0].id}/update-status/", {"status": "accepted"}, content_type="application/json")
+        self.assertEqual(
+            list(self.applications[0].status_history.order_by("id").values_list("status", flat=True)), ["in_progress", "accepted"]
+        )
+
+
+class FavoriteBatchingTests(TestCase):
+    def test_favorites_of_a_page_in_one_query(self):
+        employer = create_employer("favorites-employer")
+        jobs = [create_job_post(employer, title=f"Job {i}") for i in range(12)]
+        candidate = create_jobseeker("favorites-candidate")
+        for job in jobs[::4]:
+            JobFavorite.objects.create(job_seeker=candidate, job_post=job)
+        request = RequestFactory().get("/api/jobposts/")
+        request.user = candidate.user
+        # Resolved beforehand, as by the permission classes of the view
+        get_user_context(request)
+        job_posts = list(JobPost.objects.select_related('employer').order_by('pk'))
+
+        with self.assertNumQueries(1):
+            data = JobPostSerializer(job_posts, many=True, context={'request': request}).data
+        self.assertEqual([item['title'] for item in data if item['is_favorite']], ["Job 0", "Job 4", "Job 8"])
+
+
+class JobFeedCacheTests(TestCase):
+    def setUp(self):
+        self.employer = create_employer("cache-employer")
+        self.job = create_job_post(self.employer, title="Cached job")
+
+    def get_feed(self):
+        return self.client.get("/api/jobposts/", {"ordering": "title"})
+
+    def test_hit_miss_and_invalidation_on_save(self):
+        before = cache.get_stats()
+        self.assertEqual(self.get_feed()["X-Cache"], "MISS")
+        response = self.get_feed()
+        self.assertEqual(response["X-Cache"], "HIT")
+        self.assertEqual(response.json()["results"][0]["title"], "Cached job")
+
+        self.job.title = "Renamed job"
+        self.job.save()
+        response = self.get_feed()
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.json()["results"][0]["title"], "Renamed job")
+
+        after = cache.get_stats()
+        self.assertEqual((after["hits"] - before["hits"], after["misses"] - before["misses"]), (1, 2))
+        self.client.force_login(User.objects.create_superuser("cache-admin"))
+        self.assertEqual(self.client.get("/api/jobposts/cache-stats/").json()["hits"], after["hits"])
+
+    def test_premium_change_invalidates(self):
+        self.assertEqual(self.get_feed()["X-Cache"], "MISS")
+        self.employer.is_premium = True
+        self.employer.save()
+        self.assertEqual(self.get_feed()["X-Cache"], "MISS")
+        self.assertEqual(self.get_feed()["X-Cache"], "HIT")
+
+    def titles(self):
+        return [item["title"] for item in self.client.get("/api/jobposts/").json()["results"]]
+
+    def test_premium_change_reorders_feed(self):
+        create_job_post(create_employer("newer-employer"), title="Newer job")
+        self.assertEqual(self.titles(), ["Newer job", "Cached job"])
+        self.employer.is_premium = True
+        self.employer.save()
+        self.assertEqual(self.titles(), ["Cached job", "Newer job"])
+        # New job posts of a premium employer are listed first as well
+        create_job_post(self.employer, title="Premium job")
+        self.assertEqual(self.titles(), ["Premium job", "Cached job", "Newer job"])
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        self.premium = create_employer("cursor-premium", is_premium=True)
+        regular = create_employer("cursor-regular")
+        for index in range(7):
+            create_job_post(self.premium if index % 2 else regular, title=f"Job {index}")
+        # Ties on both the premium flag and the creation date, only the id tells the job posts apart
+        JobPost.objects.update(created_at=timezone.now())
+
+    def follow(self, data, link):
+        pages = [[item["id"] for item in data["results"]]]
+        while data[link]:
+            data = self.client.get(data[link]).json()
+            pages.append([item["id"] for item in data["results"]])
+        return pages, data
+
+    def test_stable_pages_across_ties(self):
+        expected = list(JobPost.objects.order_by("-employer_is_premium", "-created_at", "-id").values_list("id", flat=True))
+        first = self.client.get("/api/jobposts/", {"pagination": "cursor", "page_size": 2}).json()
+        pages, last = self.follow(first, "next")
+        self.assertEqual([len(page) for page in pages], [2, 2, 2, 1])
+        self.assertEqual(sum(pages, []), expected)
+        # Back from the last page through `previous`, the same pages in reverse
+        self.assertEqual(self.follow(last, "previous")[0], pages[::-1])
+
+    def test_approximate_count(self):
+        params = {"pagination": "cursor", "page_size": 2, "count": "approx"}
+        data = self.client.get("/api/jobposts/", params).json()
+        self.assertEqual(list(data), ["next", "previous", "count", "count_is_approximate", "results"])
+        self.assertEqual((data["count"], data["count_is_approximate"]), (7, False))
+        self.assertNotIn("count", self.client.get("/api/jobposts/", {"pagination": "cursor"}).json())
+
+        # Past the limit, the rows are no longer counted
+        with mock.patch.object(JobPostCursorPagination, "approximate_count_limit", 5):
+            data = self.client.get("/api/jobposts/", {**params, "page_size": 3}).json()
+        self.assertEqual((data["count"], data["count_is_approximate"]), (5, True))
+
+    def test_approximate_count_from_the_planner(self):
+        plan = json.dumps([{"Plan": {"Node Type": "Seq Scan", "Plan Rows": 4200}}])
+        queryset = JobPost.objects.filter(is_visible=True)
+        with mock.patch.object(connection, "vendor", "postgresql"), mock.patch.object(type(queryset), "explain", return_value=plan) as explain:
+            self.assertEqual(approximate_count(queryset, 1000), (4200, True))
+        explain.assert_called_once_with(format="json")
+
+    def test_tampered_cursor(self):
+        def token(payload):
+            return base64.urlsafe_b64encode(json.dumps(payload).encode()).decode()
+
+        for cursor in [
+            "not a cursor", token({"p": [True, "2024-01-01T00:00:00+00:00"], "r": False}),
+            token({"p": ["maybe", "yesterday", "one"], "r": False}), token({"p": [True, "2024-01-01T00:00:00+00:00", {"id": 1}], "r": False}),
+        ]:
+            response = self.client.get("/api/jobposts/", {"cursor": cursor})
+            self.assertEqual(response.status_code, 404, cursor)
+
+        application = JobApplication.objects.create(job=JobPost.objects.filter(employer=self.premium).first(), candidate=create_jobseeker("cursor-seeker"))
+        self.client.force_login(self.premium.user)
+        response = self.client.get(f"/api/applications/{application.id}/messages/", {"since": token({"p": ["last week", 1], "r": False})})
+        self.assertEqual(response.status_code, 404)
+
+
+class UserContextTests(TestCase):
+    def setUp(self):
+        self.candidate = create_jobseeker("context-candidate")
+
+    def context(self):
+        request = RequestFactory().get("/")
+        request.user = self.candidate.user
+        return get_user_context(request)
+
+    def test_loaded_in_one_query_then_cached(self):
+        with self.assertNumQueries(1):
+            context = self.context()
+        self.assertEqual(context.roles, {"jobseeker"})
+        self.assertEqual(context.profile.pk, self.candidate.pk)
+        self.assertIsNone(context.employer_profile)
+        with self.assertNumQueries(0):
+            self.assertEqual(self.context().roles, {"jobseeker"})
+
+    def test_invalidated_on_profile_save(self):
+        self.context()
+        self.candidate.city = "Geneva"
+        self.candidate.save()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.context().profile.city, "Geneva")
+
+    def test_user_without_group_or_profile(self):
+        self.candidate.user.groups.clear()
+        self.candidate.delete()
+        context = self.context()
+        self.assertEqual(context.roles, set())
+        self.assertIsNone(context.profile)
+
+    def test_invalidated_when_the_group_is_cleared(self):
+        self.context()
+        Group.objects.get(name="jobseeker").user_set.clear()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.context().roles, set())
+
+    def test_toggle_premium_leaves_cached_context_untouched(self):
+        cached = self.context()
+        self.client.force_login(self.candidate.user)
+        self.assertTrue(self.client.post("/api/toggle-premium/").json()["is_premium"])
+        self.assertFalse(cached.jobseeker_profile.is_premium)
+        self.assertTrue(self.client.get("/api/premium-status/").json()["is_premium"])
+        self.assertFalse(self.client.post("/api/toggle-premium/").json()["is_premium"])
+        self.assertFalse(JobSeekerProfile.objects.get(pk=self.candidate.pk).is_premium)
+
+
+class ImageVariantTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.storage = FileSystemStorage(location=directory.name, base_url="/media/")
+
+    def save_image(self, name, color, format):
+        output = BytesIO()
+        Image.new("RGB", (300, 200), color).save(output, format=format)
+        name = self.storage.save(name, ContentFile(output.getvalue()))
+        self.addCleanup(django_cache.delete, images.readiness_key(name))
+        return name
+
+    def color(self, name):
+        with self.storage.open(name) as file:
+            return Image.open(file).convert("RGB").getpixel((0, 0))
+
+    def url(self, name):
+        return images.variant_url(SimpleNamespace(name=name, url="original"), "thumb", self.storage)
+
+    def test_images_sharing_a_stem(self):
+        png = self.save_image("company_logos/logo.png", (255, 0, 0), "PNG")
+        jpeg = self.save_image("company_logos/logo.jpg", (0, 0, 255), "JPEG")
+        self.assertEqual(self.url(png), "original")
+        png_variants, jpeg_variants = images.generate_variants(png, self.storage), images.generate_variants(jpeg, self.storage)
+
+        self.assertRegex(png_variants[0], r"^company_logos/variants/logo\.png\.[0-9a-f]{8}\.thumb\.webp$")
+        self.assertRegex(jpeg_variants[0], r"^company_logos/variants/logo\.jpg\.[0-9a-f]{8}\.thumb\.webp$")
+        self.assertGreater(self.color(png_variants[0])[0], 200)
+        self.assertGreater(self.color(jpeg_variants[0])[2], 200)
+        self.assertEqual(images.generate_variants(png, self.storage), [])
+
+        # Once ready, the URL comes from the cache without touching the storage
+        with mock.patch.object(self.storage, "open"), mock.patch.object(self.storage, "exists"):
+            self.assertEqual(self.url(png), f"/media/{png_variants[0]}")
+            self.assertEqual(self.url(jpeg), f"/media/{jpeg_variants[0]}")
+
+    def test_new_file_under_a_previous_name(self):
+        name = self.save_image("company_logos/logo.png", (255, 0, 0), "PNG")
+        previous = images.generate_variants(name, self.storage)
+        self.storage.delete(name)
+        self.save_image(name, (0, 255, 0), "PNG")
+        # As for a new upload, see signals.py
+        images.forget_variants(name, self.storage)
+        self.assertEqual(self.url(name), "original")
+        current = images.generate_variants(name, self.storage)
+        self.assertNotEqual(current, previous)
+        self.assertGreater(self.color(current[0])[1], 200)
+        self.assertEqual(self.url(name), f"/media/{current[0]}")
+
+    def test_digest_read_from_its_file_on_a_cache_miss(self):
+        name = self.save_image("company_logos/logo.png", (255, 0, 0), "PNG")
+        variants = images.generate_variants(name, self.storage)
+        django_cache.delete(images.readiness_key(name))
+        opened = []
+        original_open = self.storage.open
+        with mock.patch.object(self.storage, "open", side_effect=lambda path, *args: opened.append(path) or original_open(path, *args)):
+            self.assertEqual(self.url(name), f"/media/{variants[0]}")
+        self.assertEqual(opened, [images.digest_name(name)])
+
+    def test_scheduled_only_when_the_image_changes(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        profile = create_jobseeker("image-candidate")
+        output = BytesIO()
+        Image.new("RGB", (10, 10)).save(output, format="PNG")
+        with override_settings(MEDIA_ROOT=directory.name), mock.patch.object(images, "schedule_variants") as schedule:
+            profile.profile_picture = SimpleUploadedFile("me.png", output.getvalue())
+            profile.save()
+            schedule.assert_called_once_with(profile.profile_picture.name, in_job_feed=False, new_file=True)
+            profile.city = "Lausanne"
+            profile.save()
+            self.assertEqual(schedule.call_count, 1)
+            profile.profile_picture = "profile_pictures/place_holder.png"
+            profile.save()
+            schedule.assert_called_with("profile_pictures/place_holder.png", in_job_feed=False, new_file=False)
+
+
+class ReviewStatsTests(TestCase):
+    def review(self, user, rating, **kwargs):
+        fields = {
+            "rating": rating, "comment": "Fine", "job_search_effectiveness": rating, "application_process_simplicity": 3,
+            "message_system_effectiveness": 4, "ease_of_navigation": 5,
+        }
+        fields.update(kwargs)
+        self.client.force_login(user)
+        return self.client.post("/api/system-reviews/", fields, content_type="application/json").json()
+
+    def stats(self):
+        return self.client.get("/api/system-reviews/stats/", {"days": 2}).json()
+
+    def expected(self):
+        totals = SystemReview.objects.aggregate(
+            total_reviews=Count("id"), average_rating=Avg("rating"), average_ease=Avg("ease_of_navigation"),
+            average_job_search=Avg("job_search_effectiveness"),
+        )
+        return {key: value or 0 for key, value in totals.items()}
+
+    def assertStatsMatchReviews(self):
+        stats = self.stats()
+        for key, value in self.expected().items():
+            self.assertAlmostEqual(stats[key], value, msg=key)
+        self.assertEqual(stats["trend"][-1]["total_reviews"], stats["total_reviews"])
+        self.assertAlmostEqual(stats["trend"][-1]["average_rating"], stats["average_rating"])
+        self.assertEqual(stats["trend"][0]["total_reviews"], 0)
+
+    def test_rollup_follows_create_edit_and_delete(self):
+        first, second = create_jobseeker("reviewer-1").user, create_jobseeker("reviewer-2").user
+        self.assertEqual(self.stats()["total_reviews"], 0)
+        review = self.review(first, 5)
+        self.review(second, 2, ease_of_navigation=1)
+        self.assertStatsMatchReviews()
+        self.assertEqual(self.stats()["average_rating"], 3.5)
+
+        self.client.force_login(first)
+        self.client.patch(f"/api/system-reviews/{review['id']}/", {"rating": 3}, content_type="application/json")
+        self.assertStatsMatchReviews()
+        self.assertEqual(self.stats()["average_rating"], 2.5)
+
+        self.client.delete(f"/api/system-reviews/{review['id']}/")
+        self.assertStatsMatchReviews()
+        self.assertEqual((self.stats()["total_reviews"], self.stats()["average_ease"]), (1, 1))
+
+        SystemReview.objects.all().delete()
+        self.assertStatsMatchReviews()
+        self.assertEqual(self.stats()["average_rating"], 0)
+
+    def test_rebuild_matches_the_running_totals(self):
+        self.review(create_jobseeker("reviewer-1").user, 4)
+        self.review(create_jobseeker("reviewer-2").user, 1)
+        before = self.stats()
+        SystemReviewStats.objects.update(review_count=0, rating_sum=0)
+        SystemReviewDailyStats.objects.all().delete()
+        call_command("rebuild_review_stats", stdout=StringIO())
+        self.assertEqual(self.stats(), before)
+
+
+class JobSearchTests(TestCase):
+    def setUp(self):
+        employer = create_employer("search-employer")
+        create_job_post(employer, title="Accountant", description="Python scripts for the reporting.")
+        create_job_post(employer, title="Python Developer", description="Backend services.")
+        create_job_post(employer, title="Gardener", description="Parks and gardens.")
+        create_job_post(employer, title="Data Engineer", description="Python, Python and more Python pipelines.")
+
+    def titles(self, **params):
+        return [job["title"] for job in self.client.get("/api/jobposts/", params).json()["results"]]
+
+    def test_title_matches_rank_first(self):
+        titles = self.titles(q="python")
+        self.assertEqual(titles[0], "Python Developer")
+        self.assertEqual(sorted(titles), ["Accountant", "Data Engineer", "Python Developer"])
+
+    def test_last_term_is_a_prefix(self):
+        self.assertEqual(self.titles(q="python deve"), ["Python Developer"])
+        self.assertEqual(self.titles(q="parks gard"), ["Gardener"])
+        # Only the last term, the one being typed, matches as a prefix
+        self.assertEqual(self.titles(q="pyth developer"), [])
+
+    def test_explicit_ordering_replaces_relevance(self):
+        self.assertEqual(self.titles(q="python", ordering="title"), ["Accountant", "Data Engineer", "Python Developer"])
+        # Without a search, the default ordering applies: premium employers, then the newest job posts
+        self.assertEqual(self.titles(), ["Data Engineer", "Gardener", "Python Developer", "Accountant"])
+
+
+class QueryPlanTests(TestCase):
+    """
+    Runs EXPLAIN on the hottest queries of the API and fails as soon as one of them reads a whole table.
+    """
+    @classmethod
+    def setUpTestData(cls):
+        cls.employers = [create_employer(f"plan-employer-{i}", is_premium=i == 0) for i in range(5)]
+        cls.candidates = [create_jobseeker(f"plan-candidate-{i}") for i in range(20)]
+        cls.job_posts = [
+            create_job_post(cls.employers[i % 5], title=f"Job {i}", is_visible=i % 4 != 0) for i in range(100)
+        ]
+        cls.applications = [
+            JobApplication.objects.create(job=cls.job_posts[i % 100], candidate=cls.candidates[i % 20]) for i in range(300)
+        ]
+        for application in cls.applications[:100]:
+            Message.objects.create(
+                application=application, sender=application.candidate.user, receiver=application.job.employer.user,
+                subject="Message", body="Hello",
+            )
+            Appointment.objects.create(
+                employer=application.job.employer, job_seeker=application.candidate, job_application=application,
+                appointment_time=timezone.now(), description="Interview",
+            )
+        for i in range(60):
+            JobFavorite.objects.get_or_create(job_seeker=cls.candidates[i % 20], job_post=cls.job_posts[i])
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE")
+
+    def assertNoFullScan(self, queryset, *tables):
+        """
+        Fails when the plan reads every row of one of `tables`: a sequential scan, or a walk of a whole index.
+        An index walk in the order of the query is only bounded by its LIMIT, without a sort in between.
+        """
+        limited = queryset.query.high_mark is not None
+        if connection.vendor == 'postgresql':
+            # Sequential scans are always an option on small tables, only fall back to them when no index applies
+            with connection.cursor() as cursor:
+                cursor.execute("SET enable_seqscan = off")
+            plan = queryset.explain()
+            ordered_walk = limited and plan.lstrip().startswith("Limit") and not re.search(r"\bSort\b", plan)
+            for table in tables:
+                for node in re.split(r"\n\s*->\s*", plan):
+                    if re.match(rf"Seq Scan on {table}\b", node):
+                        self.fail(f"Full scan of {table}:\n{plan}")
+                    if re.match(rf"Index (Only )?Scan (Backward )?using \w+ on {table}\b", node) and "Index Cond" not in node:
+                        self.assertTrue(ordered_walk, f"Full index scan of {table}:\n{plan}")
+        else:
+            plan = queryset.explain()
+            ordered_walk = limited and "USE TEMP B-TREE FOR ORDER BY" not in plan
+            for table in tables:
+                for line in re.findall(rf"\b(?:SCAN|SEARCH) {table}\b.*", plan):
+                    if line.startswith("SEARCH"):
+                        continue
+                    self.assertRegex(line, r"\bUSING (COVERING )?INDEX\b", f"Full scan of {table}:\n{plan}")
+                    self.assertTrue(ordered_walk, f"Full index scan of {table}:\n{plan}")
+
+    def test_job_feed(self):
+        queryset = JobPostViewSet.queryset.order_by(*JobPostViewSet.ordering)[:5]
+        self.assertNoFullScan(queryset, "api_jobpost", "api_employerprofile")
+
+    def test_radius_search(self):
+        queryset = geo.within_radius(JobPostViewSet.queryset, 46.5197, 6.6323, 25).order_by('distance_km')[:5]
+        self.assertNoFullScan(queryset, "api_jobpost")
+
+    def test_job_feed_by_date(self):
+        queryset = JobPostViewSet.queryset.order_by('-created_at')[:5]
+        self.assertNoFullScan(queryset, "api_jobpost")
+
+    def test_employer_duplicate_title(self):
+        queryset = JobPost.objects.filter(employer=self.employers[0], title="Job 5")
+        self.assertNoFullScan(queryset, "api_jobpost")
+
+    def test_applications_by_job(self):
+        queryset = JobApplication.objects.filter(job=self.job_posts[1]).order_by('-candidate__is_premium', '-applied_at')
+        self.assertNoFullScan(queryset, "api_jobapplication")
+
+    def test_applications_by_candidate(self):
+        queryset = JobApplication.objects.filter(candidate=self.candidates[1]).order_by('-applied_at')
+        self.assertNoFullScan(queryset, "api_jobapplication")
+
+    def test_conversation_messages(self):
+        queryset = Message.objects.filter(application=self.applications[1]).order_by('created_at')
+        self.assertNoFullScan(queryset, "api_message")
+
+    def test_conversation_inbox(self):
+        view = MyConversationsView(request=SimpleNamespace(user=self.employers[1].user))
+        queryset = view.get_queryset().order_by('-last_activity')[:20]
+        self.assertNoFullScan(queryset, "api_jobapplication")
+
+    def test_last_message(self):
+        # Same lookup as the last message subquery of the inbox
+        queryset = Message.objects.filter(application=self.applications[1]).order_by('-created_at')[:1]
+        self.assertNoFullScan(queryset, "api_message")
+
+    def test_appointments(self):
+        self.assertNoFullScan(Appointment.objects.filter(employer=self.employers[1]).order_by('appointment_time'), "api_appointment")
+        self.assertNoFullScan(Appointment.objects.filter(job_seeker=self.candidates[1]).order_by('appointment_time'), "api_appointment")
+
+    def test_favorites(self):
+        queryset = JobFavorite.objects.filter(job_seeker=self.candidates[1]).order_by('-created_at')
+        self.assertNoFullScan(queryset, "api_jobfavorite")
+
+
+class JobPostCounterTests(TestCase):
+    def counters(self, job):
+        job.refresh_from_db()
+        return {field: getattr(job, field) for field in JobPost.COUNTER_FIELDS if getattr(job, field)}
+
+    def test_counters_follow_applications_and_favorites(self):
+        job = create_job_post(create_employer("acme"))
+        first, second = create_jobseeker("first"), create_jobseeker("second")
+        application = JobApplication.objects.create(job=job, candidate=first)
+        JobApplication.objects.create(job=job, candidate=second)
+        application.status = "accepted"
+        application.save()
+        JobFavorite.objects.create(job_seeker=first, job_post=job)
+        JobFavorite.objects.create(job_seeker=second, job_post=job).delete()
+        expected = {"application_count": 2, "received_count": 1, "accepted_count": 1, "favorite_count": 1}
+        self.assertEqual(self.counters(job), expected)
+
+        # A save of a job post loaded earlier does not overwrite the counters
+        JobApplication.objects.get(candidate=second).delete()
+        job.title = "Senior Software Engineer"
+        job.save()
+        self.assertEqual(self.counters(job), {"application_count": 1, "accepted_count": 1, "favorite_count": 1})
+
+        JobPost.objects.filter(pk=job.pk).update(application_count=10, favorite_count=0)
+        call_command("reconcile_job_counters", stdout=StringIO())
+        self.assertEqual(self.counters(job), {"application_count": 1, "accepted_count": 1, "favorite_count": 1})
+
+    def test_application_save_reads_its_previous_state_once(self):
+        application = JobApplication.objects.create(job=create_job_post(create_employer("acme")), candidate=create_jobseeker("seeker"))
+        application.status = "accepted"
+        with CaptureQueriesContext(connection) as queries:
+            application.save()
+        selects = [query["sql"] for query in queries if query["sql"].startswith("SELECT") and 'FROM "api_jobapplication"' in query["sql"]]
+        self.assertEqual(len(selects), 1)
+        self.assertEqual(self.counters(application.job), {"application_count": 1, "accepted_count": 1})
+
+
+class EmployerFunnelTests(TestCase):
+    def test_funnel_across_jobs(self):
+        employer = create_employer("funnel")
+        job = create_job_post(employer)
+        applied_at = timezone.now() - datetime.timedelta(days=1)
+        for index, hours in enumerate([2, 4, 30, None]):
+            application = JobApplication.objects.create(job=job, candidate=create_jobseeker(f"funnel-{index}"))
+            JobApplication.objects.filter(pk=application.pk).update(
+                applied_at=applied_at, status="received" if hours is None else "accepted",
+                status_updated_at=applied_at + datetime.timedelta(hours=hours or 0),
+            )
+        self.client.force_login(employer.user)
+
+        funnel = self.client.get("/api/employer-analytics/funnel/", {"days": 7}).json()
+        self.assertEqual(funnel["by_status"], {"received": 1, "in_progress": 0, "accepted": 3, "rejected": 0})
+        self.assertEqual(funnel["median_response_hours"], 4.0)
+        self.assertEqual([day["applications"] for day in funnel["intake"]], [0, 0, 0, 0, 0, 4, 0])
+
+        # Cached until one of the employer's applications changes
+        application = JobApplication.objects.filter(status="received").get()
+        application.status = "rejected"
+        application.save()
+        funnel = self.client.get("/api/employer-analytics/funnel/").json()
+        self.assertEqual(funnel["by_status"]["rejected"], 1)
+
+
+class JobFacetTests(TestCase):
+    def facets(self, **params):
+        return self.client.get("/api/jobposts/", {"facets": "true", **params}).json()["facets"]
+
+    def test_facets_follow_filters(self):
+        employer = create_employer("facets")
+        create_job_post(employer, location="Geneva", salary_min=45000, years_experience=0)
+        create_job_post(employer, location="Geneva", salary_min=85000, years_experience=3)
+        create_job_post(employer, location="Zurich", salary_min=140000, years_experience=12)
+
+        facets = self.facets()
+        self.assertEqual([(item["value"], item["count"]) for item in facets["location"]], [("Geneva", 2), ("Zurich", 1)])
+        self.assertEqual([item["count"] for item in facets["salary"]], [1, 0, 1, 0, 1])
+        self.assertEqual([item["count"] for item in facets["years_experience"]], [1, 1, 0, 1])
+
+        # The filters of a band select its job posts
+        band = facets["salary"][2]["filters"]
+        self.assertEqual(self.client.get("/api/jobposts/", band).json()["count"], 1)
+        self.assertEqual([item["count"] for item in self.facets(location="Geneva")["years_experience"]], [1, 1, 0, 0])
+
+        # The unfiltered facets are cached: another page only reads the page and its count
+        with self.assertNumQueries(2):
+            self.facets(page_size=1)
+
+
+class GeoSearchTests(TestCase):
+    def test_job_posts_near_a_postal_code(self):
+        employer = create_employer("geo", company_postal_code="1003", company_city="Lausanne")
+        self.assertEqual((employer.latitude, employer.longitude), geo.locate("1003"))
+        create_job_post(employer, title="Geneva", location="Genève")
+        create_job_post(employer, title="Renens", location="Renens VD")
+        create_job_post(employer, title="Remote", location="Remote")  # Placed at the company address
+        create_job_post(employer, title="Zurich", location="8004 Zurich")
+
+        results = self.client.get("/api/jobposts/", {"near": "1003", "radius_km": 10}).json()["results"]
+        self.assertEqual([job["title"] for job in results], ["Remote", "Renens"])
+        self.assertAlmostEqual(results[1]["distance_km"], 4.1, places=1)
+        results = self.client.get("/api/jobposts/", {"near": "Geneva", "radius_km": 60}).json()["results"]
+        self.assertEqual([job["title"] for job in results], ["Geneva", "Renens", "Remote"])
+        self.assertEqual(self.client.get("/api/jobposts/", {"near": "Atlantis"}).status_code, 400)
+
+
+class RecommendationTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(RECOMMENDATIONS={"DIRECTORY": directory.name, "FEATURES": 2 ** 12, "MAX_SEGMENTS": 2})
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def recommended(self):
+        return [job["title"] for job in self.client.get("/api/jobseeker/recommendations/").json()["results"]]
+
+    def test_recommendations_follow_applications_and_favorites(self):
+        employer = create_employer("recommender")
+        python = create_job_post(employer, title="Python Developer", description="Django and PostgreSQL backend services.")
+        create_job_post(employer, title="Senior Python Engineer", description="Django REST APIs and data pipelines.")
+        create_job_post(employer, title="Chef de cuisine", description="Seasonal menus for our restaurant kitchen.")
+        candidate = create_jobseeker("recommended")
+        self.client.force_login(candidate.user)
+        self.assertEqual(self.client.get("/api/jobseeker/recommendations/").json()["personalized"], False)
+
+        recommendations.build()
+        JobFavorite.objects.create(job_seeker=candidate, job_post=python)
+        self.assertEqual(self.recommended(), ["Senior Python Engineer"])
+
+        # New job posts join the model without a rebuild, the segments are merged past MAX_SEGMENTS
+        for title, description in [("Pastry Chef", "Cakes for our restaurant."), ("Django Developer", "Python web backend.")]:
+            recommendations.add_job_posts([create_job_post(employer, title=title, description=description).pk])
+        self.assertEqual(len(recommendations.read_manifest()["segments"]), 2)
+        self.assertEqual(self.recommended(), ["Django Developer", "Senior Python Engineer"])
+
+    def test_segment_scored_by_blocks_of_rows(self):
+        generator = np.random.default_rng(1)
+        dense = generator.random((10, 16), dtype=np.float32) * (generator.random((10, 16)) < 0.3)
+        dense[[0, 4, 9]] = 0  # Empty rows, including at the edges of the blocks
+        indptr = np.concatenate([[0], np.cumsum(np.count_nonzero(dense, axis=1))])
+        segment = {"indptr": indptr, "indices": np.nonzero(dense)[1].astype(np.int32), "data": dense[np.nonzero(dense)]}
+        vector = generator.random(16)
+        with mock.patch.object(recommendations, "SCORE_BLOCK_ROWS", 3):
+            np.testing.assert_allclose(recommendations.score_segment(segment, vector), dense @ vector, rtol=1e-6)
+
+    def test_imported_job_posts_join_the_model(self):
+        employer = create_employer("recommended-importer")
+        python = create_job_post(employer, title="Python Developer", description="Django and PostgreSQL backend services.")
+        create_job_post(employer, title="Chef de cuisine", description="Seasonal menus for our restaurant kitchen.")
+        recommendations.build()
+        candidate = create_jobseeker("recommended-import")
+        JobFavorite.objects.create(job_seeker=candidate, job_post=python)
+
+        lines = [
+            json.dumps({"title": title, "description": description, "location": "Geneva", "salary_min": 1000, "salary_max": 2000, "years_experience": 0})
+            for title, description in [("Django Developer", "Python web backend."), ("Pastry Chef", "Cakes for our restaurant.")]
+        ]
+        # The updates run right away instead of in the background thread
+        executor = mock.Mock(submit=mock.Mock(side_effect=lambda function, job_ids: recommendations.add_job_posts(job_ids)))
+        with mock.patch.object(recommendations, "get_executor", return_value=executor), self.captureOnCommitCallbacks(execute=True):
+            report = job_import.JobPostImporter(employer, chunk_size=1).run(BytesIO("\n".join(lines).encode()), "jsonl")
+        self.assertEqual(report["created"], 2)
+        self.assertEqual(executor.submit.call_count, 2)
+        self.client.force_login(candidate.user)
+        self.assertEqual(self.recommended(), ["Django Developer"])
+
+    def test_write_lock_on_windows(self):
+        msvcrt = mock.Mock(LK_LOCK=1, LK_UNLCK=0)
+        # Still held by another writer after the first 10 seconds
+        msvcrt.locking.side_effect = [OSError(), None, None]
+        with mock.patch.dict("sys.modules", msvcrt=msvcrt), mock.patch.object(recommendations.os, "name", "nt"):
+            with recommendations.write_lock():
+                self.assertEqual([call.args[1] for call in msvcrt.locking.call_args_list], [1, 1])
+        self.assertEqual(msvcrt.locking.call_args.args[1], 0)
+
+
+class JobPostImportTests(TestCase):
+    HEADER = "title,description,location,salary_min,salary_max,years_experience\n"
+
+    def setUp(self):
+        self.employer = create_employer("import-employer")
+        create_job_post(self.employer, title="Existing Job")
+        self.client.force_login(self.employer.user)
+
+    def test_partial_csv_import(self):
+        rows = [
+            "Data Analyst,Dashboards and reports,Lausanne,70000,90000,1",
+            "Broken Salary,Bad number,Geneva,lots,90000,1",
+            "Existing Job,Same title as a published post,Geneva,70000,90000,1",
+            "Too Many,Values,Geneva,70000,90000,1,extra",
+            "Kubernetes Operator,Clusters and pipelines,Zurich,90000,120000,3",
+            "Data Analyst,Twice in the file,Geneva,70000,90000,1",
+            ",No title,Geneva,70000,90000,1",
+        ]
+        upload = SimpleUploadedFile("jobs.csv", (self.HEADER + "\n".join(rows) + "\n").encode(), content_type="text/csv")
+        response = self.client.post("/api/employer-job-posts/import/", {"file": upload})
+        self.assertEqual(response.status_code, 201)
+        report = response.json()
+        self.assertEqual((report["created"], report["duplicates"], report["error_count"]), (2, 2, 5))
+        self.assertEqual([error["line"] for error in report["errors"]], [3, 4, 5, 7, 8])
+        self.assertIn("salary_min", report["errors"][0]["errors"])
+        self.assertIn("title", report["errors"][4]["errors"])
+
+        created = JobPost.objects.filter(employer=self.employer).exclude(title="Existing Job")
+        self.assertEqual(sorted(created.values_list("title", flat=True)), ["Data Analyst", "Kubernetes Operator"])
+        self.assertTrue(all(job.is_visible and job.company_name == self.employer.company_name for job in created))
+        # Searchable right away, although bulk_create skips the signals
+        results = self.client.get("/api/jobposts/", {"q": "kubernetes"}).json()["results"]
+        self.assertEqual([job["title"] for job in results], ["Kubernetes Operator"])
+
+    def test_jsonl_in_small_chunks(self):
+        lines = [
+            json.dumps({"title": f"Job {index}", "description": "Imported", "location": "Geneva", "salary_min": 1000,
+                        "salary_max": 2000, "years_experience": 0})
+            for index in range(5)
+        ]
+        lines.insert(2, "{not json")
+        lines.insert(4, "[1, 2]")
+        report = job_import.JobPostImporter(self.employer, chunk_size=2).run(BytesIO("\n".join(lines).encode()), "jsonl")
+        self.assertEqual((report["created"], report["error_count"]), (5, 2))
+        self.assertEqual([error["line"] for error in report["errors"]], [3, 5])
+        self.assertEqual(self.client.get("/api/jobposts/", {"q": "imported"}).json()["count"], 5)
+
+    def test_nothing_valid(self):
+        upload = SimpleUploadedFile("jobs.csv", (self.HEADER + "Existing Job,Again,Geneva,1,2,0\n").encode(), content_type="text/csv")
+        response = self.client.post("/api/employer-job-posts/import/", {"file": upload})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json()["duplicates"], 1)
+
+
+class ApplicationExportTests(TestCase):
+    def setUp(self):
+        self.employer = create_employer("export-employer")
+        self.jobs = [create_job_post(self.employer, title=f"Export job {index}") for index in range(2)]
+        hostile = create_jobseeker(
+            "export-hostile", first_name='=HYPERLINK("http://example.com","x")', phone="+41 22 000 00 00",
+            address="@SUM(A1)", city="-2+3", last_name="\tTabbed",
+        )
+        for index, job in enumerate([self.jobs[0], self.jobs[0], self.jobs[1]]):
+            JobApplication.objects.create(job=job, candidate=hostile if index == 0 else create_jobseeker(f"export-{index}"))
+        JobApplication.objects.create(job=create_job_post(create_employer("export-other")), candidate=hostile)
+        self.client.force_login(self.employer.user)
+
+    def export(self, format, **params):
+        response = self.client.get(f"/api/applications/export/{format}/", params)
+        self.assertTrue(response.streaming)
+        return response, b"".join(response.streaming_content).decode()
+
+    def test_csv(self):
+        response, content = self.export("csv")
+        self.assertEqual(response["Content-Type"], "text/csv; charset=utf-8")
+        self.assertRegex(response["Content-Disposition"], r'^attachment; filename="applications-\d{8}\.csv"$')
+        rows = list(csv.DictReader(StringIO(content)))
+        self.assertEqual(list(rows[0]), [header for header, lookup in exports.APPLICATION_FIELDS])
+        self.assertEqual(len(rows), 3)
+        hostile = rows[0]
+        self.assertEqual(hostile["candidate_first_name"], '\'=HYPERLINK("http://example.com","x")')
+        self.assertEqual(hostile["candidate_phone"], "'+41 22 000 00 00")
+        self.assertEqual(hostile["candidate_address"], "'@SUM(A1)")
+        self.assertEqual(hostile["candidate_city"], "'-2+3")
+        self.assertEqual(hostile["candidate_last_name"], "'\tTabbed")
+        self.assertEqual(rows[1]["candidate_first_name"], "Seeker")
+        self.assertEqual(hostile["job_title"], "Export job 0")
+
+    def test_jsonl_of_one_job(self):
+        response, content = self.export("jsonl", job=self.jobs[0].pk)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson; charset=utf-8")
+        rows = [json.loads(line) for line in content.splitlines()]
+        self.assertEqual(len(rows), 2)
+        self.assertTrue(all(list(row) == [header for header, lookup in exports.APPLICATION_FIELDS] for row in rows))
+        # JSON is not read by spreadsheets, the values are exported as typed
+        self.assertEqual(rows[0]["candidate_phone"], "+41 22 000 00 00")
+        self.assertEqual(rows[0]["job_id"], self.jobs[0].pk)
+        self.assertIs(rows[0]["candidate_is_premium"], False)
+        datetime.datetime.fromisoformat(rows[0]["applied_at"])
+
+    def test_other_employers_job(self):
+        other_job = JobPost.objects.exclude(employer=self.employer).get()
+        self.assertEqual(self.client.get("/api/applications/export/csv/", {"job": other_job.pk}).status_code, 404)
+        self.assertEqual(self.client.get("/api/applications/export/xlsx/").status_code, 400)
+
+
+class MetricsEndpointTests(TestCase):
+    SAMPLE = re.compile(r'^[a-z_]+(\{(\w+="[^"]*",?)*\})? -?[0-9.e+-]+$|^[a-z_]+(\{.*\})? \+?Inf$')
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        metrics_settings = override_settings(METRICS={**settings.METRICS, "DIRECTORY": directory.name})
+        metrics_settings.enable()
+        self.addCleanup(metrics_settings.disable)
+        self.admin = User.objects.create_user("metrics-admin")
+        Group.objects.get(name="administrator").user_set.add(self.admin)
+
+    def scrape(self):
+        self.client.force_login(self.admin)
+        response = self.client.get("/api/metrics/")
+        self.client.logout()
+        self.assertEqual(response.status_code, 200)
+        return response
+
+    def sample(self, text, name):
+        line = next((line for line in text.splitlines() if line.startswith(name + " ") or line.startswith(name + "{")), None)
+        return float(line.rsplit(" ", 1)[1]) if line else 0
+
+    def test_admin_only(self):
+        self.assertIn(self.client.get("/api/metrics/").status_code, (401, 403))
+        self.client.force_login(create_jobseeker("metrics-candidate").user)
+        self.assertEqual(self.client.get("/api/metrics/").status_code, 403)
+        # Staff is not enough, the administrator group grants access
+        self.client.force_login(User.objects.create_superuser("metrics-superuser"))
+        self.assertEqual(self.client.get("/api/metrics/").status_code, 403)
+
+    def test_prometheus_format_labelled_by_route(self):
+        series = 'marketech_http_requests_total{route="jobpost-list",method="GET",status="200"}'
+        before = self.sample(self.scrape().content.decode(), series)
+        self.client.get("/api/jobposts/")
+        self.client.get("/api/jobposts/", {"page": 1})
+        response = self.scrape()
+        self.assertEqual(response["Content-Type"], "text/plain; version=0.0.4; charset=utf-8")
+        text = response.content.decode()
+        self.assertEqual(self.sample(text, series) - before, 2)
+
+        declared = set()
+        for line in text.splitlines():
+            if line.startswith("# TYPE "):
+                name, kind = line.split()[2:]
+                self.assertIn(kind, ("counter", "histogram"))
+                declared.add(name)
+            elif not line.startswith("# HELP "):
+                self.assertRegex(line, self.SAMPLE)
+                # Every sample follows the TYPE line of its metric
+                name = re.split(r"[{ ]", line)[0]
+                self.assertTrue({name, re.sub(r"_(bucket|sum|count)$", "", name)} & declared, line)
+        # Histogram buckets are cumulative, +Inf holds every request of the route
+        labels = '{route="jobpost-list",method="GET"'
+        buckets = [float(line.rsplit(" ", 1)[1]) for line in text.splitlines() if line.startswith(f"marketech_http_request_duration_seconds_bucket{labels}")]
+        self.assertEqual(buckets, sorted(buckets))
+        self.assertEqual(buckets[-1], self.sample(text, f"marketech_http_request_duration_seconds_count{labels}}}"))
+
+    def test_response_size_histogram(self):
+        labels = '{route="jobpost-list",method="GET"'
+
+        def histogram():
+            text = self.scrape().content.decode()
+            buckets = {
+                float(re.search(r'le="([^"]+)"', line)[1]): float(line.rsplit(" ", 1)[1])
+                for line in text.splitlines() if line.startswith(f"marketech_http_response_size_bytes_bucket{labels}")
+            }
+            return buckets, self.sample(text, f"marketech_http_response_size_bytes_sum{labels}}}")
+
+        before, before_sum = histogram()
+        sizes = [len(self.client.get("/api/jobposts/").content) for _ in range(2)]
+        after, after_sum = histogram()
+        self.assertEqual(list(after)[:-1], settings.METRICS["SIZE_BUCKETS"])
+        self.assertEqual(after_sum - before_sum, sum(sizes))
+        for bound, count in after.items():
+            self.assertEqual(count - before.get(bound, 0), sum(size <= bound for size in sizes), bound)
+
+
+class SyntheticDataTests(TestCase):
+    def test_generate_and_benchmark(self):
+        call_command(
+            'generate_synthetic_data', employers=3, jobseekers=10, jobposts=30, applications=80, messages=120,
+            seed=1, stdout=StringIO(),
+        )
+        self.assertEqual(JobPost.objects.count(), 30)
+        self.assertEqual(JobApplication.objects.count(), 80)
+        self.assertEqual(Message.objects.count(), 120)
+        # A candidate applies at most once to a job
+        self.assertEqual(JobApplication.objects.values('job', 'candidate').distinct().count(), 80)
+        # Bulk inserted job posts are searchable
+        title = JobPost.objects.first().title.split()[-1]
+        self.assertEqual(self.client.get('/api/jobposts/', {'q': title}).status_code, 200)
+        self.assertTrue(self.client.get('/api/jobposts/', {'q': title}).json()['count'])
+
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, 'results.json')
+            call_command('run_benchmarks', requests=2, warmup=0, output=output, stdout=StringIO())
+            with open(output) as results_file:
+                results = json.load(results_file)
+        self.assertIn('session', results['endpoints'])
+        for name, result in results['endpoints'].items():
+            self.assertEqual(result['status_codes'], {'200': 2}, name)
+            self.assertLessEqual(result['p50_ms'], result['p99_ms'])
+
+    def test_exact_message_count_over_runs(self):
+        for seed, messages in ((2, 500), (3, 7)):
+            call_command(
+                'generate_synthetic_data', employers=1, jobseekers=3, jobposts=4, applications=6, messages=messages,
+                seed=seed, stdout=StringIO(),
+            )
+        self.assertEqual(Message.objects.count(), 507)
+        self.assertEqual(User.objects.filter(username__startswith="synthetic_").count(), 8)
+        # Messages of the second run belong to its own applications
+        second_run = Message.objects.filter(application__candidate__user__username__startswith="synthetic_jobseeker_4_")
+        self.assertEqual(second_run.count(), 7)
+
+
+class ChunkedUploadTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.settings = override_settings(
+            MEDIA_ROOT=os.path.join(self.directory.name, "media"),
+            CHUNKED_UPLOADS={
+                "DIRECTORY": os.path.join(self.directory.name, "chunks"), "MAX_SIZE": 4096,
+                "MAX_CHUNK_SIZE": 1024, "MAX_PENDING": 10, "EXPIRY": 3600,
+            },
+        )
+        self.settings.enable()
+        self.jobseeker = create_jobseeker("seeker")
+        self.job = create_job_post(create_employer("acme"))
+        self.client = APIClient()
+        self.client.force_authenticate(self.jobseeker.user)
+
+    def tearDown(self):
+        self.settings.disable()
+        self.directory.cleanup()
+
+    def put_chunk(self, upload_id, data, offset, size):
+        return self.client.put(
+            f"/api/uploads/{upload_id}/", data, content_type="application/octet-stream",
+            HTTP_CONTENT_RANGE=f"bytes {offset}-{offset + len(data) - 1}/{size}",
+        )
+
+    def test_resume_and_apply_by_id(self):
+        content = b"%PDF-1.7\n" + b"x" * 2500
+        upload_id = self.client.post("/api/uploads/", {"filename": "cv.pdf", "size": len(content)}, format="json").data["id"]
+
+        self.assertEqual(self.put_chunk(upload_id, content[:1024], 0, len(content)).status_code, 200)
+        # A chunk sent again after a lost response is refused with the offset to resume from
+        response = self.put_chunk(upload_id, content[:1024], 0, len(content))
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(int(response.data["offset"]), 1024)
+        for offset in range(1024, len(content), 1024):
+            self.assertEqual(self.put_chunk(upload_id, content[offset:offset + 1024], offset, len(content)).status_code, 200)
+        self.assertEqual(self.client.post(f"/api/uploads/{upload_id}/finalize/").data["status"], "complete")
+
+        response = self.client.post(f"/api/jobs/{self.job.id}/apply/", {"cv_upload_id": upload_id}, format="json")
+        self.assertEqual(response.status_code, 201)
+        application = JobApplication.objects.get(job=self.job)
+        with application.cv_file.open("rb") as cv:
+            self.assertEqual(cv.read(), content)
+        self.assertFalse(ChunkedUpload.objects.exists())
+
+    def test_chunk_is_received_before_the_upload_is_locked(self):
+        content = b"%PDF-1.7\n" + b"x" * 500
+        upload = ChunkedUpload.objects.get(pk=self.client.post("/api/uploads/", {"filename": "cv.pdf", "size": len(content)}, format="json").data["id"])
+        body = BytesIO(content)
+        depths = []
+
+        def read(size):
+            depths.append(len(connection.atomic_blocks))
+            return body.read(size)
+
+        depth = len(connection.atomic_blocks)
+        self.assertEqual(uploads.write_chunk(upload, 0, SimpleNamespace(read=read), len(content)).offset, len(content))
+        self.assertEqual(set(depths), {depth})
+        self.assertEqual(os.listdir(settings.CHUNKED_UPLOADS["DIRECTORY"]), [f"{upload.pk}.part"])
+        # A chunk sent again is refused before its body is read
+        upload.refresh_from_db()
+        with self.assertRaises(uploads.OffsetConflict):
+            uploads.write_chunk(upload, 0, SimpleNamespace(read=self.fail), len(content))
+
+    def test_limits(self):
+        response = self.client.post("/api/uploads/", {"filename": "cv.pdf", "size": 5000}, format="json")
+        self.assertEqual(response.status_code, 400)
+        upload_id = self.client.post("/api/uploads/", {"filename": "cv.pdf", "size": 3000}, format="json").data["id"]
+        self.assertEqual(self.put_chunk(upload_id, b"%PDF-" + b"x" * 1500, 0, 3000).status_code, 413)
+        # The type is checked against the first bytes, not the name
+        self.assertEqual(self.put_chunk(upload_id, b"MZ" + b"x" * 1000, 0, 3000).status_code, 400)
+        self.assertEqual(ChunkedUpload.objects.get(pk=upload_id).offset, 0)
+        response = self.client.post(f"/api/jobs/{self.job.id}/apply/", {"cv_upload_id": upload_id}, format="json")
+        self.assertEqual(response.status_code, 400)
+
+
+class BlobReferenceTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(MEDIA_ROOT=directory.name)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def blob(self, document):
+        return StoredBlob.objects.get(name=document.file.name)
+
+    def delete(self, document):
+        with self.captureOnCommitCallbacks(execute=True):
+            document.delete()
+
+    def test_same_content_is_stored_once(self):
+        first = Document.objects.create(file=SimpleUploadedFile("first.txt", b"same content"))
+        second = Document.objects.create(file=SimpleUploadedFile("second.txt", b"same content"))
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertEqual(StoredBlob.objects.get().reference_count, 2)
+        # Saving the rows again does not count their files twice
+        first.save()
+        second.save()
+        self.assertEqual(self.blob(first).reference_count, 2)
+        third = Document.objects.create(file=SimpleUploadedFile("third.txt", b"other content"))
+        self.assertEqual(StoredBlob.objects.count(), 2)
+        self.assertEqual(self.blob(third).reference_count, 1)
+
+    def test_shared_blob_survives_until_its_last_row_is_deleted(self):
+        first = Document.objects.create(file=SimpleUploadedFile("first.txt", b"shared content"))
+        second = Document.objects.create(file=SimpleUploadedFile("second.txt", b"shared content"))
+        path = first.file.path
+
+        self.delete(first)
+        self.assertEqual(self.blob(second).reference_count, 1)
+        self.assertTrue(os.path.exists(path))
+        with second.file.open("rb") as file:
+            self.assertEqual(file.read(), b"shared content")
+
+        self.delete(second)
+        self.assertFalse(StoredBlob.objects.exists())
+        self.assertFalse(os.path.exists(path))
+
+    def test_replaced_file_is_released(self):
+        document = Document.objects.create(file=SimpleUploadedFile("first.txt", b"first version"))
+        previous = document.file.name
+        document.file = SimpleUploadedFile("second.txt", b"second version")
+        with self.captureOnCommitCallbacks(execute=True):
+            document.save()
+        self.assertEqual(self.blob(document).reference_count, 1)
+        self.assertFalse(StoredBlob.objects.filter(name=previous).exists())
+
+    def test_upload_is_referenced_before_its_row_is_saved(self):
+        document = Document(file=SimpleUploadedFile("cv.txt", b"uploaded content"))
+        document.file.save("cv.txt", document.file.file, save=False)
+        # Collected between the upload and the save of its row, the blob is kept
+        self.assertEqual(storage.collect_blobs(), 0)
+        self.assertTrue(os.path.exists(document.file.path))
+        document.save()
+        self.assertEqual(self.blob(document).reference_count, 1)
+
+
+def make_pdf(text, content=None):
+    content = content or zlib.compress(f"BT /F1 11 Tf 72 720 Td ({text}) Tj ET".encode("cp1252"))
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents 4 0 R "
+        b"/Resources << /Font << /F1 << /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >> >> >> >>",
+        f"<< /Length {len(content)} /Filter /FlateDecode >>\nstream\n".encode() + content + b"\nendstream",
+    ]
+    pdf, offsets = b"%PDF-1.4\n", []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(pdf))
+        pdf += f"{number} 0 obj ".encode() + body + b" endobj\n"
+    xref = f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n" + "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+    return pdf + xref.encode() + f"trailer << /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{len(pdf)}\n%%EOF".encode()
+
+
+def make_docx(text):
+    output = BytesIO()
+    with zipfile.ZipFile(output, "w") as archive:
+        archive.writestr("word/document.xml", (
+            '<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>'
+            f'<w:p><w:r><w:t>{text}</w:t></w:r></w:p></w:body></w:document>'
+        ))
+    return output.getvalue()
+
+
+class TextExtractionTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.directory = directory.name
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, "wb") as file:
+            file.write(content)
+        return path
+
+    def encrypt(self, pdf):
+        writer = PdfWriter(clone_from=BytesIO(pdf))
+        writer.encrypt("password", algorithm="RC4-128")
+        output = BytesIO()
+        writer.write(output)
+        return output.getvalue()
+
+    def test_pdf_and_docx(self):
+        self.assertEqual(text_extraction.extract_text(self.write("cv.pdf", make_pdf("Kubernetes in Zürich"))), "Kubernetes in Zürich")
+        self.assertEqual(text_extraction.extract_text(self.write("cv.docx", make_docx("Terraform ﬁles"))), "Terraform files")
+
+    def test_malformed_and_hostile_files(self):
+        # A few kilobytes that inflate past the size limit
+        bomb = make_pdf("", content=zlib.compress(b"BT (x) Tj ET " * (text_extraction.MAX_STREAM_SIZE // 12), 9))
+        archive = BytesIO()
+        with zipfile.ZipFile(archive, "w", zipfile.ZIP_DEFLATED) as docx:
+            docx.writestr("word/document.xml", b" " * (text_extraction.MAX_STREAM_SIZE + 1))
+        files = {
+            "truncated.pdf": make_pdf("Truncated")[:60],
+            "garbage.pdf": b"%PDF-1.4\n" + os.urandom(2048),
+            "bomb.pdf": bomb,
+            "encrypted.pdf": self.encrypt(make_pdf("Secret")),
+            "loop.pdf": make_pdf("Loop").replace(b"/Kids [3 0 R]", b"/Kids [2 0 R 3 0 R]"),
+            "bomb.docx": archive.getvalue(),
+            "empty.docx": make_docx("")[:30],
+            "cv.exe": b"MZ" + b"\x00" * 100,
+        }
+        errors = {}
+        for name, content in files.items():
+            text, errors[name] = text_extraction.extract_or_error(self.write(name, content))
+            # Failed with an error or read as no text, never an exception or the whole stream
+            self.assertTrue(errors[name] or not text.strip(), name)
+            self.assertLessEqual(len(errors[name] or ""), 255)
+        self.assertIn("LimitReachedError", errors["bomb.pdf"])
+        self.assertIn("too large", errors["bomb.docx"])
+        self.assertIn("encrypted", errors["encrypted.pdf"])
+        self.assertIn("cyclic", errors["loop.pdf"])
+
+    @override_settings(DOCUMENT_TEXT={"WORKERS": 1, "BATCH_SIZE": 2})
+    def test_extraction_in_the_process_pool(self):
+        paths = [self.write("cv.pdf", make_pdf("Extracted by a worker")), self.write("broken.pdf", b"%PDF-1.4 unreadable")]
+        with mock.patch.object(document_text, "_pool", None):
+            try:
+                (text, error), (broken_text, broken_error) = document_text.extract_files(paths)
+            finally:
+                if document_text._pool is not None:
+                    document_text._pool.shutdown()
+        self.assertEqual((text, error), ("Extracted by a worker", None))
+        self.assertEqual(broken_text, "")
+        self.assertTrue(broken_error)
+
+
+class CandidateSearchTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings = override_settings(MEDIA_ROOT=directory.name, DOCUMENT_TEXT={"WORKERS": 0, "BATCH_SIZE": 2})
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def search(self, **params):
+        return self.client.get("/api/employer/candidates/search/", params)
+
+    def test_search_own_applicants_documents(self):
+        employer = create_employer("searcher")
+        job = create_job_post(employer, title="Platform Engineer")
+        other_job = create_job_post(create_employer("competitor"))
+        cv = make_pdf("Senior engineer, Kubernetes and Terraform in Zürich")
+        alice = create_jobseeker("alice", first_name="Alice")
+        JobApplication.objects.create(job=job, candidate=alice, cv_file=SimpleUploadedFile("cv.pdf", cv))
+        bob = create_jobseeker("bob", first_name="Bob")
+        bob.additional_documents.add(Document.objects.create(file=SimpleUploadedFile("reference.docx", make_docx("Kubernetes operator"))))
+        JobApplication.objects.create(job=job, candidate=bob)
+        # The same CV sent to another employer is extracted once, and not found by this employer through it
+        carol = create_jobseeker("carol")
+        JobApplication.objects.create(job=other_job, candidate=carol, cv_file=SimpleUploadedFile("mine.pdf", cv))
+        JobApplication.objects.create(
+            job=job, candidate=carol, cover_letter_file=SimpleUploadedFile("letter.pdf", b"%PDF-1.4 unreadable")
+        )
+
+        self.assertEqual(document_text.extract_pending(), (3, 1))
+        self.assertEqual(document_text.extract_pending(), (0, 0))
+        self.assertEqual(DocumentText.objects.get(status="extracted", text__contains="Zürich").extractor_version, text_extraction.EXTRACTOR_VERSION)
+
+        self.client.force_login(employer.user)
+        results = self.search(q="kubernetes").json()["results"]
+        self.assertEqual(sorted(result["first_name"] for result in results), ["Alice", "Bob"])
+        self.assertEqual({result["matches"][0]["source"] for result in results}, {"cv", "document"})
+        self.assertIn("Kubernetes", results[0]["matches"][0]["snippet"])
+        self.assertEqual(results[0]["applications"][0]["job_title"], "Platform Engineer")
+        self.assertEqual([result["first_name"] for result in self.search(q="zurich terraform").json()["results"]], ["Alice"])
+        self.assertEqual(self.search(q="kubernetes", job=other_job.pk).status_code, 404)
+        self.assertEqual(self.search(q="").status_code, 400)
+
+        self.client.force_login(create_jobseeker("snoop").user)
+        self.assertEqual(self.search(q="kubernetes").status_code, 403)
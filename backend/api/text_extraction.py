@@ -0,0 +1,123 @@
+"""
+Plain text of PDF and DOCX files, for the candidate search (see `document_text.py`).
+
+Nothing here touches Django or the database: the functions run in the worker processes of a
+process pool, which receive a path and return text.
+
+A DOCX file is a zip archive, its text is read from the paragraphs of `word/document.xml`.
+A PDF file is read with pypdf, page by page. Scanned pages (images only) have no text. The
+decompressed size of a PDF stream or of the DOCX document is bounded, so a small file cannot
+expand into gigabytes, and so are the number of pages read and the length of the text.
+"""
+import itertools
+import logging
+import unicodedata
+import zipfile
+from xml.etree import ElementTree
+
+import pypdf
+from pypdf.errors import PyPdfError
+
+
+# Raised whenever the extraction changes, so the texts extracted by an older version are redone
+EXTRACTOR_VERSION = 2
+
+EXTENSIONS = ['.pdf', '.docx']
+
+MAX_CHARACTERS = 100_000
+MAX_STREAM_SIZE = 20 * 1024 * 1024  # Decompressed size of a PDF stream or of the DOCX document
+MAX_PAGES = 200
+
+PDF_LIMITS = {
+    'maximum_declared_stream_length': MAX_STREAM_SIZE,
+    'array_based_stream_maximum_output_length': MAX_STREAM_SIZE,
+    'zlib_maximum_output_length': MAX_STREAM_SIZE,
+    'lzw_maximum_output_length': MAX_STREAM_SIZE,
+    'run_length_maximum_output_length': MAX_STREAM_SIZE,
+    'stream_decoding_work_maximum_length': 4 * MAX_STREAM_SIZE,
+}
+
+# A damaged file is reported by the error of its text, the warnings pypdf logs while it recovers are noise
+logging.getLogger('pypdf').setLevel(logging.ERROR)
+
+WORD_NAMESPACE = '{http://schemas.openxmlformats.org/wordprocessingml/2006/main}'
+
+
+class ExtractionError(Exception):
+    pass
+
+
+def normalize_text(text):
+    """ Compatibility characters folded (ligatures, full-width forms), whitespace collapsed, length bounded """
+    text = unicodedata.normalize('NFKC', text)
+    text = ' '.join(text.split())
+    return text[:MAX_CHARACTERS]
+
+
+def extract_text(path):
+    """ Normalized text of the PDF or DOCX file at `path`. Raises ExtractionError on unreadable files """
+    with open(path, 'rb') as source:
+        head = source.read(5)
+    try:
+        if head.startswith(b'%PDF-'):
+            return normalize_text(extract_pdf(path))
+        if head.startswith(b'PK\x03\x04'):
+            return normalize_text(extract_docx(path))
+    except (ExtractionError, PyPdfError, zipfile.BadZipFile, ElementTree.ParseError, ValueError, KeyError, IndexError) as error:
+        raise ExtractionError(f"{type(error).__name__}: {error}") from error
+    raise ExtractionError("Neither a PDF nor a DOCX file.")
+
+
+def extract_or_error(path):
+    """ (text, None), or ('', error message): a damaged file must not stop the batch it belongs to """
+    try:
+        return extract_text(path), None
+    except (ExtractionError, OSError) as error:
+        return '', str(error)[:255]
+    except Exception as error:
+        return '', f"Unexpected {type(error).__name__}: {error}"[:255]
+
+
+# DOCX
+
+def extract_docx(path):
+    with zipfile.ZipFile(path) as archive:
+        try:
+            info = archive.getinfo('word/document.xml')
+        except KeyError:
+            raise ExtractionError("No word/document.xml in the archive.")
+        if info.file_size > MAX_STREAM_SIZE:
+            raise ExtractionError("The document is too large.")
+        parts = []
+        with archive.open(info) as document:
+            for event, element in ElementTree.iterparse(document, events=('end',)):
+                tag = element.tag
+                if tag == f'{WORD_NAMESPACE}t':
+                    parts.append(element.text or '')
+                elif tag == f'{WORD_NAMESPACE}tab':
+                    parts.append(' ')
+                elif tag in (f'{WORD_NAMESPACE}br', f'{WORD_NAMESPACE}cr', f'{WORD_NAMESPACE}p'):
+                    parts.append('\n')
+                    if tag == f'{WORD_NAMESPACE}p':
+                        element.clear()
+        return ''.join(parts)
+
+
+# PDF
+
+def extract_pdf(path):
+    # pypdf applies the configuration to the readers created in this context only
+    with pypdf.apply_configuration(**PDF_LIMITS):
+        reader = pypdf.PdfReader(path)
+        if reader.is_encrypted:
+            raise ExtractionError("The PDF is encrypted.")
+        if not len(reader.pages):
+            raise ExtractionError("No page found in the PDF.")
+        parts, length = [], 0
+        for page in itertools.islice(reader.pages, MAX_PAGES):
+            text = page.extract_text() or ''
+            parts.append(text)
+            length += len(text)
+            if length >= MAX_CHARACTERS:
+                break
+        return '\n'.join(parts)
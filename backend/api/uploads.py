@@ -0,0 +1,246 @@
+"""
+Resumable uploads of CVs, cover letters and documents, sent in chunks.
+
+An upload is started with the name and size of the file. Its chunks are then PUT in order,
+each one with its offset (`Content-Range: bytes 0-1048575/4200000` or `?offset=0`). A chunk is
+written to a temporary file of `CHUNKED_UPLOADS['DIRECTORY']` as it is read from the request, so
+it is never held in memory as a whole, and only then appended to the upload in a short
+transaction: no database lock is held while a client sends its body. Sizes are checked before a
+chunk is read, and the type of the file is checked against its first bytes as soon as the first
+chunk arrives, so an oversized or mislabelled file is refused without being stored. A client that lost its connection asks
+for the current offset and resumes from there.
+
+Once every byte is received, the upload is finalized into the content-addressed storage (see
+`storage.py`). The finalized upload can then be attached by its ID to a job application, a CV
+or a document, which only copies the blob name: the apply call itself carries no file.
+"""
+import os
+import re
+import shutil
+import tempfile
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File
+from django.db import transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+
+from .models import ChunkedUpload
+
+
+READ_SIZE = 64 * 1024
+
+# Extension -> first bytes of a file of this type
+SIGNATURES = {
+    '.pdf': [b'%PDF-'],
+    '.doc': [b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'],  # An OLE compound file
+    '.docx': [b'PK\x03\x04'],  # A zip archive
+    '.png': [b'\x89PNG\r\n\x1a\n'],
+    '.jpg': [b'\xff\xd8\xff'],
+    '.jpeg': [b'\xff\xd8\xff'],
+}
+SIGNATURE_SIZE = max(len(signature) for signatures in SIGNATURES.values() for signature in signatures)
+
+CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+
+
+class OffsetConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_code = 'offset_conflict'
+
+    def __init__(self, offset):
+        # The client resumes from `offset`
+        super().__init__({'detail': f"The next chunk starts at offset {offset}.", 'offset': offset})
+
+
+class ChunkTooLarge(APIException):
+    status_code = status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+    default_detail = "The chunk is too large."
+    default_code = 'chunk_too_large'
+
+
+def temporary_path(upload):
+    return os.path.join(settings.CHUNKED_UPLOADS['DIRECTORY'], f"{upload.pk}.part")
+
+
+def validate_file(filename, size):
+    """ Checks the name and declared size of a file before any of it is sent """
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in SIGNATURES:
+        raise ValidationError({'filename': [f"Only {', '.join(SIGNATURES)} files are accepted."]})
+    max_size = settings.CHUNKED_UPLOADS['MAX_SIZE']
+    if not 0 < size <= max_size:
+        raise ValidationError({'size': [f"The file must not exceed {max_size // (1024 * 1024)}MB."]})
+
+
+def check_signature(filename, head):
+    extension = os.path.splitext(filename)[1].lower()
+    if not any(head.startswith(signature) for signature in SIGNATURES[extension]):
+        raise ValidationError(f"{filename} is not a valid {extension} file.")
+
+
+def parse_offset(request, upload, length):
+    """ Offset of the chunk sent with `request`, from its Content-Range header or its `offset` parameter """
+    content_range = request.headers.get('Content-Range')
+    if content_range:
+        match = CONTENT_RANGE.match(content_range.strip())
+        if not match:
+            raise ValidationError("Invalid Content-Range header.")
+        start, end, total = (int(value) for value in match.groups())
+        if end - start + 1 != length or total != upload.size:
+            raise ValidationError("The Content-Range header does not match the chunk.")
+        return start
+    try:
+        return int(request.query_params['offset'])
+    except (KeyError, ValueError):
+        raise ValidationError("Send the offset of the chunk in a Content-Range header or an offset parameter.")
+
+
+def chunk_length(request):
+    try:
+        length = int(request.META.get('CONTENT_LENGTH') or 0)
+    except ValueError:
+        length = 0
+    if length <= 0:
+        raise ValidationError("The chunk is empty or has no Content-Length.")
+    if length > settings.CHUNKED_UPLOADS['MAX_CHUNK_SIZE']:
+        raise ChunkTooLarge()
+    return length
+
+
+def write_chunk(upload, offset, stream, length):
+    """
+    Appends `length` bytes of `stream` at `offset` of the upload. Returns the upload with its new offset.
+    """
+    # Checked once before the chunk is received, then again under the lock
+    check_chunk(upload, offset, length)
+    directory = settings.CHUNKED_UPLOADS['DIRECTORY']
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=directory, prefix=f"{upload.pk}.", suffix='.chunk') as chunk:
+        # Received without any lock held, a slow client only delays its own request
+        received = 0
+        while received < length:
+            data = stream.read(min(READ_SIZE, length - received))
+            if not data:
+                break
+            chunk.write(data)
+            received += len(data)
+        if received != length:
+            raise ValidationError(f"The chunk was interrupted, resume from offset {offset}.")
+        chunk.seek(0)
+        if offset == 0:
+            check_signature(upload.filename, chunk.read(SIGNATURE_SIZE))
+            chunk.seek(0)
+
+        with transaction.atomic():
+            # Locked so that two copies of the same chunk cannot be appended at once
+            upload = ChunkedUpload.objects.select_for_update().get(pk=upload.pk)
+            check_chunk(upload, offset, length)
+            path = temporary_path(upload)
+            with open(path, 'r+b' if os.path.exists(path) else 'w+b') as output:
+                # Drops what a previous, interrupted attempt may have written past the offset
+                output.seek(offset)
+                output.truncate()
+                shutil.copyfileobj(chunk, output, READ_SIZE)
+            upload.offset = offset + length
+            upload.save(update_fields=['offset', 'updated_at'])
+    return upload
+
+
+def check_chunk(upload, offset, length):
+    if upload.status != 'uploading':
+        raise ValidationError("This upload is already complete.")
+    if offset != upload.offset:
+        raise OffsetConflict(upload.offset)
+    if offset + length > upload.size:
+        raise ValidationError("The chunk goes past the declared size of the file.")
+
+
+def finalize(upload):
+    """ Moves a fully received upload to the content-addressed storage """
+    with transaction.atomic():
+        upload = ChunkedUpload.objects.select_for_update().get(pk=upload.pk)
+        if upload.status == 'complete':
+            return upload
+        if upload.offset != upload.size:
+            raise ValidationError(f"Only {upload.offset} of {upload.size} bytes were received.")
+
+        path = temporary_path(upload)
+        with open(path, 'rb') as received:
+            upload.file.save(upload.filename, File(received), save=False)
+        upload.status = 'complete'
+        upload.save()
+        transaction.on_commit(lambda: remove_temporary_file(path))
+    return upload
+
+
+def remove_temporary_file(path):
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def get_completed_upload(user, upload_id, field):
+    """
+    The complete upload `upload_id` of `user`, locked until the end of the transaction, or None without an ID.
+    Raises a ValidationError on `field` when the upload is unknown or unfinished.
+    """
+    if not upload_id:
+        return None
+    try:
+        return ChunkedUpload.objects.select_for_update().get(pk=uuid.UUID(str(upload_id)), user=user, status='complete')
+    except (ValueError, ChunkedUpload.DoesNotExist):
+        raise ValidationError({field: ["Unknown or unfinished upload."]})
+
+
+def release(uploads):
+    """
+    Deletes attached uploads. Call it once the blobs are referenced by their new owner, they are then never unreferenced.
+    """
+    # An upload attached to several fields is deleted once, each deletion drops a blob reference
+    for upload in {upload.pk: upload for upload in uploads if upload is not None}.values():
+        upload.delete()
+
+
+def discard(upload):
+    path = temporary_path(upload)
+    upload.delete()
+    transaction.on_commit(lambda: remove_temporary_file(path))
+
+
+def purge_expired():
+    """
+    Removes the uploads left unattached for longer than the expiry, and the chunk files without an upload.
+    Returns the number of uploads and of files removed.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.CHUNKED_UPLOADS['EXPIRY'])
+    uploads = 0
+    for upload in ChunkedUpload.objects.filter(updated_at__lt=cutoff).iterator():
+        with transaction.atomic():
+            discard(upload)
+        uploads += 1
+
+    files = 0
+    directory = settings.CHUNKED_UPLOADS['DIRECTORY']
+    if os.path.isdir(directory):
+        for entry in os.scandir(directory):
+            if entry.stat().st_mtime >= cutoff.timestamp():
+                continue
+            if entry.name.endswith('.chunk'):
+                # Left by a worker stopped while it received a chunk
+                os.remove(entry.path)
+                files += 1
+                continue
+            stem = entry.name[:-len('.part')] if entry.name.endswith('.part') else None
+            if stem is None:
+                continue
+            try:
+                exists = ChunkedUpload.objects.filter(pk=uuid.UUID(stem)).exists()
+            except ValueError:
+                exists = False
+            if not exists:
+                os.remove(entry.path)
+                files += 1
+    return uploads, files
@@ -0,0 +1,80 @@
+"""
+Roles and profile of the authenticated user, resolved once per request.
+
+The context is memoized on the request, so the permission classes and the view share the same lookup,
+and kept for a short time in the cache so that following requests skip the database altogether.
+The cached entry is dropped as soon as the user's groups or profile change (see `signals.py`).
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db.models import F
+
+
+class UserContext:
+    def __init__(self, user_id=None, roles=(), jobseeker_profile=None, employer_profile=None):
+        self.user_id = user_id
+        self.roles = frozenset(roles)
+        self.jobseeker_profile = jobseeker_profile
+        self.employer_profile = employer_profile
+
+    @property
+    def is_employer(self):
+        return 'employer' in self.roles
+
+    @property
+    def is_jobseeker(self):
+        return 'jobseeker' in self.roles
+
+    @property
+    def is_admin(self):
+        return 'administrator' in self.roles
+
+    @property
+    def profile(self):
+        """ The job seeker profile, or else the employer profile, of the user """
+        return self.jobseeker_profile or self.employer_profile
+
+
+def cache_key(user_id):
+    return f"user-context:{user_id}"
+
+
+def load_user_context(user):
+    """ One query: the user joined with both profiles, one row per group """
+    rows = list(
+        User.objects.filter(pk=user.pk).select_related('jobseekerprofile', 'employerprofile').annotate(role=F('groups__name'))
+    )
+    user = rows[0]
+    return UserContext(
+        user_id=user.pk,
+        roles=[row.role for row in rows if row.role is not None],
+        jobseeker_profile=getattr(user, 'jobseekerprofile', None),
+        employer_profile=getattr(user, 'employerprofile', None),
+    )
+
+
+def get_user_context(request):
+    """
+    Returns the UserContext of the user of `request`, which can be a Django or a REST framework request.
+    """
+    user = request.user
+    if not user.is_authenticated:
+        return UserContext()
+
+    # REST framework requests wrap the Django request, memoize on the one that lives for the whole request
+    http_request = getattr(request, '_request', request)
+    context = getattr(http_request, '_user_context', None)
+    if context is not None and context.user_id == user.pk:
+        return context
+
+    context = cache.get(cache_key(user.pk))
+    if context is None:
+        context = load_user_context(user)
+        cache.set(cache_key(user.pk), context, timeout=settings.USER_CONTEXT_CACHE_TIMEOUT)
+    http_request._user_context = context
+    return context
+
+
+def invalidate_user_context(user_id):
+    cache.delete(cache_key(user_id))
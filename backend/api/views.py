@@ -3,9 +3,11 @@ import os
 import uuid
 # 2. Django
 from django.conf import settings
+from django.http import HttpResponse
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User, Group
 from django.db import models, transaction
+from django.db.models.functions import Coalesce, Substr
 from django.shortcuts import get_object_or_404
 from django.views.decorators.cache import never_cache
 from django.views.generic import TemplateView
@@ -15,18 +17,20 @@ from rest_framework import generics, status, viewsets, permissions
 from rest_framework.decorators import action, api_view, permission_classes
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.permissions import IsAuthenticated
-from rest_framework.parsers import FormParser, MultiPartParser
+from rest_framework.parsers import FormParser, JSONParser, MultiPartParser
 from rest_framework.response import Response
 from rest_framework.views import APIView
-from rest_framework.filters import OrderingFilter
 # 4. Third-party apps
 from django_filters.rest_framework import DjangoFilterBackend
 # 5. Local apps
-from backend.api.permissions import IsEmployer
-from .models import (JobSeekerProfile, EmployerProfile,  JobPost, JobApplication, SystemReview, Message, Document, JobFavorite, Appointment)
-from .serializers import (JobApplicationCreateSerializer, UserSerializer, GroupSerializer, JobFavoriteSerializer, MessageSerializer, JobSeekerProfileSerializer, EmployerProfileSerializer, JobPostSerializer, JobApplicationSerializer, SystemReviewSerializer, AppointmentSerializer)
-from .pagination import JobPostPagination
-from .filters import JobPostFilter
+from backend.api import analytics, application_status, cache, document_text, exports, facets, job_import, metrics, realtime, recommendations, review_stats, uploads
+from backend.api.images import variant_url
+from backend.api.permissions import IsAdmin, IsEmployer
+from backend.api.user_context import get_user_context
+from .models import (ChunkedUpload, JobSeekerProfile, EmployerProfile,  JobPost, JobApplication, SystemReview, Message, Document, JobFavorite, Appointment)
+from .serializers import (ChunkedUploadSerializer, JobApplicationCreateSerializer, UserSerializer, GroupSerializer, JobFavoriteSerializer, MessageSerializer, JobSeekerProfileSerializer, EmployerProfileSerializer, EmployerJobPostSerializer, JobPostSerializer, JobApplicationSerializer, SystemReviewSerializer, AppointmentSerializer, APPLICATION_RELATED, get_favorite_job_ids)
+from .pagination import ConversationPagination, JobApplicationPagination, JobPostCursorPagination, JobPostPagination, MessageCursorPagination
+from .filters import JobPostFilter, RelevanceOrderingFilter
 from django.utils import timezone
 
 
@@ -68,12 +72,19 @@ class JobSeekerProfileViewSet(viewsets.ModelViewSet):
     serializer_class = JobSeekerProfileSerializer
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]
 
+    @transaction.atomic
     def update(self, request, *args, **kwargs):
         """
         Update JobSeekerProfile with multiple documents handling.
+        The CV and documents are either sent with the request or attached by the IDs of chunked uploads.
         """
         profile = self.get_object()
         data = request.data.copy()
+        cv_upload = uploads.get_completed_upload(request.user, data.get('cv_upload_id'), 'cv_upload_id')
+        document_uploads = [
+            uploads.get_completed_upload(request.user, upload_id, 'document_upload_ids')
+            for upload_id in data.getlist('document_upload_ids')
+        ]
 
         # Handle CV removal
         cv_to_remove = data.get('cv_to_remove', 'false') == 'true'
@@ -84,6 +95,8 @@ class JobSeekerProfileViewSet(viewsets.ModelViewSet):
         # Handle CV upload
         if "cv" in request.FILES:
             profile.cv = request.FILES["cv"]
+        elif cv_upload:
+            profile.cv = cv_upload.file.name
 
         # Handle additional documents upload
         additional_documents = request.FILES.getlist('additional_documents')
@@ -100,6 +113,8 @@ class JobSeekerProfileViewSet(viewsets.ModelViewSet):
             new_doc = Document(file=document)
             new_doc.save()
             profile.additional_documents.add(new_doc)
+        for upload in document_uploads:
+            profile.additional_documents.add(Document.objects.create(file=upload.file.name))
 
         # Handle removal of documents
         documents_to_remove = data.getlist('documents_to_remove')
@@ -117,6 +132,7 @@ class JobSeekerProfileViewSet(viewsets.ModelViewSet):
         serializer = self.get_serializer(profile, data=data, partial=True)
         serializer.is_valid(raise_exception=True)
         self.perform_update(serializer)
+        uploads.release([cv_upload, *document_uploads])
 
         return Response(serializer.data, status=status.HTTP_200_OK)
 
@@ -133,14 +149,93 @@ class EmployerProfileViewSet(viewsets.ModelViewSet):
 class JobPostViewSet(viewsets.ModelViewSet):
     """
     API endpoint that provides paginated and filtered job posts, allowing employers to manage job postings.
+    The `q` parameter runs a full-text search, results are then sorted by relevance before premium and recency.
+    `near` and `radius_km` keep the job posts around a postal code or locality, sorted by distance.
+    With `facets=true`, the page also holds the number of matching job posts per location, salary and experience band.
     """
     queryset = JobPost.objects.filter(is_visible=True).select_related('employer')
     serializer_class = JobPostSerializer
     pagination_class = JobPostPagination
-    filter_backends = [DjangoFilterBackend, OrderingFilter]
+    filter_backends = [DjangoFilterBackend, RelevanceOrderingFilter]
     filterset_class = JobPostFilter
     ordering_fields = ['title', 'salary_min', 'salary_max', 'created_at']
-    ordering = ['-employer__is_premium', '-created_at']
+    ordering = ['-employer_is_premium', '-created_at']
+
+    def paginate_queryset(self, queryset):
+        # ?pagination=cursor switches to keyset pagination, except for results ranked by relevance or distance
+        params = self.request.query_params
+        wants_cursor = params.get('pagination') == 'cursor' or 'cursor' in params
+        ranked = 'search_rank' in queryset.query.annotations or 'distance_km' in queryset.query.annotations
+        if wants_cursor and not ranked:
+            self._paginator = JobPostCursorPagination()
+        return super().paginate_queryset(queryset)
+
+    def list(self, request, *args, **kwargs):
+        """
+        Pages are shared by everyone through the job feed cache, the favorite flags of the caller are added afterwards.
+        """
+        key = cache.list_cache_key(request)
+        data = cache.get_cached_list(key)
+        if data is None:
+            response = super().list(request, *args, **kwargs)
+            if facets.wants_facets(request):
+                response.data['facets'] = facets.get_facets(request, self.filter_queryset(self.get_queryset()))
+            cache.set_cached_list(key, response.data)
+            response['X-Cache'] = 'MISS'
+            return response
+
+        favorite_job_ids = get_favorite_job_ids(request, [item['id'] for item in data['results']])
+        for item in data['results']:
+            item['is_favorite'] = item['id'] in favorite_job_ids
+        return Response(data, headers={'X-Cache': 'HIT'})
+
+    @action(detail=False, methods=['get'], url_path='cache-stats', permission_classes=[permissions.IsAdminUser])
+    def cache_stats(self, request):
+        # Hit/miss counters of the job feed cache
+        return Response(cache.get_stats())
+
+
+class JobRecommendationsView(APIView):
+    """
+    API endpoint that lists the job posts recommended to the authenticated job seeker, from the job posts they applied
+    to and marked as favorite. Without any of them yet, or before the model is built, the start of the job feed is
+    returned instead, with `personalized` set to false.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    default_limit = 10
+    max_limit = 50
+
+    def get(self, request):
+        job_seeker = get_user_context(request).jobseeker_profile
+        if job_seeker is None:
+            return Response({"error": "Job seeker profile not found."}, status=404)
+        try:
+            limit = min(max(int(request.query_params.get('limit', self.default_limit)), 1), self.max_limit)
+        except ValueError:
+            limit = self.default_limit
+
+        ranked = recommendations.recommend(job_seeker, limit)
+        visible = JobPostViewSet.queryset.in_bulk([job_id for job_id, score in ranked])
+        # Hidden job posts are dropped here, the ranking returns more candidates than needed for that
+        job_posts = [(visible[job_id], score) for job_id, score in ranked if job_id in visible][:limit]
+        if not job_posts:
+            feed = JobPostViewSet.queryset.order_by(*JobPostViewSet.ordering)[:limit]
+            return Response({"personalized": False, "results": JobPostSerializer(feed, many=True, context={'request': request}).data})
+
+        results = JobPostSerializer([job_post for job_post, score in job_posts], many=True, context={'request': request}).data
+        for item, (job_post, score) in zip(results, job_posts):
+            item['score'] = round(score, 4)
+        return Response({"personalized": True, "results": results})
+
+
+class MetricsView(APIView):
+    """
+    API endpoint that exposes the request metrics of all the workers in the Prometheus text format.
+    """
+    permission_classes = [IsAdmin]
+
+    def get(self, request):
+        return HttpResponse(metrics.render_prometheus(), content_type="text/plain; version=0.0.4; charset=utf-8")
 
 
 class SystemReviewViewSet(viewsets.ModelViewSet):
@@ -181,32 +276,17 @@ class SystemReviewViewSet(viewsets.ModelViewSet):
     
     @action(detail=False, methods=['get'])
     def stats(self, request):
-        # Get general statistics on reviews
-        total_reviews = SystemReview.objects.count()
-        if total_reviews == 0:
-            return Response({
-                'total_reviews': 0,
-                'average_rating': 0,
-                'average_ease': 0,
-                'average_job_search': 0,
-                'average_application_process': 0,
-                'average_message_system': 0
-            })
-            
-        avg_rating = SystemReview.objects.aggregate(models.Avg('rating'))['rating__avg']
-        avg_ease = SystemReview.objects.aggregate(models.Avg('ease_of_navigation'))['ease_of_navigation__avg']
-        avg_job_search = SystemReview.objects.aggregate(models.Avg('job_search_effectiveness'))['job_search_effectiveness__avg']
-        avg_application_process = SystemReview.objects.aggregate(models.Avg('application_process_simplicity'))['application_process_simplicity__avg']
-        avg_message_system = SystemReview.objects.aggregate(models.Avg('message_system_effectiveness'))['message_system_effectiveness__avg']
-        
-        return Response({
-            'total_reviews': total_reviews,
-            'average_rating': avg_rating,
-            'average_ease': avg_ease,
-            'average_job_search': avg_job_search,
-            'average_application_process': avg_application_process,
-            'average_message_system': avg_message_system
-        })
+        # General statistics on reviews, read from the rollup kept by review_stats.py
+        data = review_stats.get_stats()
+
+        # ?days=30 adds the daily figures of the last 30 days
+        days = request.query_params.get('days')
+        if days:
+            try:
+                data['trend'] = review_stats.get_trend(int(days))
+            except ValueError:
+                return Response({"error": "days must be an integer."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(data)
 
 
 class CreateUserProfileView(APIView):
@@ -331,21 +411,15 @@ class UserProfileView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
-        user = request.user
+        context = get_user_context(request)
 
-        try:
-            jobseeker = JobSeekerProfile.objects.get(user=user)
-            serializer = JobSeekerProfileSerializer(jobseeker)
+        if context.jobseeker_profile:
+            serializer = JobSeekerProfileSerializer(context.jobseeker_profile)
             return Response(serializer.data, status=status.HTTP_200_OK)
-        except JobSeekerProfile.DoesNotExist:
-            pass
 
-        try:
-            employer = EmployerProfile.objects.get(user=user)
-            serializer = EmployerProfileSerializer(employer)
+        if context.employer_profile:
+            serializer = EmployerProfileSerializer(context.employer_profile)
             return Response(serializer.data, status=status.HTTP_200_OK)
-        except EmployerProfile.DoesNotExist:
-            pass
 
         return Response({"error": "No profile found for this user."}, status=status.HTTP_404_NOT_FOUND)
 
@@ -357,20 +431,18 @@ class EmployerJobPostsView(APIView):
     permission_classes = [permissions.IsAuthenticated, IsEmployer]
 
     def get(self, request):
-        try:
-            employer = EmployerProfile.objects.get(user=request.user)
+        employer = get_user_context(request).employer_profile
+        if employer is None:
+            return Response({"error": "Employer profile not found."}, status=404)
 
-            job_posts = JobPost.objects.filter(employer=employer)
+        job_posts = JobPost.objects.filter(employer=employer).select_related('employer')
 
-            serializer = JobPostSerializer(job_posts, many=True, context={"request": request})
-            return Response(serializer.data, status=200)
-        except EmployerProfile.DoesNotExist:
-            return Response({"error": "Employer profile not found."}, status=404)
+        serializer = EmployerJobPostSerializer(job_posts, many=True, context={"request": request})
+        return Response(serializer.data, status=200)
         
     def post(self, request):
-        try:
-            employer = EmployerProfile.objects.get(user=request.user)
-        except EmployerProfile.DoesNotExist:
+        employer = get_user_context(request).employer_profile
+        if employer is None:
             return Response({"error": "Employer profile not found."}, status=404)
 
         data = request.data.copy()
@@ -392,16 +464,44 @@ class EmployerJobPostsView(APIView):
                 status=400
         )
     
-        serializer = JobPostSerializer(data=data)
+        serializer = EmployerJobPostSerializer(data=data)
         if serializer.is_valid():
-            job_post = serializer.save()
-        
-            if employer.company_logo:
-                job_post.company_logo = employer.company_logo
-                job_post.save()
+            # The job post shows the logo of the company, set in the same INSERT
+            extra = {"company_logo": employer.company_logo} if employer.company_logo else {}
+            serializer.save(**extra)
             
             return Response(serializer.data, status=201)
         return Response(serializer.errors, status=400)
+
+
+class EmployerJobPostImportView(APIView):
+    """
+    API endpoint that allows employers to create many job posts at once from a CSV or JSON Lines file.
+    The file is sent either as the request body (Content-Type text/csv or application/x-ndjson)
+    or as the "file" field of a multipart form, and is read as a stream.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsEmployer]
+    parser_classes = [MultiPartParser]
+
+    def post(self, request):
+        employer = get_user_context(request).employer_profile
+        if employer is None:
+            return Response({"error": "Employer profile not found."}, status=404)
+
+        if request.content_type.startswith("multipart/"):
+            upload = request.FILES.get("file")
+            if upload is None:
+                return Response({"error": "A file is required."}, status=400)
+            stream, format = upload, job_import.detect_format(upload.content_type, upload.name)
+        else:
+            stream, format = request.stream, job_import.detect_format(request.content_type)
+        if format is None:
+            return Response({"error": "The file must be CSV or JSON Lines."}, status=415)
+        if stream is None:
+            return Response({"error": "The file is empty."}, status=400)
+
+        report = job_import.JobPostImporter(employer).run(stream, format)
+        return Response(report, status=201 if report["created"] else 400)
     
 
 class EmployerJobPostDetailView(APIView):
@@ -411,19 +511,19 @@ class EmployerJobPostDetailView(APIView):
     permission_classes = [permissions.IsAuthenticated, IsEmployer]
 
     def get_job_post(self, request, pk):
+        employer = get_user_context(request).employer_profile
+        if employer is None:
+            return Response({"error": "Employer profile not found."}, status=404)
         try:
-            employer = EmployerProfile.objects.get(user=request.user)
-            job_post = JobPost.objects.get(pk=pk, employer=employer)
+            job_post = JobPost.objects.select_related('employer').get(pk=pk, employer=employer)
             return job_post
-        except EmployerProfile.DoesNotExist:
-            return Response({"error": "Employer profile not found."}, status=404)
         except JobPost.DoesNotExist:
             return Response({"error": "Job post not found or you don't have permission to access it."}, status=404)
     
     
     def get(self, request, pk):
         job_post = self.get_job_post(request, pk)
-        serializer = JobPostSerializer(job_post, context={"request": request})
+        serializer = EmployerJobPostSerializer(job_post, context={"request": request})
         return Response(serializer.data)
     
     def delete(self, request, pk):
@@ -442,7 +542,7 @@ class EmployerJobPostDetailView(APIView):
         if "company_logo" in data:
             del data["company_logo"]
      
-        serializer = JobPostSerializer(job_post, data=data, partial=True)
+        serializer = EmployerJobPostSerializer(job_post, data=data, partial=True)
         if serializer.is_valid():
             serializer.save()
             return Response(serializer.data)
@@ -456,16 +556,14 @@ class SessionView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     def get(self, request, *args, **kwargs):
         user = request.user
-        groups = [group.name for group in user.groups.all()]
-        try:
-            jobseeker = JobSeekerProfile.objects.get(user=user)
-            profile_serializer = JobSeekerProfileSerializer(jobseeker, context={"request": request})
-        except JobSeekerProfile.DoesNotExist:
-            try:
-                employer = EmployerProfile.objects.get(user=user)
-                profile_serializer = EmployerProfileSerializer(employer, context={"request": request})
-            except EmployerProfile.DoesNotExist:
-                profile_serializer = None
+        context = get_user_context(request)
+        groups = sorted(context.roles)
+        if context.jobseeker_profile:
+            profile_serializer = JobSeekerProfileSerializer(context.jobseeker_profile, context={"request": request})
+        elif context.employer_profile:
+            profile_serializer = EmployerProfileSerializer(context.employer_profile, context={"request": request})
+        else:
+            profile_serializer = None
         response_data = {
             "user": {
                 "id": user.id,
@@ -475,7 +573,7 @@ class SessionView(APIView):
                 "last_name": user.last_name,
                 "groups": groups,
             },
-            "profile": profile_serializer.data,
+            "profile": profile_serializer.data if profile_serializer else None,
         }
         return Response(response_data, status=status.HTTP_200_OK)
     
@@ -486,23 +584,102 @@ class JobApplicationListByJobView(generics.ListAPIView):
     """
     serializer_class = JobApplicationSerializer
     permission_classes = [permissions.IsAuthenticated, IsEmployer]
+    pagination_class = JobApplicationPagination
+
     def get_queryset(self):
         job_id = self.kwargs['job_id']
-        user = self.request.user
 
-        try:
-            employer_profile = EmployerProfile.objects.get(user=user)
-        except EmployerProfile.DoesNotExist:
+        employer_profile = get_user_context(self.request).employer_profile
+        if employer_profile is None:
             raise PermissionDenied("You don't have an employer profile.")
 
-        employer_profile = self.request.user
-
         job = get_object_or_404(JobPost, id=job_id)
-        if job.employer.user.id != employer_profile.id:
+        if job.employer_id != employer_profile.id:
             raise PermissionDenied("You do not have permission to view applications for this job.")
 
-        return JobApplication.objects.filter(job=job).order_by('-candidate__is_premium', '-applied_at')
-    
+        return (
+            JobApplication.objects.filter(job=job)
+            .select_related(*APPLICATION_RELATED)
+            .order_by('-candidate__is_premium', '-applied_at', '-id')
+        )
+
+
+class JobApplicationExportView(APIView):
+    """
+    API endpoint that streams the applications to the jobs of the authenticated employer as CSV or JSON Lines,
+    for all of their jobs or for one job with ?job=<id>.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsEmployer]
+
+    def get(self, request, export_format):
+        employer = get_user_context(request).employer_profile
+        if employer is None:
+            return Response({"error": "Employer profile not found."}, status=404)
+        if export_format not in exports.ENCODERS:
+            return Response({"error": "The export format must be csv or jsonl."}, status=400)
+
+        applications = JobApplication.objects.filter(job__employer=employer)
+        filename = "applications"
+        job_id = request.query_params.get("job")
+        if job_id:
+            if not job_id.isdigit() or not JobPost.objects.filter(pk=job_id, employer=employer).exists():
+                return Response({"error": "Job post not found."}, status=404)
+            applications = applications.filter(job_id=job_id)
+            filename = f"applications-job-{job_id}"
+
+        return exports.stream_applications(applications.order_by('job_id', 'applied_at', 'id'), export_format, filename)
+
+
+class EmployerFunnelView(APIView):
+    """
+    API endpoint that returns the hiring funnel of the authenticated employer across all of their jobs:
+    applications per status, median response time and daily intake of the last ?days=30 days.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsEmployer]
+
+    def get(self, request):
+        employer = get_user_context(request).employer_profile
+        if employer is None:
+            return Response({"error": "Employer profile not found."}, status=404)
+        try:
+            days = int(request.query_params.get("days", 30))
+        except ValueError:
+            return Response({"error": "days must be an integer."}, status=400)
+        return Response(analytics.get_funnel(employer.id, days))
+
+
+class CandidateSearchView(APIView):
+    """
+    API endpoint that searches the CVs, cover letters and documents of the candidates who applied to the jobs of the
+    authenticated employer, for all of their jobs or for one job with ?job=<id>. Candidates come best match first,
+    with a snippet of each matching document and their applications.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsEmployer]
+    default_limit = 20
+    max_limit = 100
+
+    def get(self, request):
+        employer = get_user_context(request).employer_profile
+        if employer is None:
+            return Response({"error": "Employer profile not found."}, status=404)
+        query = request.query_params.get("q", "").strip()
+        if not query:
+            return Response({"error": "The search query q is required."}, status=400)
+        try:
+            limit = min(max(int(request.query_params.get('limit', self.default_limit)), 1), self.max_limit)
+        except ValueError:
+            limit = self.default_limit
+
+        job_id = request.query_params.get("job")
+        if job_id:
+            if not job_id.isdigit() or not JobPost.objects.filter(pk=job_id, employer=employer).exists():
+                return Response({"error": "Job post not found."}, status=404)
+            job_id = int(job_id)
+
+        results = document_text.search_applicants(employer.id, query, job_id=job_id or None, limit=limit)
+        return Response({"count": len(results), "results": results})
+
+
 class JobApplicationUpdateStatusView(APIView):
     """
     API endpoint that allows employers to update the status of a specific job application.
@@ -510,14 +687,13 @@ class JobApplicationUpdateStatusView(APIView):
     permission_classes = [permissions.IsAuthenticated, IsEmployer]
 
     def patch(self, request, application_id):
-        try:
-            employer_profile = EmployerProfile.objects.get(user=request.user)
-        except EmployerProfile.DoesNotExist:
+        employer_profile = get_user_context(request).employer_profile
+        if employer_profile is None:
             return Response({"error": "Employer profile not found."}, status=404)
 
-        application = get_object_or_404(JobApplication, id=application_id)
+        application = get_object_or_404(JobApplication.objects.select_related('job'), id=application_id)
         
-        if application.job.employer != employer_profile:
+        if application.job.employer_id != employer_profile.id:
             return Response(
                 {"error": "You do not have permission to update this application."},
                 status=403
@@ -531,11 +707,35 @@ class JobApplicationUpdateStatusView(APIView):
                 status=400
             )
         
-        application.status = status
-        application.save()
+        application_status.change_status(application, status)
         
         serializer = JobApplicationSerializer(application)
         return Response(serializer.data)
+
+
+class JobApplicationBulkUpdateStatusView(APIView):
+    """
+    API endpoint that allows employers to update the status of many job applications at once.
+    Takes {"changes": [{"id": 1, "status": "rejected"}, ...]}, or {"ids": [1, 2], "status": "rejected"}.
+    All the applications must belong to the employer's job posts, otherwise none is updated.
+    """
+    permission_classes = [permissions.IsAuthenticated, IsEmployer]
+
+    def post(self, request):
+        employer_profile = get_user_context(request).employer_profile
+        if employer_profile is None:
+            return Response({"error": "Employer profile not found."}, status=404)
+
+        statuses = application_status.parse_changes(request.data)
+        changed = application_status.change_statuses(employer_profile.id, statuses)
+        return Response({
+            "updated": len(changed),
+            "unchanged": len(statuses) - len(changed),
+            "applications": [
+                {"id": application.id, "status": application.status, "status_updated_at": application.status_updated_at}
+                for application in changed
+            ],
+        })
     
 
 class JobSeekerApplicationsView(generics.ListAPIView):
@@ -545,30 +745,90 @@ class JobSeekerApplicationsView(generics.ListAPIView):
     """
     serializer_class = JobApplicationSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = JobApplicationPagination
 
     def get_queryset(self):
-        user = self.request.user
-        user_groups = [group.name for group in user.groups.all()]
-        print("Groupes utilisateur :", user_groups)
-        if not user.groups.filter(name='jobseeker').exists():
+        context = get_user_context(self.request)
+        if not context.is_jobseeker or context.jobseeker_profile is None:
             raise PermissionDenied("You do not have permission to view job applications.")
 
-        applications = JobApplication.objects.filter(candidate=user.jobseekerprofile)
-        return applications.select_related('job')
+        applications = JobApplication.objects.filter(candidate=context.jobseeker_profile)
+        # ?job=<id> checks whether the job seeker already applied to a job
+        job_id = self.request.query_params.get('job')
+        if job_id:
+            if not job_id.isdigit():
+                return applications.none()
+            applications = applications.filter(job_id=job_id)
+        return applications.select_related(*APPLICATION_RELATED).order_by('-applied_at', '-id')
+
+class ChunkedUploadView(APIView):
+    """
+    API endpoint that starts a resumable upload from the name and size of a file (see uploads.py).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        if ChunkedUpload.objects.filter(user=request.user).count() >= settings.CHUNKED_UPLOADS['MAX_PENDING']:
+            return Response({"error": "Too many unfinished uploads, finish or cancel one first."}, status=400)
+        serializer = ChunkedUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        serializer.save(user=request.user)
+        return Response(serializer.data, status=201)
+
+
+class ChunkedUploadDetailView(APIView):
+    """
+    API endpoint that returns the offset of an upload, receives one of its chunks (PUT), or cancels it (DELETE).
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get_upload(self, request, upload_id):
+        return get_object_or_404(ChunkedUpload, pk=upload_id, user=request.user)
+
+    def get(self, request, upload_id):
+        return Response(ChunkedUploadSerializer(self.get_upload(request, upload_id)).data)
+
+    def put(self, request, upload_id):
+        upload = self.get_upload(request, upload_id)
+        length = uploads.chunk_length(request)
+        offset = uploads.parse_offset(request, upload, length)
+        # The body is read from the stream by write_chunk(), never parsed into request.data
+        upload = uploads.write_chunk(upload, offset, request.stream, length)
+        return Response(ChunkedUploadSerializer(upload).data)
+
+    def delete(self, request, upload_id):
+        with transaction.atomic():
+            uploads.discard(self.get_upload(request, upload_id))
+        return Response(status=204)
+
+
+class ChunkedUploadFinalizeView(APIView):
+    """
+    API endpoint that completes an upload once all its chunks are received. Its ID can then be attached to
+    an application, a CV or a document.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, upload_id):
+        upload = get_object_or_404(ChunkedUpload, pk=upload_id, user=request.user)
+        return Response(ChunkedUploadSerializer(uploads.finalize(upload)).data)
+
 
 class SubmitJobApplicationView(APIView):
     """
     API endpoint that allows job seekers to submit a job application to a specific job post.
     """
     permission_classes = [permissions.IsAuthenticated]
-    parser_classes = [MultiPartParser, FormParser]
+    parser_classes = [MultiPartParser, FormParser, JSONParser]
+
+    # File field -> parameter with the ID of a chunked upload to attach instead
+    UPLOAD_FIELDS = {'cv_file': 'cv_upload_id', 'cover_letter_file': 'cover_letter_upload_id'}
 
     def post(self, request, job_id):
         job = get_object_or_404(JobPost, id=job_id)
 
-        try:
-            jobseeker_profile = JobSeekerProfile.objects.get(user=request.user)
-        except JobSeekerProfile.DoesNotExist:
+        jobseeker_profile = get_user_context(request).jobseeker_profile
+        if jobseeker_profile is None:
             return Response({"error": "You must have a job seeker profile to apply for a job."}, status=400)
 
         if JobApplication.objects.filter(job=job, candidate=jobseeker_profile).exists():
@@ -578,10 +838,17 @@ class SubmitJobApplicationView(APIView):
         data['job'] = job.id
         data['candidate'] = jobseeker_profile.id 
 
-        serializer = JobApplicationCreateSerializer(data=data)
-        if serializer.is_valid():
-            serializer.save()
-            return Response({"message": "Application submitted successfully!"}, status=201)
+        with transaction.atomic():
+            attached = {
+                field: uploads.get_completed_upload(request.user, data.get(parameter), parameter)
+                for field, parameter in self.UPLOAD_FIELDS.items()
+            }
+            attached = {field: upload for field, upload in attached.items() if upload}
+            serializer = JobApplicationCreateSerializer(data=data)
+            if serializer.is_valid():
+                serializer.save(**{field: upload.file.name for field, upload in attached.items()})
+                uploads.release(attached.values())
+                return Response({"message": "Application submitted successfully!"}, status=201)
         return Response(serializer.errors, status=400)
 
       
@@ -591,14 +858,16 @@ class MessageListCreateView(generics.ListCreateAPIView):
     """
     serializer_class = MessageSerializer
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = MessageCursorPagination
     
     def get_queryset(self):
         application_id = self.kwargs.get('application_id')
-        application = get_object_or_404(JobApplication, id=application_id)
+        application = get_object_or_404(JobApplication.objects.select_related('candidate', 'job__employer'), id=application_id)
         user = self.request.user
-        if application.candidate.user != user and application.job.employer.user != user:
+        if application.candidate.user_id != user.id and application.job.employer.user_id != user.id:
             raise PermissionDenied("You are not allowed to view these messages.")
-        return Message.objects.filter(application=application).order_by('created_at')
+        # Newest first, see MessageCursorPagination for the older pages and the ?since= updates
+        return Message.objects.filter(application=application).select_related('sender').order_by('-created_at', '-id')
       
     def perform_create(self, serializer):
         application_id = self.kwargs.get('application_id')
@@ -610,42 +879,56 @@ class MessageListCreateView(generics.ListCreateAPIView):
             receiver = application.job.employer.user
         else:
             receiver = application.candidate.user
-        serializer.save(sender=user, receiver=receiver, application=application)
+        message = serializer.save(sender=user, receiver=receiver, application=application)
+        # Push the message to both participants once it is committed
+        transaction.on_commit(lambda: realtime.notify_new_message(message))
 
 
-class MyConversationsView(APIView):
+class MyConversationsView(generics.ListAPIView):
     """
     API endpoint that retrieves all conversations for the authenticated user, grouped by job applications.
+    The whole page is loaded in a single query and ordered by last activity, with cursor pagination.
     """
     permission_classes = [permissions.IsAuthenticated]
-    def get(self, request):
-        user = request.user
-        applications = JobApplication.objects.filter(
-            models.Q(candidate__user=user) | models.Q(job__employer__user=user)
-        ).distinct()
+    pagination_class = ConversationPagination
+
+    def get_queryset(self):
+        user = self.request.user
+        last_message = Message.objects.filter(application=models.OuterRef('pk')).order_by('-created_at')
+        # IN subqueries rather than joined conditions, so both sides of the OR are answered from an index
+        as_candidate = models.Q(candidate__in=JobSeekerProfile.objects.filter(user=user).values('pk'))
+        as_employer = models.Q(job__in=JobPost.objects.filter(employer__user=user).values('pk'))
+        return (
+            JobApplication.objects
+            .filter(as_candidate | as_employer)
+            .select_related('job__employer', 'candidate')
+            .annotate(
+                last_message_preview=models.Subquery(last_message.annotate(preview=Substr('body', 1, 50)).values('preview')[:1]),
+                last_activity=Coalesce(models.Subquery(last_message.values('created_at')[:1]), 'applied_at'),
+            )
+        )
+
+    def list(self, request, *args, **kwargs):
+        page = self.paginate_queryset(self.get_queryset())
         data = []
-        for app in applications:
-            if app.candidate.user == user: 
-                other = app.job.employer.user
-                profile = EmployerProfile.objects.filter(user=other).first()
-                name = f"{profile.first_name} {profile.last_name}" if profile else other.username
-                avatar = getattr(profile, "company_logo", None)
-            else:  
-                other = app.candidate
-                profile = JobSeekerProfile.objects.filter(pk=other.pk).first()
-                name = f"{profile.first_name} {profile.last_name}" if profile else other.user.username
-                avatar = getattr(profile, "profile_picture", None)
-
-            last_msg = app.messages.order_by("-created_at").first()
-            last_body = last_msg.body[:50] + "..." if last_msg else "(No messages yet)"
+        for app in page:
+            if app.candidate.user_id == request.user.id:
+                profile = app.job.employer
+                avatar = profile.company_logo
+            else:
+                profile = app.candidate
+                avatar = profile.profile_picture
+            name = f"{profile.first_name} {profile.last_name}"
+            last_body = app.last_message_preview + "..." if app.last_message_preview is not None else "(No messages yet)"
             data.append({
                 "application_id": app.id,
                 "job_title": app.job.title,
                 "name": name,
-                "avatar":  request.build_absolute_uri(avatar.url) if avatar else request.build_absolute_uri("/media/profile_pictures/place_holder.png"),
-                "last_message": last_body
+                "avatar":  request.build_absolute_uri(variant_url(avatar, 'thumb')) if avatar else request.build_absolute_uri("/media/profile_pictures/place_holder.png"),
+                "last_message": last_body,
+                "last_activity": app.last_activity,
             })
-        return Response(data)
+        return self.get_paginated_response(data)
 
 
 class JobApplicationDetailView(APIView):
@@ -655,7 +938,7 @@ class JobApplicationDetailView(APIView):
     permission_classes = [IsAuthenticated]
     def get(self, request, application_id):
         try:
-            application = JobApplication.objects.get(pk=application_id)
+            application = JobApplication.objects.select_related(*APPLICATION_RELATED).get(pk=application_id)
         except JobApplication.DoesNotExist:
             return Response({"error": "Application not found"}, status=404)
         serializer = JobApplicationSerializer(application)
@@ -684,13 +967,14 @@ def start_conversation(request):
         return Response({"error": "Unauthorized"}, status=status.HTTP_403_FORBIDDEN)
 
     if not Message.objects.filter(application=application).exists():
-        Message.objects.create(
+        message = Message.objects.create(
             application=application,
             sender=jobseeker_user,
             receiver=employer_user,
             subject="Conversation started",
             body=""
         )
+        transaction.on_commit(lambda: realtime.notify_new_message(message))
 
     return Response({"id": application_id}, status=status.HTTP_200_OK)
 
@@ -703,18 +987,16 @@ class JobFavoriteViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
-        try:
-            job_seeker = JobSeekerProfile.objects.get(user=self.request.user)
-            return JobFavorite.objects.filter(job_seeker=job_seeker).select_related('job_post')
-        except JobSeekerProfile.DoesNotExist:
+        job_seeker = get_user_context(self.request).jobseeker_profile
+        if job_seeker is None:
             return JobFavorite.objects.none()
+        return JobFavorite.objects.filter(job_seeker=job_seeker).select_related('job_post')
     
     def perform_create(self, serializer):
-        try:
-            job_seeker = JobSeekerProfile.objects.get(user=self.request.user)
-            serializer.save(job_seeker=job_seeker)
-        except JobSeekerProfile.DoesNotExist:
+        job_seeker = get_user_context(self.request).jobseeker_profile
+        if job_seeker is None:
             raise PermissionDenied("You must have a job seeker profile to add favorites.")
+        serializer.save(job_seeker=job_seeker)
 
 class ToggleFavoriteView(APIView):
     """
@@ -723,8 +1005,13 @@ class ToggleFavoriteView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def post(self, request, job_id):
+        job_seeker = get_user_context(request).jobseeker_profile
+        if job_seeker is None:
+            return Response(
+                {"error": "You must have a job seeker profile to add favorites."},
+                status=status.HTTP_403_FORBIDDEN
+            )
         try:
-            job_seeker = JobSeekerProfile.objects.get(user=request.user)
             job_post = JobPost.objects.get(pk=job_id)
             
             favorite, created = JobFavorite.objects.get_or_create(
@@ -738,11 +1025,6 @@ class ToggleFavoriteView(APIView):
             
             return Response({"status": "added"}, status=status.HTTP_201_CREATED)
             
-        except JobSeekerProfile.DoesNotExist:
-            return Response(
-                {"error": "You must have a job seeker profile to add favorites."},
-                status=status.HTTP_403_FORBIDDEN
-            )
         except JobPost.DoesNotExist:
             return Response(
                 {"error": "Job post not found."},
@@ -756,50 +1038,16 @@ class CheckFavoriteView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request, job_id):
-        try:
-            job_seeker = JobSeekerProfile.objects.get(user=request.user)
-            is_favorite = JobFavorite.objects.filter(
-                job_seeker=job_seeker,
-                job_post_id=job_id
-            ).exists()
-            
-            return Response({"is_favorite": is_favorite})
-            
-        except JobSeekerProfile.DoesNotExist:
+        job_seeker = get_user_context(request).jobseeker_profile
+        if job_seeker is None:
             return Response({"is_favorite": False})
 
-class BulkCheckFavoritesView(APIView):
-    """
-    API endpoint pour vérifier en masse si plusieurs offres sont dans les favoris.
-    """
-    permission_classes = [permissions.IsAuthenticated]
-    
-    def post(self, request):
-        job_ids = request.data.get('job_ids', [])
-        
-        if not job_ids or not isinstance(job_ids, list):
-            return Response(
-                {"error": "A list of job_ids is required."},
-                status=status.HTTP_400_BAD_REQUEST
-            )
+        is_favorite = JobFavorite.objects.filter(
+            job_seeker=job_seeker,
+            job_post_id=job_id
+        ).exists()
         
-        try:
-            job_seeker = JobSeekerProfile.objects.get(user=request.user)
-            
-            favorites = JobFavorite.objects.filter(
-                job_seeker=job_seeker,
-                job_post_id__in=job_ids
-            ).values_list('job_post_id', flat=True)
-            
-            favorite_statuses = {
-                job_id: job_id in favorites
-                for job_id in job_ids
-            }
-            
-            return Response(favorite_statuses)
-            
-        except JobSeekerProfile.DoesNotExist:
-            return Response({job_id: False for job_id in job_ids})
+        return Response({"is_favorite": is_favorite})
 
 
 class TogglePremiumView(APIView):
@@ -809,45 +1057,29 @@ class TogglePremiumView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def post(self, request):
-        user = request.user
-        
+        context = get_user_context(request)
+
         # Vérifier si l'utilisateur a un profil JobSeeker ou Employer
-        try:
-            jobseeker = JobSeekerProfile.objects.get(user=user)
-            jobseeker.is_premium = not jobseeker.is_premium
-            if jobseeker.is_premium:
-                jobseeker.premium_since = timezone.now()
-            else:
-                jobseeker.premium_since = None
-            jobseeker.save()
-            
+        for user_type, cached in (("jobseeker", context.jobseeker_profile), ("employer", context.employer_profile)):
+            if cached is None:
+                continue
+            # The cached context is shared by the following requests: update a fresh row, saving it invalidates the context
+            with transaction.atomic():
+                profile = type(cached).objects.select_for_update().get(pk=cached.pk)
+                profile.is_premium = not profile.is_premium
+                profile.premium_since = timezone.now() if profile.is_premium else None
+                profile.save(update_fields=['is_premium', 'premium_since'])
+
             return Response({
-                "is_premium": jobseeker.is_premium,
-                "user_type": "jobseeker",
+                "is_premium": profile.is_premium,
+                "user_type": user_type,
                 "message": "Premium status updated successfully"
             })
-            
-        except JobSeekerProfile.DoesNotExist:
-            try:
-                employer = EmployerProfile.objects.get(user=user)
-                employer.is_premium = not employer.is_premium
-                if employer.is_premium:
-                    employer.premium_since = timezone.now()
-                else:
-                    employer.premium_since = None
-                employer.save()
-                
-                return Response({
-                    "is_premium": employer.is_premium,
-                    "user_type": "employer",
-                    "message": "Premium status updated successfully"
-                })
-                
-            except EmployerProfile.DoesNotExist:
-                return Response(
-                    {"error": "No profile found for this user"}, 
-                    status=status.HTTP_404_NOT_FOUND
-                )
+
+        return Response(
+            {"error": "No profile found for this user"}, 
+            status=status.HTTP_404_NOT_FOUND
+        )
 
 class GetPremiumStatusView(APIView):
     """
@@ -856,28 +1088,28 @@ class GetPremiumStatusView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request):
-        user = request.user
+        context = get_user_context(request)
         
-        try:
-            jobseeker = JobSeekerProfile.objects.get(user=user)
+        jobseeker = context.jobseeker_profile
+        if jobseeker:
             return Response({
                 "is_premium": jobseeker.is_premium,
                 "user_type": "jobseeker",
                 "premium_since": jobseeker.premium_since
             })
-        except JobSeekerProfile.DoesNotExist:
-            try:
-                employer = EmployerProfile.objects.get(user=user)
-                return Response({
-                    "is_premium": employer.is_premium,
-                    "user_type": "employer",
-                    "premium_since": employer.premium_since
-                })
-            except EmployerProfile.DoesNotExist:
-                return Response(
-                    {"error": "No profile found for this user"}, 
-                    status=status.HTTP_404_NOT_FOUND
-                )
+
+        employer = context.employer_profile
+        if employer:
+            return Response({
+                "is_premium": employer.is_premium,
+                "user_type": "employer",
+                "premium_since": employer.premium_since
+            })
+
+        return Response(
+            {"error": "No profile found for this user"}, 
+            status=status.HTTP_404_NOT_FOUND
+        )
 
 
 class AppointmentCreateView(APIView):
@@ -887,9 +1119,8 @@ class AppointmentCreateView(APIView):
     permission_classes = [permissions.IsAuthenticated, IsEmployer]
     
     def post(self, request):
-        try:
-            employer_profile = EmployerProfile.objects.get(user=request.user)
-        except EmployerProfile.DoesNotExist:
+        employer_profile = get_user_context(request).employer_profile
+        if employer_profile is None:
             return Response({"error": "Employer profile not found."}, status=404)
         
         data = request.data.copy()
@@ -900,11 +1131,11 @@ class AppointmentCreateView(APIView):
             return Response({"error": "Job application ID is required."}, status=400)
         
         try:
-            job_application = JobApplication.objects.get(id=job_application_id)
-            if job_application.job.employer.id != employer_profile.id:
+            job_application = JobApplication.objects.select_related('job').get(id=job_application_id)
+            if job_application.job.employer_id != employer_profile.id:
                 return Response({"error": "You can only create appointments for your own job applications."}, status=403)
             
-            data['job_seeker'] = job_application.candidate.id
+            data['job_seeker'] = job_application.candidate_id
         except JobApplication.DoesNotExist:
             return Response({"error": "Job application not found."}, status=404)
         
@@ -923,28 +1154,24 @@ class UserAppointmentsView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def get(self, request):
-        user = request.user
+        context = get_user_context(request)
         
-        try:
-            employer_profile = EmployerProfile.objects.get(user=user)
-            appointments = Appointment.objects.filter(employer=employer_profile)
+        if context.employer_profile:
+            appointments = Appointment.objects.filter(employer=context.employer_profile)
             
             serializer = AppointmentSerializer(appointments, many=True)
             return Response(serializer.data)
             
-        except EmployerProfile.DoesNotExist:
-            try:
-                jobseeker_profile = JobSeekerProfile.objects.get(user=user)
-                appointments = Appointment.objects.filter(job_seeker=jobseeker_profile)
-                
-                serializer = AppointmentSerializer(appointments, many=True)
-                return Response(serializer.data)
-                
-            except JobSeekerProfile.DoesNotExist:
-                return Response(
-                    {"error": "No profile found for this user."},
-                    status=status.HTTP_404_NOT_FOUND
-                )
+        if context.jobseeker_profile:
+            appointments = Appointment.objects.filter(job_seeker=context.jobseeker_profile)
+            
+            serializer = AppointmentSerializer(appointments, many=True)
+            return Response(serializer.data)
+            
+        return Response(
+            {"error": "No profile found for this user."},
+            status=status.HTTP_404_NOT_FOUND
+        )
             
 class AppointmentResponseView(APIView):
     """
@@ -953,8 +1180,13 @@ class AppointmentResponseView(APIView):
     permission_classes = [permissions.IsAuthenticated]
     
     def patch(self, request, appointment_id):
+        jobseeker = get_user_context(request).jobseeker_profile
+        if jobseeker is None:
+            return Response(
+                {"error": "Job seeker profile not found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
         try:
-            jobseeker = JobSeekerProfile.objects.get(user=request.user)
             appointment = Appointment.objects.get(id=appointment_id,job_seeker=jobseeker)
             
             status = request.data.get('status')
@@ -979,11 +1211,6 @@ class AppointmentResponseView(APIView):
             serializer = AppointmentSerializer(appointment)
             return Response(serializer.data)
             
-        except JobSeekerProfile.DoesNotExist:
-            return Response(
-                {"error": "Job seeker profile not found"},
-                status=status.HTTP_404_NOT_FOUND
-            )
         except Appointment.DoesNotExist:
             return Response(
                 {"error": "Appointment not found or you don't have permission to modify it"},
@@ -2,6 +2,8 @@
 ASGI config for djangoHeroku project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Serving the app through ASGI is required for the real-time event stream (/api/events/),
+see backend/api/realtime.py.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.0/howto/deployment/asgi/
@@ -7,6 +7,7 @@ https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
 import os
+import tempfile
 from datetime import timedelta
 from pathlib import Path
 
@@ -63,6 +64,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "backend.api.metrics.MetricsMiddleware",  # first, so the timings cover the other middleware too
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
     "corsheaders.middleware.CorsMiddleware",  # allow access from diffferent origin for web clients
@@ -114,6 +116,91 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+
+# Shared cache of the public job feed, see backend/api/cache.py
+JOBPOST_LIST_CACHE = {
+    "ALIAS": "default",
+    "TIMEOUT": 300,
+}
+
+
+# Seconds during which the roles and profile of a user are served from the cache, see backend/api/user_context.py
+USER_CONTEXT_CACHE_TIMEOUT = 60
+
+# Seconds during which the hiring funnel of an employer is served from the cache, see backend/api/analytics.py
+# The cached funnel is dropped as soon as one of the employer's applications changes
+EMPLOYER_FUNNEL_CACHE_TIMEOUT = 3600
+
+# Postal codes and localities with their coordinates, for the radius search, see backend/api/geo.py
+GAZETTEER_PATH = os.path.join(BASE_DIR, "backend", "api", "data", "gazetteer_ch.csv")
+
+# Resized variants of the uploaded images, see backend/api/images.py
+IMAGE_VARIANTS = {
+    "SIZES": {"thumb": 128, "medium": 512},  # Longest side, in pixels
+    "FORMAT": "WEBP",
+    "QUALITY": 80,
+    "WORKERS": 2,
+    "PENDING_TIMEOUT": 60,  # Seconds before checking the storage again for the variants of an image
+}
+
+# Request metrics exposed at /api/metrics/, see backend/api/metrics.py
+# Every worker writes its metrics in DIRECTORY, which must be shared by all the workers of the server
+METRICS = {
+    "ENABLED": True,
+    "PREFIX": "marketech",
+    "DIRECTORY": os.getenv("METRICS_DIR", os.path.join(tempfile.gettempdir(), "marketech-metrics")),
+    "FLUSH_INTERVAL": 5,  # Seconds between two writes of a worker's metrics
+    "RETENTION": 24 * 3600,  # Files of workers that stopped writing are dropped after this many seconds
+    "MAX_ROUTES": 500,
+    "LATENCY_BUCKETS": [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10],
+    "QUERY_BUCKETS": [0, 1, 2, 5, 10, 20, 50, 100, 200],
+    "SIZE_BUCKETS": [256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304],  # Response body sizes, in bytes
+}
+
+# Resumable uploads of CVs, cover letters and documents, see backend/api/uploads.py
+# Chunks are appended to a file of DIRECTORY, which must be shared by all the workers of the server
+CHUNKED_UPLOADS = {
+    "DIRECTORY": os.getenv("CHUNKED_UPLOADS_DIR", os.path.join(tempfile.gettempdir(), "marketech-uploads")),
+    "MAX_SIZE": 5 * 1024 * 1024,  # Size of a whole file, in bytes
+    "MAX_CHUNK_SIZE": 1024 * 1024,
+    "MAX_PENDING": 10,  # Unfinished or unattached uploads per user
+    "EXPIRY": 24 * 3600,  # Seconds after which an unattached upload is removed by purge_uploads
+}
+
+# Job recommendations, see backend/api/recommendations.py
+# The model is built in DIRECTORY by `python manage.py build_recommendations`, which must be shared by all the workers
+RECOMMENDATIONS = {
+    "DIRECTORY": os.getenv("RECOMMENDATIONS_DIR", os.path.join(BASE_DIR, "recommendations")),
+    "FEATURES": 2 ** 18,  # Columns the words are hashed into
+    "MAX_SEGMENTS": 16,  # The segments added since the last build are merged past this count
+}
+
+# Text of the CVs and documents for the candidate search, see backend/api/document_text.py
+# New uploads are extracted in the background, `python manage.py extract_document_texts` processes what is pending
+DOCUMENT_TEXT = {
+    "WORKERS": int(os.getenv("DOCUMENT_TEXT_WORKERS", 2)),  # Processes parsing the files, 0 parses them in the worker itself
+    "BATCH_SIZE": 50,  # Files extracted and stored per transaction
+}
+
+# Real-time messaging, see backend/api/realtime.py
+# With several workers, use "backend.api.realtime.RemoteBroker" and run `python manage.py run_message_broker`
+REALTIME = {
+    "BROKER": os.getenv("REALTIME_BROKER", "backend.api.realtime.InProcessBroker"),
+    "BROKER_ADDRESS": ("127.0.0.1", 8765),
+    "HEARTBEAT": 15,  # Seconds between keep-alive comments on idle event streams
+    "STREAM_LIFETIME": 120,  # Seconds before an event stream ends, the browser reconnects
+    "RETRY": 1,  # Seconds the browser waits before reconnecting
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/4.0/ref/settings/#auth-password-validators
 
@@ -14,6 +14,18 @@ DATABASES = {
 }
 
 
+#########
+# CACHE #
+#########
+# Shared by all the gunicorn workers, so that job feed invalidations reach every one of them
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.getenv('DJANGO_CACHE_DIR', '/tmp/marketech-cache'),
+    }
+}
+
+
 ############
 # SECURITY #
 ############
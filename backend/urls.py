@@ -20,12 +20,14 @@ from django.conf.urls.static import static
 from django.conf import settings
 from backend.api.views import MessageListCreateView, MyConversationsView
 from backend.api.views import start_conversation
+from backend.api.realtime import event_stream
 
 from .api.views import (
-    BulkCheckFavoritesView,
+    CandidateSearchView,
     CheckFavoriteView,
     GetPremiumStatusView,
     JobApplicationUpdateStatusView,
+    JobApplicationBulkUpdateStatusView,
     JobFavoriteViewSet,
     SubmitJobApplicationView,
     ToggleFavoriteView,
@@ -43,8 +45,10 @@ from .api.views import (
     LogoutView,
     SessionView,
     EmployerJobPostsView,
+    EmployerJobPostImportView,
     UserProfileView,
     JobApplicationListByJobView,
+    JobApplicationExportView,
     MessageListCreateView,
     MyConversationsView,
     JobApplicationDetailView,
@@ -52,7 +56,13 @@ from .api.views import (
     SystemReviewViewSet,
     AppointmentCreateView,
     UserAppointmentsView,
-    AppointmentResponseView
+    AppointmentResponseView,
+    MetricsView,
+    ChunkedUploadView,
+    ChunkedUploadDetailView,
+    ChunkedUploadFinalizeView,
+    EmployerFunnelView,
+    JobRecommendationsView,
 )
 
 router = routers.DefaultRouter()
@@ -102,6 +112,10 @@ urlpatterns = [
     # http://localhost:8000/api/employer-job-posts/
     path("api/employer-job-posts/", EmployerJobPostsView.as_view(), name="employer-job-posts"),
 
+    # [POST] Create many job offers at once from a CSV or JSON Lines file, for the authenticated employer
+    # http://localhost:8000/api/employer-job-posts/import/
+    path("api/employer-job-posts/import/", EmployerJobPostImportView.as_view(), name="employer-job-posts-import"),
+
     # Route created by Jonathan to retrieve or perform operations on a specific job offer
     # [GET] Récupérer une offre d'emploi spécifique http://localhost:8000/api/employer-job-posts/{id}/
     # [PUT] Mettre à jour une offre d'emploi http://localhost:8000/api/employer-job-posts/{id}/
@@ -115,27 +129,67 @@ urlpatterns = [
     # Route created by Alexis to retrieve applications for an offer
     # http://localhost:8000/jobposts/5/applications/
     path('api/jobposts/<int:job_id>/applications/', JobApplicationListByJobView.as_view(), name='job-applications-by-job'),
+
+    # Route to download the applications to the jobs of the authenticated employer, for their ATS
+    # [GET] All the jobs http://localhost:8000/api/applications/export/csv/ (or jsonl)
+    # [GET] A single job http://localhost:8000/api/applications/export/csv/?job={id}
+    path('api/applications/export/<str:export_format>/', JobApplicationExportView.as_view(), name='applications-export'),
     
+    # Route to get the hiring funnel of the authenticated employer, across all of their jobs
+    # [GET] http://localhost:8000/api/employer-analytics/funnel/?days=30
+    path('api/employer-analytics/funnel/', EmployerFunnelView.as_view(), name='employer-funnel'),
+
+    # Route to search the CVs, cover letters and documents of the candidates who applied to the authenticated employer
+    # [GET] All the jobs http://localhost:8000/api/employer/candidates/search/?q=python+django
+    # [GET] A single job http://localhost:8000/api/employer/candidates/search/?q=python&job={id}
+    path('api/employer/candidates/search/', CandidateSearchView.as_view(), name='employer-candidate-search'),
+
     # Route created by Ysias to update the status of a job application
     # [PATCH] Update the status of a job application http://localhost:8000/api/applications/{id}/update-status/
     path('api/applications/<int:application_id>/update-status/', JobApplicationUpdateStatusView.as_view(), name='application-update-status'),
+
+    # Route to update the status of many job applications of the authenticated employer at once
+    # [POST] {"changes": [{"id": 1, "status": "rejected"}]} http://localhost:8000/api/applications/bulk-update-status/
+    path('api/applications/bulk-update-status/', JobApplicationBulkUpdateStatusView.as_view(), name='applications-bulk-update-status'),
     
+    # Route to get the job posts recommended to the authenticated job seeker
+    # [GET] http://localhost:8000/api/jobseeker/recommendations/?limit=10
+    path('api/jobseeker/recommendations/', JobRecommendationsView.as_view(), name='jobseeker-recommendations'),
+
     # Route created by Ysias to allow job seekers to view their applications and track status
     # [GET] View all applications submitted by the current user http://localhost:8000/api/jobseeker/applications/
     path('api/jobseeker/applications/', JobSeekerApplicationsView.as_view(), name='jobseeker-applications'),
     
+    # Routes to upload a CV, cover letter or document in resumable chunks, then attach it by its ID
+    # [POST] Start an upload with {filename, size} http://localhost:8000/api/uploads/
+    # [GET, PUT, DELETE] Offset, next chunk or cancellation http://localhost:8000/api/uploads/{upload_id}/
+    # [POST] Complete the upload once all the chunks are sent http://localhost:8000/api/uploads/{upload_id}/finalize/
+    path('api/uploads/', ChunkedUploadView.as_view(), name='chunked-uploads'),
+    path('api/uploads/<uuid:upload_id>/', ChunkedUploadDetailView.as_view(), name='chunked-upload-detail'),
+    path('api/uploads/<uuid:upload_id>/finalize/', ChunkedUploadFinalizeView.as_view(), name='chunked-upload-finalize'),
+
     # Route created by Ysias to allow job seekers to submit job applications
     # [POST] Submit application for a specific job http://localhost:8000/api/jobs/{job_id}/apply/
+    # Files are sent with the application, or attached with {cv_upload_id, cover_letter_upload_id} from /api/uploads/
     path('api/jobs/<int:job_id>/apply/', SubmitJobApplicationView.as_view(), name='submit-job-application'),
 
     # Route created by Alexis to retrieve or send messages relating to a job application
-    # http://localhost:8000/api/applications/5/messages/
+    # [GET] Newest messages first, older ones through `next` http://localhost:8000/api/applications/5/messages/
+    # [GET] Only the messages posted since a `latest` token http://localhost:8000/api/applications/5/messages/?since={latest}
     path("api/applications/<int:application_id>/messages/", MessageListCreateView.as_view(), name="application-messages"),
    
     # Route created by Alexis to retrieve the conversations of the connected user (employer or candidate)
     # http://localhost:8000/api/conversations/
     path("api/conversations/", MyConversationsView.as_view(), name="my-conversations"),
 
+    # Server-Sent Events stream of the new messages and inbox updates of the connected user (ASGI only)
+    # http://localhost:8000/api/events/
+    path("api/events/", event_stream, name="event-stream"),
+
+    # Prometheus metrics of the requests handled by every worker, admin only
+    # http://localhost:8000/api/metrics/
+    path("api/metrics/", MetricsView.as_view(), name="metrics"),
+
     # Route created by Alexis to retrieve information on a specific application
     # http://localhost:8000/api/applications/1/
     path("api/applications/<int:application_id>/", JobApplicationDetailView.as_view(), name="application-detail"),
@@ -159,7 +213,6 @@ urlpatterns = [
     # Route created by Ysias
     path('api/jobs/<int:job_id>/toggle-favorite/', ToggleFavoriteView.as_view(), name='toggle-favorite'),
     path('api/jobs/<int:job_id>/check-favorite/', CheckFavoriteView.as_view(), name='check-favorite'),
-    path('api/check-favorites/', BulkCheckFavoritesView.as_view(), name='check-favorites'),
       # Routes premium
     path("api/toggle-premium/", TogglePremiumView.as_view(), name="toggle-premium"),
     path("api/premium-status/", GetPremiumStatusView.as_view(), name="get-premium-status"),
@@ -1,9 +1,10 @@
 import api from "@/services/api"
 
 export default {
-  getApplicationsByJob(jobId) {
+  // Returns one page of applications, pass the `next` link of the previous page to get the following one
+  getApplicationsByJob(jobId, pageUrl = null, pageSize = null) {
     return api
-      .get(`jobposts/${jobId}/applications/`)
+      .get(pageUrl || `jobposts/${jobId}/applications/`, { params: pageSize ? { page_size: pageSize } : {} })
       .then((response) => response.data)
       .catch((error) => {
         console.error("Error fetching applications:", error)
@@ -11,9 +12,38 @@ export default {
       })
   },
 
-  getJobSeekerApplications() {
+  // Download link of the applications as CSV or JSON Lines, for one job or for all the jobs of the employer
+  getExportUrl(format, jobId = null) {
+    const url = `${api.defaults.baseURL}/applications/export/${format}/`
+    return jobId ? `${url}?job=${jobId}` : url
+  },
+
+  // Applications per status, median response time and daily intake across all the jobs of the employer
+  getFunnel(days = 30) {
     return api
-      .get(`jobseeker/applications/`)
+      .get("employer-analytics/funnel/", { params: { days } })
+      .then((response) => response.data)
+      .catch((error) => {
+        console.error("Error fetching the hiring funnel:", error)
+        throw error
+      })
+  },
+
+  // Candidates who applied to the employer's jobs (or to `jobId`) whose CV, cover letter or documents match `query`
+  searchCandidates(query, jobId = null) {
+    return api
+      .get("employer/candidates/search/", { params: jobId ? { q: query, job: jobId } : { q: query } })
+      .then((response) => response.data)
+      .catch((error) => {
+        console.error("Error searching candidates:", error)
+        throw error
+      })
+  },
+
+  // Returns one page of the job seeker's applications, newest first
+  getJobSeekerApplications(pageUrl = null) {
+    return api
+      .get(pageUrl || `jobseeker/applications/`)
       .then((response) => response.data)
       .catch((error) => {
         console.error("Error fetching jobseeker applications:", error)
@@ -31,9 +61,21 @@ export default {
     }
   },
 
-  submitApplication(jobId, formData) {
+  // Gives `status` to all the applications of `applicationIds` in one request, or to none of them
+  async bulkUpdateApplicationStatus(applicationIds, status) {
+    try {
+      const response = await api.post("applications/bulk-update-status/", { ids: applicationIds, status })
+      return response.data
+    } catch (error) {
+      console.error("Error updating application statuses:", error)
+      throw error
+    }
+  },
+
+  // `application` holds the files as FormData, or the IDs of chunked uploads ({ cv_upload_id, cover_letter_upload_id })
+  submitApplication(jobId, application) {
     return api
-      .post(`jobs/${jobId}/apply/`, formData)
+      .post(`jobs/${jobId}/apply/`, application)
       .then((response) => response.data)
       .catch((error) => {
         console.error("Error submitting application:", error.response?.data || error.message)
@@ -42,10 +84,9 @@ export default {
   },
 
   checkIfApplied(jobId) {
-    return this.getJobSeekerApplications()
-      .then((applications) => {
-        return applications.some((app) => app.job === jobId)
-      })
+    return api
+      .get(`jobseeker/applications/`, { params: { job: jobId } })
+      .then((response) => response.data.count > 0)
       .catch((error) => {
         console.error("Error checking application status:", error)
         return false
@@ -1,18 +1,35 @@
 import api from "./api"
 
 export default {
-  async fetchConversations() {
-    const response = await api.get("/conversations/", {
+  // Returns one page of conversations, pass the `next` link of the previous page to get the following one
+  async fetchConversations(pageUrl = "/conversations/") {
+    const response = await api.get(pageUrl, {
       withCredentials: true
     })
     return response.data
   },
 
-  async fetchMessages(applicationId) {
-    const response = await api.get(`/applications/${applicationId}/messages/`)
+  // Returns the newest page of a conversation, pass its `next` link to get the older messages
+  async fetchMessages(applicationId, pageUrl = null) {
+    const response = await api.get(pageUrl || `/applications/${applicationId}/messages/`)
     return response.data
   },
 
+  // Returns the messages posted after the `latest` token of a previous response, oldest first
+  async fetchNewMessages(applicationId, since) {
+    const response = await api.get(`/applications/${applicationId}/messages/`, { params: { since } })
+    return response.data
+  },
+
+  // Opens the Server-Sent Events stream, `handlers` maps event types ("message", "conversation") to callbacks
+  subscribe(handlers) {
+    const source = new EventSource(`${api.defaults.baseURL}/events/`, { withCredentials: true })
+    Object.entries(handlers).forEach(([type, handler]) => {
+      source.addEventListener(type, (event) => handler(JSON.parse(event.data)))
+    })
+    return source
+  },
+
   async postMessage({ body, subject, application }) {
     const response = await api.post(`/applications/${application}/messages/`, {
       subject,
@@ -0,0 +1,40 @@
+import api from "./api"
+
+const MAX_RETRIES = 3
+
+export default {
+  // Sends a file in chunks and returns the ID of the finalized upload, to attach it to an application or a profile.
+  // An interrupted chunk is sent again from the offset known to the server.
+  async uploadFile(file, onProgress = () => {}) {
+    const { data: upload } = await api.post("/uploads/", { filename: file.name, size: file.size })
+    let offset = 0
+    let retries = 0
+
+    while (offset < file.size) {
+      const end = Math.min(offset + upload.max_chunk_size, file.size)
+      try {
+        const { data } = await api.put(`/uploads/${upload.id}/`, file.slice(offset, end), {
+          headers: {
+            "Content-Type": "application/octet-stream",
+            "Content-Range": `bytes ${offset}-${end - 1}/${file.size}`
+          },
+          timeout: 0
+        })
+        offset = data.offset
+        retries = 0
+        onProgress(offset / file.size)
+      } catch (error) {
+        if (error.response?.status === 409) {
+          offset = Number(error.response.data.offset)
+        } else if (error.response || ++retries > MAX_RETRIES) {
+          throw error
+        } else {
+          offset = (await api.get(`/uploads/${upload.id}/`)).data.offset
+        }
+      }
+    }
+
+    await api.post(`/uploads/${upload.id}/finalize/`)
+    return upload.id
+  }
+}